@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Unit tests for lease action items (backend/action_items.py and their routes in backend/server.py)
+Run with: python -m pytest action_items_test.py
+"""
+
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+import queries
+import server
+from action_items import item_update
+
+@pytest.fixture
+def client(monkeypatch):
+    mongomock = pytest.importorskip("mongomock")
+    # mongomock's $dateToString has no %L
+    monkeypatch.setattr(queries, "DATE_FORMAT", "%Y-%m-%dT%H:%M:%S")
+    monkeypatch.setattr(server, "JWT_SECRET_KEY", "action-items-test-secret-32-bytes!!")
+    monkeypatch.setattr(server, "db", mongomock.MongoClient().growe_platform)
+    token = server.create_jwt_token({"id": "admin-1", "email": "admin@example.com", "role": "admin"})
+    # Not entered as a context manager, so lifespan never connects to MongoDB
+    client = TestClient(server.app)
+    client.headers["Authorization"] = "Bearer " + token
+    return client
+
+@pytest.fixture
+def lease_id(client):
+    response = client.post("/api/leases", json={
+        "warehouse_id": "wh1", "threepl_id": "tpl1", "start_date": "2026-01-01T00:00:00", "end_date": "2029-01-01T00:00:00",
+        "square_footage": 50000, "landlord": "Property Group 1", "monthly_rent": 25000.0,
+        "action_items": [
+            {"type": "renewal_notice", "description": "Renewal notice", "due_date": "2028-07-04T00:00:00", "priority": "high"},
+            {"type": "insurance_renewal", "description": "Insurance certificate", "due_date": "2027-01-15T00:00:00"},
+        ],
+    })
+    assert response.status_code == 200
+    return response.json()["id"]
+
+def items(client, lease_id, **params):
+    response = client.get("/api/leases/%s/action-items" % lease_id, params=params)
+    assert response.status_code == 200
+    return response.json()
+
+def test_completing_sets_only_the_matched_item():
+    # mongomock has no arrayFilters, so the update document is checked here
+    now = datetime(2026, 10, 17)
+
+    assert item_update({"status": "completed"}, {"email": "admin@example.com"}, now) == {"$set": {
+        "action_items.$[item].status": "completed",
+        "action_items.$[item].completed_at": now,
+        "action_items.$[item].completed_by": "admin@example.com",
+    }}
+    assert item_update({"status": "pending", "priority": "high"}, {}, now)["$set"] == {
+        "action_items.$[item].status": "pending",
+        "action_items.$[item].priority": "high",
+        "action_items.$[item].completed_at": None,
+        "action_items.$[item].completed_by": None,
+    }
+
+@pytest.mark.parametrize("field", ["due_date", "status", "description", "priority"])
+def test_fields_cannot_be_cleared(client, lease_id, field):
+    item_id = items(client, lease_id)[0]["id"]
+
+    response = client.put("/api/leases/%s/action-items" % lease_id, json={"action_item_id": item_id, field: None})
+    assert response.status_code == 422
+    assert response.json()["detail"] == "%s cannot be null" % field
+
+def test_items_without_due_date_sort_last(client, lease_id):
+    server.db.leases.update_one({"id": lease_id}, {"$push": {"action_items": {"id": "legacy", "description": "Old", "due_date": None}}})
+
+    assert [item["id"] for item in items(client, lease_id)][-1] == "legacy"
+    assert items(client, lease_id)[0]["due_date"].startswith("2027-01-15")
@@ -0,0 +1,65 @@
+import uuid
+from datetime import datetime
+from typing import List, Optional
+
+# Statuses still needing attention; anything else is closed
+OPEN_STATUSES = ("pending",)
+
+def new_item(item: dict) -> dict:
+    item = dict(item)
+    item["id"] = item.get("id") or str(uuid.uuid4())
+    item.setdefault("status", "pending")
+    item.setdefault("completed_at", None)
+    return item
+
+def parsed_items(summary: dict, sha256: str) -> List[dict]:
+    # Ids derived from the document so re-parsing it matches existing items
+    return [
+        new_item({**item, "id": "%s-%s" % (sha256[:12], item["type"]), "source": "lease_parser"})
+        for item in summary.get("action_items") or []
+    ]
+
+def merge_items_update(items: List[dict]) -> list:
+    """Pipeline update appending items whose id the lease does not have yet.
+
+    Items already on the lease keep their status, so re-parsing a document
+    never reopens completed work.
+    """
+    existing = {"$ifNull": ["$action_items", []]}
+    return [{"$set": {"action_items": {"$concatArrays": [existing, {"$filter": {
+        "input": {"$literal": items},
+        "cond": {"$not": [{"$in": ["$$this.id", {"$ifNull": ["$action_items.id", []]}]}]},
+    }}]}}}]
+
+def item_update(changes: dict, current_user: dict, now: Optional[datetime] = None) -> dict:
+    # Only the named fields of the matched item are written
+    fields = {"action_items.$[item].%s" % field: value for field, value in changes.items()}
+    if "status" in changes:
+        completed = changes["status"] not in OPEN_STATUSES
+        fields["action_items.$[item].completed_at"] = (now or datetime.now()) if completed else None
+        fields["action_items.$[item].completed_by"] = current_user.get("email") if completed else None
+    return {"$set": fields}
+
+def due_pipeline(before: datetime, statuses=OPEN_STATUSES, limit: int = 500) -> list:
+    # $elemMatch on both fields lets the multikey index bound status and
+    # due_date together for the same array element
+    element = {"status": {"$in": list(statuses)}, "due_date": {"$lt": before}}
+    return [
+        {"$match": {"action_items": {"$elemMatch": element}}},
+        {"$project": {
+            "_id": 0,
+            "lease_id": {"$ifNull": ["$id", {"$toString": "$_id"}]},
+            "warehouse_id": 1,
+            "threepl_id": 1,
+            "landlord": 1,
+            "action_items": {"$filter": {"input": "$action_items", "cond": {"$and": [
+                {"$in": ["$$this.status", list(statuses)]},
+                {"$lt": ["$$this.due_date", before]},
+            ]}}},
+        }},
+        {"$unwind": "$action_items"},
+        {"$set": {"action_items.%s" % field: "$" + field for field in ("lease_id", "warehouse_id", "threepl_id", "landlord")}},
+        {"$replaceRoot": {"newRoot": "$action_items"}},
+        {"$sort": {"due_date": 1, "id": 1}},
+        {"$limit": limit},
+    ]
@@ -0,0 +1,73 @@
+from datetime import datetime
+from typing import Optional
+
+from pymongo import ASCENDING, DESCENDING
+
+EVENTS_COLLECTION = "deal_events"
+
+# Fields that are bookkeeping rather than deal changes
+IGNORED_FIELDS = {"_id", "id", "created_at", "version"}
+
+def changed_fields(before: dict, after: dict) -> dict:
+    return {
+        field: value for field, value in after.items()
+        if field not in IGNORED_FIELDS and before.get(field) != value
+    }
+
+def build_event(deal_id: str, event_type: str, changes: dict, before: dict, actor: dict, rep_owner: str, now: Optional[datetime] = None) -> Optional[dict]:
+    if event_type == "updated" and not changes:
+        return None
+    event = {
+        "deal_id": deal_id,
+        "type": event_type,
+        "changes": changes,
+        "actor": actor.get("email"),
+        "rep_owner": rep_owner,
+        "ts": now or datetime.now(),
+    }
+    if "stage" in changes:
+        event["stage_from"] = before.get("stage")
+        event["stage_to"] = changes["stage"]
+    return event
+
+def record_event(db, event: Optional[dict]):
+    if event:
+        db[EVENTS_COLLECTION].insert_one(event)
+
+def deal_history(db, deal_id: str, now: Optional[datetime] = None) -> dict:
+    now = now or datetime.now()
+    # Index range scan on (deal_id, ts)
+    events = list(db[EVENTS_COLLECTION].find({"deal_id": deal_id}, {"_id": 0}).sort("ts", ASCENDING))
+
+    stages = []
+    for event in events:
+        stage = event.get("stage_to")
+        if stage is None:
+            continue
+        if stages:
+            stages[-1]["exited_at"] = event["ts"]
+        stages.append({"stage": stage, "entered_at": event["ts"], "exited_at": None})
+
+    time_in_stage = {}
+    for period in stages:
+        hours = ((period["exited_at"] or now) - period["entered_at"]).total_seconds() / 3600
+        period["duration_hours"] = round(hours, 2)
+        time_in_stage[period["stage"]] = round(time_in_stage.get(period["stage"], 0) + hours, 2)
+
+    return {"deal_id": deal_id, "events": events, "stages": stages, "time_in_stage_hours": time_in_stage}
+
+def rep_history(db, rep_owner: Optional[str] = None, actor: Optional[str] = None,
+                start: Optional[datetime] = None, end: Optional[datetime] = None, limit: int = 200) -> list:
+    query = {}
+    if rep_owner:
+        query["rep_owner"] = rep_owner
+    if actor:
+        query["actor"] = actor
+    if start or end:
+        query["ts"] = {}
+        if start:
+            query["ts"]["$gte"] = start
+        if end:
+            query["ts"]["$lt"] = end
+    # Index range scan on (rep_owner, ts) or (actor, ts), newest first
+    return list(db[EVENTS_COLLECTION].find(query, {"_id": 0}).sort("ts", DESCENDING).limit(limit))
@@ -0,0 +1,361 @@
+"""Enrich 3PL records from their public websites.
+
+Crawls the homepage of every 3PL with a website plus a few linked
+services, locations and contact pages, and stores the differences from the
+current record in enrichment_proposals for review; three_pls itself is only
+changed when a proposal is applied:
+
+    python enrichment.py run [concurrency]
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import time
+from datetime import datetime
+from html.parser import HTMLParser
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+from urllib.robotparser import RobotFileParser
+
+import httpx
+from dotenv import load_dotenv
+
+from regions import STATE_NAMES, region_code
+
+# Run as a script, so .env must be loaded before the settings below are read
+load_dotenv()
+
+logger = logging.getLogger("growe.enrichment")
+
+PROPOSALS_COLLECTION = "enrichment_proposals"
+CACHE_DIR = os.getenv(
+    "ENRICHMENT_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "enrichment_cache")
+)
+# Cached pages younger than this are reused without contacting the site
+CACHE_MAX_AGE_SECONDS = float(os.getenv("ENRICHMENT_CACHE_MAX_AGE_SECONDS", "86400"))
+HOST_DELAY_SECONDS = float(os.getenv("ENRICHMENT_HOST_DELAY_SECONDS", "1.0"))
+CONCURRENCY = int(os.getenv("ENRICHMENT_CONCURRENCY", "20"))
+USER_AGENT = "GroweEnrichment/1.0"
+MAX_PAGES_PER_SITE = 6
+MAX_BODY_BYTES = 2 * 1024 * 1024
+# Failures that skip one page; an invalid URL is not an httpx.HTTPError
+REQUEST_ERRORS = (httpx.HTTPError, httpx.InvalidURL)
+
+FOLLOW_LINKS = re.compile(r"service|solution|location|facilit|warehouse|network|contact|about", re.IGNORECASE)
+
+# Canonical service names as used in three_pls.services
+SERVICE_PATTERNS = {
+    service: re.compile("|".join(patterns), re.IGNORECASE)
+    for service, patterns in {
+        "Warehousing": (r"\bwarehousing\b", r"\bwarehouse space\b"),
+        "Fulfillment": (r"\bfulfil+ment\b",),
+        "Transportation": (r"\btransportation\b", r"\bfreight\b", r"\bdrayage\b"),
+        "Cross-docking": (r"\bcross[- ]?dock",),
+        "LTL": (r"\bLTL\b", r"\bless[- ]than[- ]truckload\b"),
+        "FTL": (r"\bFTL\b", r"\bfull[- ]truckload\b"),
+        "Pick & Pack": (r"\bpick\s*(?:&|and)\s*pack\b",),
+        "Returns Processing": (r"\breturns? (?:processing|management)\b", r"\breverse logistics\b"),
+        "Cold Storage": (r"\bcold storage\b", r"\brefrigerated\b", r"\btemperature[- ]controlled\b"),
+        "Food Grade": (r"\bfood[- ]grade\b",),
+    }.items()
+}
+_EMAIL = re.compile(r"\b[\w.+-]+@[\w-]+(?:\.[\w-]+)*\.[A-Za-z]{2,}\b")
+_PHONE = re.compile(r"(?<!\d)\(?(\d{3})\)?[\s.-]?(\d{3})[\s.-](\d{4})(?!\d)")
+_CITY_STATE = re.compile(r"\b([A-Z][a-zA-Z.'-]+(?:\s[A-Z][a-zA-Z.'-]+){0,2}),\s*([A-Z]{2})\b")
+
+class PageParser(HTMLParser):
+    """Visible text, links and mailto/tel targets of one HTML page."""
+
+    def __init__(self):
+        super().__init__()
+        self.text = []
+        self.links = []
+        self.emails = []
+        self.phones = []
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ("script", "style", "noscript"):
+            self._skip += 1
+        href = dict(attrs).get("href") if tag == "a" else None
+        if not href:
+            return
+        if href.startswith("mailto:"):
+            self.emails.append(href[7:].split("?")[0])
+        elif href.startswith("tel:"):
+            self.phones.append(href[4:])
+        else:
+            self.links.append(href)
+
+    def handle_endtag(self, tag):
+        if tag in ("script", "style", "noscript") and self._skip:
+            self._skip -= 1
+
+    def handle_data(self, data):
+        if not self._skip and data.strip():
+            self.text.append(data.strip())
+
+def parse_page(html: str) -> PageParser:
+    parser = PageParser()
+    parser.feed(html)
+    parser.close()
+    return parser
+
+def normalize_phone(phone: str) -> Optional[str]:
+    match = _PHONE.search(phone or "")
+    return "(%s) %s-%s" % match.groups() if match else None
+
+def extract(pages: List[PageParser]) -> dict:
+    text = "\n".join(line for page in pages for line in page.text)
+    services = [service for service, pattern in SERVICE_PATTERNS.items() if pattern.search(text)]
+    regions = {code for _, code in _CITY_STATE.findall(text) if code in STATE_NAMES}
+    emails = {email.lower() for page in pages for email in page.emails} | {email.lower() for email in _EMAIL.findall(text)}
+    phones = {normalize_phone(phone) for page in pages for phone in page.phones}
+    phones |= {"(%s) %s-%s" % match for match in _PHONE.findall(text)}
+    return {
+        "services": services,
+        "regions_covered": sorted(STATE_NAMES[code] for code in regions),
+        "emails": sorted(emails),
+        "phones": sorted(phone for phone in phones if phone),
+    }
+
+def propose(threepl: dict, found: dict) -> dict:
+    """Changes found on the website that the record does not have yet."""
+    changes = {}
+    services = [service for service in found["services"] if service not in (threepl.get("services") or [])]
+    if services:
+        changes["services"] = {"add": services}
+    known = {region_code(region) for region in threepl.get("regions_covered") or []}
+    regions = [region for region in found["regions_covered"] if region_code(region) not in known]
+    if regions:
+        changes["regions_covered"] = {"add": regions}
+    if found["emails"] and (threepl.get("email") or "").lower() not in found["emails"]:
+        changes["email"] = {"current": threepl.get("email"), "found": found["emails"]}
+    if found["phones"] and normalize_phone(threepl.get("phone")) not in found["phones"]:
+        changes["phone"] = {"current": threepl.get("phone"), "found": found["phones"]}
+    return changes
+
+class PageCache:
+    """Fetched pages on disk with the validators needed for conditional requests."""
+
+    def __init__(self, directory: str = CACHE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, url: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(url.encode("utf-8")).hexdigest() + ".json")
+
+    def get(self, url: str) -> Optional[dict]:
+        try:
+            with open(self._path(url), encoding="utf-8") as entry:
+                return json.load(entry)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, url: str, entry: dict):
+        path = self._path(url)
+        tmp_path = "%s.%d.tmp" % (path, os.getpid())
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            json.dump(entry, handle)
+        os.replace(tmp_path, path)
+
+class PoliteFetcher:
+    """One request at a time per host, spaced by the host delay, honouring robots.txt."""
+
+    def __init__(self, client: httpx.AsyncClient, cache: PageCache, concurrency: int = CONCURRENCY,
+                 host_delay: float = HOST_DELAY_SECONDS, max_age: float = CACHE_MAX_AGE_SECONDS):
+        self.client = client
+        self.cache = cache
+        self.host_delay = host_delay
+        self.max_age = max_age
+        self.stats = {"requests": 0, "not_modified": 0, "cache_hits": 0, "errors": 0, "disallowed": 0}
+        self._slots = asyncio.Semaphore(concurrency)
+        self._host_locks: Dict[str, asyncio.Lock] = {}
+        self._host_delays: Dict[str, float] = {}
+        self._next_request: Dict[str, float] = {}
+        self._robots: Dict[str, asyncio.Future] = {}
+        self._fetches: Dict[str, asyncio.Future] = {}
+
+    async def _request(self, url: str, headers: dict) -> httpx.Response:
+        host = urlsplit(url).netloc
+        lock = self._host_locks.setdefault(host, asyncio.Lock())
+        # Waiting for a busy host does not hold one of the global slots
+        async with lock:
+            delay = self._next_request.get(host, 0) - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                async with self._slots:
+                    self.stats["requests"] += 1
+                    return await self.client.get(url, headers=headers)
+            finally:
+                self._next_request[host] = time.monotonic() + self._host_delays.get(host, self.host_delay)
+
+    async def _load_robots(self, origin: str) -> Optional[RobotFileParser]:
+        try:
+            response = await self._request(origin + "/robots.txt", {})
+        except REQUEST_ERRORS:
+            return None
+        if response.status_code != 200:
+            # No robots.txt means no restrictions
+            return None
+        robots = RobotFileParser()
+        robots.parse(response.text.splitlines())
+        # read() would do this; crawl_delay() ignores unmarked parsers
+        robots.modified()
+        crawl_delay = robots.crawl_delay(USER_AGENT)
+        if crawl_delay:
+            self._host_delays[urlsplit(origin).netloc] = max(float(crawl_delay), self.host_delay)
+        return robots
+
+    async def _allowed(self, url: str) -> bool:
+        parts = urlsplit(url)
+        origin = "%s://%s" % (parts.scheme, parts.netloc)
+        if origin not in self._robots:
+            # Shared so concurrent crawls of one host fetch robots.txt once
+            self._robots[origin] = asyncio.ensure_future(self._load_robots(origin))
+        robots = await self._robots[origin]
+        return robots is None or robots.can_fetch(USER_AGENT, url)
+
+    async def fetch(self, url: str) -> Optional[Tuple[str, str]]:
+        """Return (final url, html) from the cache or the site, None when unavailable."""
+        # Each URL is fetched once per run, however many 3PLs link to it
+        if url not in self._fetches:
+            self._fetches[url] = asyncio.ensure_future(self._fetch(url))
+        return await self._fetches[url]
+
+    async def _fetch(self, url: str) -> Optional[Tuple[str, str]]:
+        cached = self.cache.get(url)
+        if cached and time.time() - cached["fetched_at"] < self.max_age:
+            self.stats["cache_hits"] += 1
+            return cached["final_url"], cached["body"]
+        if not await self._allowed(url):
+            self.stats["disallowed"] += 1
+            return None
+
+        headers = {}
+        if cached and cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached and cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+        try:
+            response = await self._request(url, headers)
+        except REQUEST_ERRORS as exc:
+            self.stats["errors"] += 1
+            logger.warning("Fetching %s failed: %s", url, exc)
+            return (cached["final_url"], cached["body"]) if cached else None
+
+        if response.status_code == 304 and cached:
+            self.stats["not_modified"] += 1
+            cached["fetched_at"] = time.time()
+            self.cache.put(url, cached)
+            return cached["final_url"], cached["body"]
+        content_type = response.headers.get("content-type", "")
+        if response.status_code != 200 or "html" not in content_type or len(response.content) > MAX_BODY_BYTES:
+            return None
+        self.cache.put(url, {
+            "url": url,
+            "final_url": str(response.url),
+            "etag": response.headers.get("etag"),
+            "last_modified": response.headers.get("last-modified"),
+            "fetched_at": time.time(),
+            "body": response.text,
+        })
+        return str(response.url), response.text
+
+def site_url(website: str) -> str:
+    website = website.strip()
+    return website if "://" in website else "https://" + website
+
+async def crawl_site(fetcher: PoliteFetcher, website: str) -> Tuple[List[PageParser], List[str]]:
+    home = site_url(website)
+    host = urlsplit(home).netloc
+    queue, seen = [home], {home}
+    pages, sources = [], []
+    while queue and len(pages) < MAX_PAGES_PER_SITE:
+        fetched = await fetcher.fetch(queue.pop(0))
+        if fetched is None:
+            continue
+        final_url, html = fetched
+        page = parse_page(html)
+        pages.append(page)
+        sources.append(final_url)
+        for href in page.links:
+            link = urljoin(final_url, href).split("#")[0]
+            if urlsplit(link).netloc == host and link not in seen and FOLLOW_LINKS.search(urlsplit(link).path):
+                seen.add(link)
+                queue.append(link)
+    return pages, sources
+
+async def enrich(threepls: List[dict], client: httpx.AsyncClient, cache: PageCache,
+                 concurrency: int = CONCURRENCY, host_delay: float = HOST_DELAY_SECONDS) -> Tuple[List[dict], dict]:
+    fetcher = PoliteFetcher(client, cache, concurrency, host_delay)
+
+    async def enrich_one(threepl: dict) -> Optional[dict]:
+        try:
+            pages, sources = await crawl_site(fetcher, threepl["website"])
+        except ValueError as exc:
+            # Unparseable website; the other 3PLs are still crawled
+            logger.warning("Skipping %s: %s", threepl["website"], exc)
+            return None
+        if not pages:
+            return None
+        found = extract(pages)
+        changes = propose(threepl, found)
+        if not changes:
+            return None
+        return {
+            "threepl_id": threepl["id"],
+            "company_name": threepl.get("company_name"),
+            "website": threepl["website"],
+            "changes": changes,
+            "sources": sources,
+            "status": "pending",
+            "created_at": datetime.now(),
+        }
+
+    results = await asyncio.gather(*(enrich_one(threepl) for threepl in threepls))
+    return [proposal for proposal in results if proposal], fetcher.stats
+
+def save_proposals(db, proposals: List[dict]):
+    # One pending proposal per 3PL, replaced by the latest crawl
+    for proposal in proposals:
+        db[PROPOSALS_COLLECTION].replace_one(
+            {"threepl_id": proposal["threepl_id"], "status": "pending"}, proposal, upsert=True
+        )
+
+async def run(db, concurrency: int = CONCURRENCY) -> dict:
+    threepls = list(db.three_pls.find(
+        {"website": {"$nin": [None, ""]}},
+        {"_id": 0, "id": 1, "company_name": 1, "website": 1, "services": 1, "regions_covered": 1, "email": 1, "phone": 1}
+    ))
+    async with httpx.AsyncClient(
+        follow_redirects=True,
+        timeout=httpx.Timeout(10.0),
+        headers={"User-Agent": USER_AGENT},
+        limits=httpx.Limits(max_connections=concurrency),
+    ) as client:
+        proposals, stats = await enrich(threepls, client, PageCache(), concurrency)
+    save_proposals(db, proposals)
+    return {"threepls": len(threepls), "proposals": len(proposals), **stats}
+
+def main():
+    from pymongo import MongoClient
+
+    if len(sys.argv) < 2 or sys.argv[1] != "run":
+        print(__doc__)
+        sys.exit(1)
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else CONCURRENCY
+
+    logging.basicConfig(level=logging.INFO)
+    db = MongoClient(os.getenv("MONGO_URL")).growe_platform
+    stats = asyncio.run(run(db, concurrency))
+    print("✅ Crawled %(threepls)d 3PL websites: %(proposals)d proposals, %(requests)d requests, "
+          "%(not_modified)d not modified, %(cache_hits)d cache hits, %(errors)d errors" % stats)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+import threading
+from collections import Counter
+from typing import List, Optional
+
+from pymongo import UpdateOne
+
+from regions import STATE_NAMES, region_code
+
+# Directory facets; regions are counted by state abbreviation so "California",
+# "california" and a warehouse's "CA" are the same key
+FACET_FIELDS = ("services", "region_codes", "status", "rep_owner")
+FACET_NAMES = {"region_codes": "regions"}
+
+def region_codes(regions: List[str]) -> List[str]:
+    return sorted({code for code in map(region_code, regions or []) if code})
+
+def normalize_threepl(threepl: dict) -> dict:
+    threepl["region_codes"] = region_codes(threepl.get("regions_covered"))
+    return threepl
+
+def threepl_filter(
+    services: Optional[List[str]] = None,
+    regions: Optional[List[str]] = None,
+    status: Optional[List[str]] = None,
+    rep_owner: Optional[List[str]] = None,
+) -> dict:
+    """Values within a facet are OR'd, facets are AND'd."""
+    match = {}
+    if services:
+        match["services"] = {"$in": services}
+    if regions:
+        unknown = [region for region in regions if region_code(region) is None]
+        if unknown:
+            raise ValueError("Unknown region: %s" % ", ".join(unknown))
+        match["region_codes"] = {"$in": region_codes(regions)}
+    if status:
+        match["status"] = {"$in": status}
+    if rep_owner:
+        match["rep_owner"] = {"$in": rep_owner}
+    return match
+
+def facet_pipeline(match: Optional[dict] = None) -> list:
+    facets = {
+        field: [
+            {"$unwind": "$" + field},
+            {"$match": {field: {"$nin": [None, ""]}}},
+            {"$group": {"_id": "$" + field, "count": {"$sum": 1}}},
+        ]
+        for field in FACET_FIELDS
+    }
+    facets["total"] = [{"$count": "count"}]
+    return [{"$match": match or {}}, {"$facet": facets}]
+
+def _values(threepl: Optional[dict], field: str) -> list:
+    if not threepl:
+        return []
+    value = threepl.get(field)
+    values = value if isinstance(value, list) else [value]
+    return [value for value in values if value not in (None, "")]
+
+def _format(counts: dict, total: int) -> dict:
+    result = {"total": total}
+    for field in FACET_FIELDS:
+        entries = []
+        for value, count in sorted(counts[field].items(), key=lambda item: (-item[1], str(item[0]))):
+            if count <= 0:
+                continue
+            entry = {"value": value}
+            if field == "region_codes":
+                entry["label"] = STATE_NAMES.get(value, value)
+            entry["count"] = count
+            entries.append(entry)
+        result[FACET_NAMES.get(field, field)] = entries
+    return result
+
+def count_facets(db, match: Optional[dict] = None) -> dict:
+    (row,) = db.three_pls.aggregate(facet_pipeline(match))
+    counts = {field: {entry["_id"]: entry["count"] for entry in row[field]} for field in FACET_FIELDS}
+    total = row["total"][0]["count"] if row["total"] else 0
+    return _format(counts, total)
+
+class FacetCounts:
+    """Unfiltered facet counts, adjusted in place as this worker writes 3PLs."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = None
+        self._total = 0
+
+    @property
+    def loaded(self) -> bool:
+        return self._counts is not None
+
+    def load(self, db):
+        (row,) = db.three_pls.aggregate(facet_pipeline())
+        counts = {field: Counter({entry["_id"]: entry["count"] for entry in row[field]}) for field in FACET_FIELDS}
+        with self._lock:
+            self._counts = counts
+            self._total = row["total"][0]["count"] if row["total"] else 0
+
+    def apply(self, before: Optional[dict], after: Optional[dict]):
+        # before is None for a create, after is None for a delete
+        with self._lock:
+            if self._counts is None:
+                return
+            for field in FACET_FIELDS:
+                self._counts[field].subtract(_values(before, field))
+                self._counts[field].update(_values(after, field))
+            self._total += (after is not None) - (before is not None)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return _format(self._counts, self._total)
+
+def backfill_region_codes(db) -> int:
+    # 3PLs written before region_codes existed, e.g. by seed_data.py
+    updates = [
+        UpdateOne({"_id": threepl["_id"]}, {"$set": {"region_codes": region_codes(threepl.get("regions_covered"))}})
+        for threepl in db.three_pls.find({"region_codes": {"$exists": False}}, {"regions_covered": 1})
+    ]
+    if updates:
+        db.three_pls.bulk_write(updates, ordered=False)
+    return len(updates)
@@ -0,0 +1,127 @@
+"""Offline geocoding of US addresses to ZIP, city or state centroids.
+
+The bundled table (data/zip_centroids.csv.gz) holds one centroid per ZIP code,
+derived from the MIT-licensed `zipcodes` package data.
+"""
+import csv
+import gzip
+import os
+import threading
+from functools import lru_cache
+from typing import Optional, Tuple
+
+import numpy as np
+
+from regions import region_centroid, region_code
+
+ZIP_CENTROIDS_PATH = os.getenv(
+    "ZIP_CENTROIDS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "zip_centroids.csv.gz")
+)
+GEOCODE_CACHE_SIZE = int(os.getenv("GEOCODE_CACHE_SIZE", "16384"))
+
+def normalize_zip(zip_code: str) -> Optional[int]:
+    # "02134", "2134" and "02134-1234" all resolve to 2134
+    digits = (zip_code or "").strip().split("-")[0]
+    if not digits.isdigit() or len(digits) > 5:
+        return None
+    return int(digits)
+
+class Geocoder:
+    """ZIP centroids in sorted arrays, searched with np.searchsorted."""
+
+    def __init__(self, path: str = ZIP_CENTROIDS_PATH, cache_size: int = GEOCODE_CACHE_SIZE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._zips = None
+        self._lat = None
+        self._lng = None
+        self._states = None
+        self._cities = {}
+        self.geocode = lru_cache(maxsize=cache_size)(self._geocode)
+
+    @property
+    def loaded(self) -> bool:
+        return self._zips is not None
+
+    def load(self):
+        with self._lock:
+            if self.loaded:
+                return
+            zips, lats, lngs, states = [], [], [], []
+            city_points = {}
+            with gzip.open(self.path, "rt", encoding="utf-8", newline="") as table:
+                for row in csv.DictReader(table):
+                    lat, lng = float(row["lat"]), float(row["lng"])
+                    zips.append(int(row["zip"]))
+                    lats.append(lat)
+                    lngs.append(lng)
+                    states.append(row["state"])
+                    city_points.setdefault((row["city"].lower(), row["state"]), []).append((lat, lng))
+
+            order = np.argsort(zips, kind="stable")
+            self._lat = np.asarray(lats, dtype=np.float32)[order]
+            self._lng = np.asarray(lngs, dtype=np.float32)[order]
+            self._states = np.asarray(states, dtype="U2")[order]
+            # City centroid is the mean of its ZIP centroids
+            self._cities = {
+                key: tuple(round(float(value), 4) for value in np.mean(points, axis=0))
+                for key, points in city_points.items()
+            }
+            self._zips = np.asarray(zips, dtype=np.int32)[order]
+        self.geocode.cache_clear()
+
+    def _zip_position(self, zip_number: int) -> Optional[int]:
+        position = int(np.searchsorted(self._zips, zip_number))
+        if position < len(self._zips) and self._zips[position] == zip_number:
+            return position
+        return None
+
+    def _nearest_in_prefix(self, zip_number: int) -> Optional[int]:
+        # Closest ZIP sharing the 3-digit sectional center prefix
+        position = int(np.searchsorted(self._zips, zip_number))
+        candidates = [p for p in (position - 1, position) if 0 <= p < len(self._zips)]
+        candidates = [p for p in candidates if self._zips[p] // 100 == zip_number // 100]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda p: abs(int(self._zips[p]) - zip_number))
+
+    def _point(self, position: int) -> Tuple[float, float]:
+        return round(float(self._lat[position]), 4), round(float(self._lng[position]), 4)
+
+    def _geocode(self, zip_code: str = "", city: str = "", state: str = "") -> Optional[Tuple[float, float, str]]:
+        """Return (lat, lng, precision) with precision one of zip, city, zip3 or state."""
+        if not self.loaded:
+            self.load()
+        state_code = region_code(state)
+        zip_number = normalize_zip(zip_code)
+
+        if zip_number is not None:
+            position = self._zip_position(zip_number)
+            # A ZIP in a different state than the address is a typo; trust the city
+            if position is not None and state_code in (None, self._states[position]):
+                return (*self._point(position), "zip")
+
+        if city and state_code:
+            point = self._cities.get((city.strip().lower(), state_code))
+            if point:
+                return (*point, "city")
+
+        if zip_number is not None:
+            position = self._nearest_in_prefix(zip_number)
+            if position is not None and state_code in (None, self._states[position]):
+                return (*self._point(position), "zip3")
+
+        centroid = region_centroid(state)
+        if centroid:
+            return (*centroid, "state")
+        return None
+
+    def fill_coordinates(self, warehouse: dict) -> bool:
+        """Set lat/lng on a warehouse that has none; False when the address can't be placed."""
+        if warehouse.get("lat") is not None and warehouse.get("lng") is not None:
+            return True
+        result = self.geocode(warehouse.get("zip_code") or "", warehouse.get("city") or "", warehouse.get("state") or "")
+        if result is None:
+            return False
+        warehouse["lat"], warehouse["lng"], warehouse["geocode_precision"] = result
+        return True
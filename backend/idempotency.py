@@ -0,0 +1,112 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional
+
+from pymongo.errors import DuplicateKeyError
+
+KEYS_COLLECTION = "idempotency_keys"
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+IDEMPOTENCY_MEMORY_SIZE = int(os.getenv("IDEMPOTENCY_MEMORY_SIZE", "10000"))
+MAX_KEY_LENGTH = 255
+# A claim older than this is assumed to belong to a request that died
+IN_PROGRESS_TIMEOUT_SECONDS = 60
+
+class IdempotencyError(Exception):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+def request_fingerprint(body: dict) -> str:
+    encoded = json.dumps(body, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+class IdempotencyStore:
+    """Completed responses by key: per-worker LRU in front of a TTL-indexed collection."""
+
+    def __init__(self, ttl_seconds: int = IDEMPOTENCY_TTL_SECONDS, memory_size: int = IDEMPOTENCY_MEMORY_SIZE):
+        self.ttl_seconds = ttl_seconds
+        self.memory_size = memory_size
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, key: str, fingerprint: str, response: dict):
+        with self._lock:
+            self._memory[key] = (time.monotonic() + self.ttl_seconds, fingerprint, response)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+    def _recall(self, key: str):
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            return entry
+
+    @staticmethod
+    def _check(fingerprint: str, stored_fingerprint: str):
+        if fingerprint != stored_fingerprint:
+            raise IdempotencyError(422, "Idempotency-Key was already used with a different request body")
+
+    def begin(self, db, scope: str, key: str, fingerprint: str) -> Optional[dict]:
+        """Return the stored response for a repeat, or claim the key and return None."""
+        if not key or len(key) > MAX_KEY_LENGTH:
+            raise IdempotencyError(400, "Idempotency-Key must be 1-%d characters" % MAX_KEY_LENGTH)
+        key = "%s:%s" % (scope, key)
+
+        remembered = self._recall(key)
+        if remembered is not None:
+            self._check(fingerprint, remembered[1])
+            return remembered[2]
+
+        try:
+            db[KEYS_COLLECTION].insert_one({
+                "_id": key,
+                "fingerprint": fingerprint,
+                "status": "in_progress",
+                "created_at": datetime.utcnow(),
+            })
+            return None
+        except DuplicateKeyError:
+            stored = db[KEYS_COLLECTION].find_one({"_id": key})
+
+        if stored is None:
+            # Expired between the insert and the read; the caller may retry
+            raise IdempotencyError(409, "Idempotency-Key is being processed, retry shortly")
+        self._check(fingerprint, stored["fingerprint"])
+        if stored["status"] != "completed":
+            taken_over = db[KEYS_COLLECTION].find_one_and_update(
+                {
+                    "_id": key,
+                    "status": "in_progress",
+                    "created_at": {"$lt": datetime.utcnow() - timedelta(seconds=IN_PROGRESS_TIMEOUT_SECONDS)}
+                },
+                {"$set": {"created_at": datetime.utcnow()}}
+            )
+            if taken_over is not None:
+                return None
+            raise IdempotencyError(409, "A request with this Idempotency-Key is still in progress")
+        self._remember(key, stored["fingerprint"], stored["response"])
+        return stored["response"]
+
+    def complete(self, db, scope: str, key: str, fingerprint: str, response: dict):
+        key = "%s:%s" % (scope, key)
+        db[KEYS_COLLECTION].update_one(
+            {"_id": key},
+            {"$set": {"status": "completed", "response": response}}
+        )
+        self._remember(key, fingerprint, response)
+
+    def release(self, db, scope: str, key: str):
+        # The request failed; let a retry run it again
+        db[KEYS_COLLECTION].delete_one({"_id": "%s:%s" % (scope, key), "status": "in_progress"})
@@ -0,0 +1,105 @@
+import logging
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+from idempotency import IDEMPOTENCY_TTL_SECONDS
+
+# Indexes every worker expects; /api/ready reports any that are missing
+INDEXES = {
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email_1"),
+    ],
+    "three_pls": [
+        IndexModel([("id", ASCENDING)], name="id_1"),
+        # Directory facets; services and region_codes are multikey
+        IndexModel([("services", ASCENDING)], name="services_1"),
+        IndexModel([("region_codes", ASCENDING)], name="region_codes_1"),
+        IndexModel([("status", ASCENDING)], name="status_1"),
+        IndexModel([("rep_owner", ASCENDING)], name="rep_owner_1"),
+    ],
+    "warehouses": [
+        IndexModel([("id", ASCENDING)], name="id_1"),
+        IndexModel([("threepl_id", ASCENDING)], name="threepl_id_1"),
+    ],
+    "warehouse_view": [
+        # Per-3PL map filters on the embedded str(_id), see threepl_match;
+        # rows are keyed by the warehouse _id
+        IndexModel([("threepl.id", ASCENDING)], name="threepl.id_1"),
+        # Rows whose 3PL is not in the directory
+        IndexModel([("threepl_id", ASCENDING)], name="threepl_id_1"),
+        IndexModel([("view_refreshed_at", ASCENDING)], name="view_refreshed_at_1"),
+    ],
+    "leases": [
+        IndexModel([("id", ASCENDING)], name="id_1"),
+        # Expiring lease lookups: equality on status, range on end_date
+        IndexModel([("status", ASCENDING), ("end_date", ASCENDING)], name="status_1_end_date_1"),
+        # Sorted lease listings, see LEASE_QUERY_FIELDS in server.py
+        IndexModel([("end_date", ASCENDING)], name="end_date_1"),
+        IndexModel([("threepl_id", ASCENDING), ("end_date", ASCENDING)], name="threepl_id_1_end_date_1"),
+        IndexModel([("status", ASCENDING), ("monthly_rent", ASCENDING)], name="status_1_monthly_rent_1"),
+        # Portfolio-wide due action items; multikey over the action_items array
+        IndexModel(
+            [("action_items.status", ASCENDING), ("action_items.due_date", ASCENDING)],
+            name="action_items.status_1_action_items.due_date_1",
+        ),
+    ],
+    "lease_documents.files": [
+        # Content-hash lookups for downloads; unique so concurrent uploads of
+        # the same file keep one copy
+        IndexModel([("metadata.sha256", ASCENDING)], name="metadata.sha256_1", unique=True),
+    ],
+    "deals": [
+        IndexModel([("id", ASCENDING)], name="id_1"),
+        IndexModel([("stage", ASCENDING)], name="stage_1"),
+    ],
+    "deal_events": [
+        IndexModel([("deal_id", ASCENDING), ("ts", ASCENDING)], name="deal_id_1_ts_1"),
+        IndexModel([("rep_owner", ASCENDING), ("ts", DESCENDING)], name="rep_owner_1_ts_-1"),
+        IndexModel([("actor", ASCENDING), ("ts", DESCENDING)], name="actor_1_ts_-1"),
+    ],
+    "enrichment_proposals": [
+        IndexModel([("threepl_id", ASCENDING), ("status", ASCENDING)], name="threepl_id_1_status_1"),
+        IndexModel([("status", ASCENDING), ("created_at", DESCENDING)], name="status_1_created_at_-1"),
+    ],
+    "industry_news": [
+        IndexModel([("id", ASCENDING)], name="id_1"),
+        # Deduplicates syndicated copies of the same story
+        IndexModel([("content_hash", ASCENDING)], name="content_hash_1", unique=True),
+        IndexModel([("published_date", DESCENDING), ("id", DESCENDING)], name="published_date_-1_id_-1"),
+        IndexModel([("category", ASCENDING), ("published_date", DESCENDING), ("id", DESCENDING)], name="category_1_published_date_-1_id_-1"),
+        IndexModel([("trend_key", DESCENDING), ("id", DESCENDING)], name="trend_key_-1_id_-1"),
+        IndexModel([("category", ASCENDING), ("trend_key", DESCENDING), ("id", DESCENDING)], name="category_1_trend_key_-1_id_-1"),
+    ],
+    "idempotency_keys": [
+        IndexModel([("created_at", ASCENDING)], name="created_at_ttl", expireAfterSeconds=IDEMPOTENCY_TTL_SECONDS),
+    ],
+    "kpi_snapshot_slots": [
+        IndexModel([("created_at", ASCENDING)], name="created_at_ttl", expireAfterSeconds=7 * 86400),
+    ],
+    "shipper_leads": [
+        # Unique so replaying buffered intake journals cannot duplicate leads
+        IndexModel([("id", ASCENDING)], name="id_1", unique=True),
+        IndexModel([("status", ASCENDING), ("created_at", DESCENDING)], name="status_1_created_at_-1"),
+    ],
+}
+
+logger = logging.getLogger("growe.indexes")
+
+def ensure_indexes(db):
+    for collection, indexes in INDEXES.items():
+        try:
+            db[collection].create_indexes(indexes)
+        except OperationFailure:
+            # e.g. existing duplicates for a unique index; /api/ready reports it
+            logger.exception("Creating indexes on %s failed", collection)
+
+def missing_indexes(db) -> list:
+    missing = []
+    for collection, indexes in INDEXES.items():
+        existing = {index["name"] for index in db[collection].list_indexes()}
+        for index in indexes:
+            name = index.document["name"]
+            if name not in existing:
+                missing.append("%s.%s" % (collection, name))
+    return missing
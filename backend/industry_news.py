@@ -0,0 +1,261 @@
+"""Industry news from RSS/Atom feeds.
+
+Trending uses an exponentially decaying hit counter kept in log space:
+trend_key = ln(sum of e^(t_i / tau)) over hit times t_i, so comparing
+trend_key orders articles by their decayed score at any common moment and
+"currently trending" is an index range query.
+"""
+import hashlib
+import html
+import json
+import logging
+import math
+import os
+import re
+import uuid
+import xml.etree.ElementTree as ElementTree
+from datetime import datetime, timedelta
+from email.utils import parsedate_to_datetime
+from typing import List, Optional, Tuple
+
+import httpx
+from pymongo import DESCENDING, ReturnDocument
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger("growe.news")
+
+NEWS_COLLECTION = "industry_news"
+FEEDS_COLLECTION = "news_feeds"
+NEWS_FEEDS_PATH = os.getenv(
+    "NEWS_FEEDS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "news_feeds.json")
+)
+NEWS_POLL_SECONDS = float(os.getenv("NEWS_POLL_SECONDS", "900"))
+TREND_HALF_LIFE_HOURS = float(os.getenv("NEWS_TREND_HALF_LIFE_HOURS", "24"))
+# Decayed score at which an article counts as trending; each source or view
+# adds 1.0, so by default two mentions within about a half-life trend
+TRENDING_THRESHOLD = float(os.getenv("NEWS_TRENDING_THRESHOLD", "1.5"))
+TAU_HOURS = TREND_HALF_LIFE_HOURS / math.log(2)
+WORDS_PER_MINUTE = 200
+
+ATOM = "{http://www.w3.org/2005/Atom}"
+_TAGS = re.compile(r"<[^>]+>")
+_SPACE = re.compile(r"\s+")
+_WORDS = re.compile(r"\w+")
+
+def load_feeds(path: str = NEWS_FEEDS_PATH) -> List[dict]:
+    # [{"url": ..., "source": ..., "category": ...}, ...]
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as config:
+        return json.load(config)
+
+def trend_time(when: datetime) -> float:
+    return when.timestamp() / 3600 / TAU_HOURS
+
+def trend_score(trend_key: float, now: Optional[datetime] = None) -> float:
+    return math.exp(trend_key - trend_time(now or datetime.now()))
+
+def trending_cutoff(now: Optional[datetime] = None) -> float:
+    return math.log(TRENDING_THRESHOLD) + trend_time(now or datetime.now())
+
+def plain_text(markup: Optional[str]) -> str:
+    return _SPACE.sub(" ", html.unescape(_TAGS.sub(" ", markup or ""))).strip()
+
+def _words(markup: Optional[str]) -> str:
+    return " ".join(_WORDS.findall(plain_text(markup).lower()))
+
+def content_hash(title: str, summary: str) -> str:
+    # Same story syndicated under different URLs hashes the same
+    normalized = "%s\n%s" % (_words(title), _words(summary)[:300])
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+def read_time(text: str) -> str:
+    return "%d min" % max(1, round(len(text.split()) / WORDS_PER_MINUTE))
+
+def _parse_date(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        try:
+            parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    # Stored naive in local time like every other date in the API
+    return parsed.astimezone().replace(tzinfo=None) if parsed.tzinfo else parsed
+
+def _text(element, path: str) -> Optional[str]:
+    found = element.find(path)
+    return found.text if found is not None and found.text else None
+
+def parse_feed(body: bytes) -> List[dict]:
+    """Entries of an RSS 2.0 or Atom document as plain dicts."""
+    root = ElementTree.fromstring(body)
+    entries = []
+    if root.tag == ATOM + "feed":
+        for entry in root.findall(ATOM + "entry"):
+            link = entry.find(ATOM + "link[@rel='alternate']")
+            if link is None:
+                link = entry.find(ATOM + "link")
+            entries.append({
+                "title": plain_text(_text(entry, ATOM + "title")),
+                "summary": plain_text(_text(entry, ATOM + "summary") or _text(entry, ATOM + "content")),
+                "url": link.get("href") if link is not None else None,
+                "author": _text(entry, ATOM + "author/" + ATOM + "name"),
+                "published_date": _parse_date(_text(entry, ATOM + "published") or _text(entry, ATOM + "updated")),
+                "tags": [category.get("term") for category in entry.findall(ATOM + "category") if category.get("term")],
+            })
+    else:
+        for item in root.iter("item"):
+            entries.append({
+                "title": plain_text(_text(item, "title")),
+                "summary": plain_text(_text(item, "description")),
+                "url": _text(item, "link"),
+                "author": _text(item, "author") or _text(item, "{http://purl.org/dc/elements/1.1/}creator"),
+                "published_date": _parse_date(_text(item, "pubDate")),
+                "tags": [category.text.strip() for category in item.findall("category") if category.text],
+            })
+    return [entry for entry in entries if entry["title"]]
+
+def build_article(entry: dict, source: str, category: str, now: datetime, initial_score: float = 1.0) -> dict:
+    published = entry.get("published_date") or now
+    summary = entry.get("summary") or ""
+    return {
+        "id": str(uuid.uuid4()),
+        "title": entry["title"],
+        "summary": summary[:500],
+        "full_content": entry.get("full_content"),
+        "url": entry.get("url"),
+        "source": source,
+        "sources": [source],
+        "category": category,
+        "author": entry.get("author"),
+        "tags": entry.get("tags") or [],
+        "published_date": published,
+        "read_time": entry.get("read_time") or read_time(entry.get("full_content") or summary),
+        "content_hash": content_hash(entry["title"], summary),
+        "trend_key": math.log(initial_score) + trend_time(now),
+        "created_at": now,
+    }
+
+def _add_hit(trend_key, hit: float) -> dict:
+    # ln(e^a + e^b) = max + ln(1 + e^(min - max)), computed in the update
+    high = {"$max": [trend_key, hit]}
+    low = {"$min": [trend_key, hit]}
+    return {"$add": [high, {"$ln": {"$add": [1, {"$exp": {"$subtract": [low, high]}}]}}]}
+
+def record_hit(db, query: dict, now: Optional[datetime] = None, extra: Optional[dict] = None):
+    return db[NEWS_COLLECTION].find_one_and_update(
+        query,
+        [{"$set": {"trend_key": _add_hit("$trend_key", trend_time(now or datetime.now())), **(extra or {})}}],
+        projection={"_id": 0, "content_hash": 0, "sources": 0},
+        return_document=ReturnDocument.AFTER,
+    )
+
+def store_articles(db, entries: List[dict], source: str, category: str, now: Optional[datetime] = None) -> Tuple[int, int]:
+    """Insert new articles; a story already seen from another source gains a trend hit."""
+    now = now or datetime.now()
+    created = reposted = 0
+    for entry in entries:
+        article = build_article(entry, source, category, now)
+        result = db[NEWS_COLLECTION].update_one(
+            {"content_hash": article["content_hash"]}, {"$setOnInsert": article}, upsert=True
+        )
+        if result.upserted_id is not None:
+            created += 1
+            continue
+        # Re-polling the same feed is not a new mention
+        if record_hit(db, {"content_hash": article["content_hash"], "sources": {"$ne": source}}, now,
+                      {"sources": {"$concatArrays": ["$sources", [source]]}}):
+            reposted += 1
+    return created, reposted
+
+def claim_feed(db, feed: dict, interval_seconds: float, now: Optional[datetime] = None) -> Optional[dict]:
+    # Every worker runs the poller; the first to claim a feed polls it
+    now = now or datetime.now()
+    db[FEEDS_COLLECTION].update_one({"_id": feed["url"]}, {"$setOnInsert": {"next_poll_at": now}}, upsert=True)
+    return db[FEEDS_COLLECTION].find_one_and_update(
+        {"_id": feed["url"], "next_poll_at": {"$lte": now}},
+        {"$set": {"next_poll_at": now + timedelta(seconds=interval_seconds), "polled_at": now}},
+        return_document=ReturnDocument.AFTER,
+    )
+
+def save_validators(db, feed: dict, response: httpx.Response):
+    db[FEEDS_COLLECTION].update_one({"_id": feed["url"]}, {"$set": {
+        "etag": response.headers.get("etag"),
+        "last_modified": response.headers.get("last-modified"),
+        "status": response.status_code,
+    }})
+
+async def poll_feed(db, client: httpx.AsyncClient, feed: dict, interval_seconds: float = NEWS_POLL_SECONDS) -> Optional[Tuple[int, int]]:
+    state = await run_in_threadpool(claim_feed, db, feed, interval_seconds)
+    if state is None:
+        return None
+    headers = {}
+    if state.get("etag"):
+        headers["If-None-Match"] = state["etag"]
+    if state.get("last_modified"):
+        headers["If-Modified-Since"] = state["last_modified"]
+    response = await client.get(feed["url"], headers=headers)
+    if response.status_code == 304:
+        return 0, 0
+    response.raise_for_status()
+    entries = parse_feed(response.content)
+    counts = await run_in_threadpool(
+        store_articles, db, entries, feed.get("source") or feed["url"], feed.get("category", "Industry")
+    )
+    await run_in_threadpool(save_validators, db, feed, response)
+    return counts
+
+async def poll_feeds(db, client: httpx.AsyncClient, feeds: List[dict], interval_seconds: float = NEWS_POLL_SECONDS):
+    for feed in feeds:
+        try:
+            counts = await poll_feed(db, client, feed, interval_seconds)
+        except (httpx.HTTPError, ElementTree.ParseError) as exc:
+            logger.warning("Polling %s failed: %s", feed["url"], exc)
+            continue
+        if counts and any(counts):
+            logger.info("%s: %d new articles, %d reposted", feed["url"], *counts)
+
+def present(article: dict, now: Optional[datetime] = None) -> dict:
+    article["trending"] = trend_score(article.pop("trend_key"), now) >= TRENDING_THRESHOLD
+    return article
+
+def list_news(db, category: Optional[str] = None, trending: Optional[bool] = None,
+              cursor: Optional[str] = None, limit: int = 20) -> Tuple[List[dict], Optional[str]]:
+    """One page of articles and the cursor for the next page."""
+    now = datetime.now()
+    query = {}
+    if category:
+        query["category"] = category
+    if trending:
+        # Index range scan on trend_key, hottest first
+        query["trend_key"] = {"$gte": trending_cutoff(now)}
+        sort = [("trend_key", DESCENDING), ("id", DESCENDING)]
+    else:
+        if trending is False:
+            query["trend_key"] = {"$lt": trending_cutoff(now)}
+        sort = [("published_date", DESCENDING), ("id", DESCENDING)]
+    if cursor:
+        query.update(_after_cursor(cursor, sort[0][0]))
+
+    projection = {"_id": 0, "content_hash": 0, "sources": 0, "full_content": 0}
+    articles = list(db[NEWS_COLLECTION].find(query, projection).sort(sort).limit(limit + 1))
+    next_cursor = None
+    if len(articles) > limit:
+        articles = articles[:limit]
+        last = articles[-1]
+        key = last[sort[0][0]]
+        next_cursor = "%s|%s" % (key.isoformat() if isinstance(key, datetime) else repr(key), last["id"])
+    return [present(article, now) for article in articles], next_cursor
+
+def _after_cursor(cursor: str, field: str) -> dict:
+    try:
+        value, last_id = cursor.rsplit("|", 1)
+        value = datetime.fromisoformat(value) if field == "published_date" else float(value)
+    except ValueError:
+        raise ValueError("Invalid cursor")
+    # Keyset pagination: strictly after the last item of the previous page
+    return {"$or": [{field: {"$lt": value}}, {field: value, "id": {"$lt": last_id}}]}
@@ -0,0 +1,101 @@
+import re
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from pymongo.errors import CollectionInvalid, DuplicateKeyError
+
+HISTORY_COLLECTION = "kpi_history"
+SLOTS_COLLECTION = "kpi_snapshot_slots"
+
+KPI_FIELDS = ("total_3pls", "total_warehouses", "active_deals", "expiring_leases", "new_leads", "pipeline_value")
+
+# Longest range returned without downsampling to fewer points
+MAX_POINTS = 300
+
+BUCKET_UNITS = {"m": ("minute", 60), "h": ("hour", 3600), "d": ("day", 86400), "w": ("week", 604800)}
+AUTO_BUCKETS = ("5m", "15m", "30m", "1h", "3h", "6h", "12h", "1d", "1w")
+
+def compute_kpis(db, now: Optional[datetime] = None) -> dict:
+    now = now or datetime.now()
+    pipeline = list(db.deals.aggregate([
+        {"$match": {"stage": {"$nin": ["Won", "Lost"]}}},
+        {"$group": {"_id": None, "count": {"$sum": 1}, "value": {"$sum": {"$ifNull": ["$value", 0]}}}}
+    ]))
+    return {
+        "total_3pls": db.three_pls.count_documents({}),
+        "total_warehouses": db.warehouses.count_documents({}),
+        "active_deals": pipeline[0]["count"] if pipeline else 0,
+        "expiring_leases": db.leases.count_documents({
+            "status": "Active",
+            "end_date": {"$lte": now + timedelta(days=180)}
+        }),
+        "new_leads": db.shipper_leads.count_documents({"status": "New"}),
+        "pipeline_value": pipeline[0]["value"] if pipeline else 0,
+    }
+
+def ensure_history_collection(db):
+    try:
+        db.create_collection(
+            HISTORY_COLLECTION,
+            timeseries={"timeField": "ts", "metaField": "meta", "granularity": "minutes"}
+        )
+    except CollectionInvalid:
+        pass
+
+def take_snapshot(db, interval_seconds: float, read_db=None, now: Optional[datetime] = None) -> bool:
+    now = now or datetime.now()
+    # Every worker runs the snapshotter; the first to claim the slot writes it
+    slot = int(now.timestamp() // interval_seconds)
+    try:
+        db[SLOTS_COLLECTION].insert_one({"_id": slot, "created_at": now})
+    except DuplicateKeyError:
+        return False
+
+    point = compute_kpis(read_db if read_db is not None else db, now)
+    point.update({"ts": now, "meta": {"source": "dashboard"}})
+    db[HISTORY_COLLECTION].insert_one(point)
+    return True
+
+def local_time(value: Optional[datetime]) -> Optional[datetime]:
+    # Snapshots are stored as naive local time; convert aware inputs to match
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone().replace(tzinfo=None)
+    return value
+
+def parse_bucket(bucket: str) -> Tuple[str, int, int]:
+    match = re.fullmatch(r"(\d+)([mhdw])", bucket or "")
+    if not match or int(match.group(1)) == 0:
+        raise ValueError("bucket must look like 5m, 1h, 1d or 1w")
+    size = int(match.group(1))
+    unit, seconds = BUCKET_UNITS[match.group(2)]
+    return unit, size, size * seconds
+
+def choose_bucket(start: datetime, end: datetime) -> str:
+    span = (end - start).total_seconds()
+    for bucket in AUTO_BUCKETS:
+        if span / parse_bucket(bucket)[2] <= MAX_POINTS:
+            return bucket
+    return AUTO_BUCKETS[-1]
+
+def history(db, start: datetime, end: datetime, bucket: Optional[str] = None) -> dict:
+    bucket = bucket or choose_bucket(start, end)
+    unit, size, seconds = parse_bucket(bucket)
+    if (end - start).total_seconds() / seconds > MAX_POINTS * 10:
+        raise ValueError("bucket is too small for the requested range")
+
+    points = db[HISTORY_COLLECTION].aggregate([
+        {"$match": {"ts": {"$gte": start, "$lt": end}}},
+        {"$group": {
+            "_id": {"$dateTrunc": {"date": "$ts", "unit": unit, "binSize": size}},
+            **{field: {"$avg": "$" + field} for field in KPI_FIELDS},
+            "samples": {"$sum": 1},
+        }},
+        {"$sort": {"_id": 1}},
+        {"$project": {
+            "_id": 0,
+            "ts": {"$dateToString": {"date": "$_id", "format": "%Y-%m-%dT%H:%M:%S"}},
+            **{field: {"$round": ["$" + field, 2]} for field in KPI_FIELDS},
+            "samples": 1,
+        }},
+    ])
+    return {"from": start, "to": end, "bucket": bucket, "points": list(points)}
@@ -0,0 +1,169 @@
+"""Write-behind buffer for shipper lead intake.
+
+Accepted leads are appended to a local journal file before the request is
+acknowledged and inserted into MongoDB in batches with insert_many. Journal
+segments are deleted once their batch is stored; any left behind by a crash
+or a failed final flush are replayed on the next startup.
+"""
+import asyncio
+import fcntl
+import glob
+import logging
+import os
+import time
+
+from bson import json_util
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger("growe.lead_buffer")
+
+DUPLICATE_KEY = 11000
+
+class LeadWriteBuffer:
+    def __init__(self, spill_dir: str, batch_size: int = 500, flush_seconds: float = 1.0, fsync: bool = False):
+        self.spill_dir = spill_dir
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.fsync = fsync
+        self.db = None
+        self._pending = []
+        self._journal = None
+        self._journal_path = None
+        self._segment = 0
+        # Rotated journal segments whose leads are not stored yet
+        self._unflushed = []
+        self._flush_requested = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = None
+
+    def _open_journal(self):
+        self._segment += 1
+        path = os.path.join(
+            self.spill_dir, "leads-%d-%d-%d.jsonl" % (os.getpid(), int(time.time()), self._segment)
+        )
+        journal = open(path, "a", encoding="utf-8")
+        try:
+            # Held while this worker owns the segment so replay elsewhere skips it
+            fcntl.flock(journal.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            journal.close()
+            raise
+        # Only switch once the new segment is usable; on failure the current
+        # one keeps taking leads
+        self._journal_path, self._journal = path, journal
+
+    def _rotate_journal(self):
+        # The old segment stays open, and so locked, until its leads are stored
+        segment = (self._journal_path, self._journal)
+        self._open_journal()
+        return segment
+
+    async def start(self, db):
+        self.db = db
+        os.makedirs(self.spill_dir, exist_ok=True)
+        try:
+            await run_in_threadpool(self._replay_spilled)
+        except PyMongoError:
+            logger.exception("Replaying spilled leads failed, keeping them for the next start")
+        self._open_journal()
+        self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+        await self.flush()
+        for _, handle in self._unflushed:
+            handle.close()
+        if self._journal:
+            self._journal.close()
+            if not self._pending:
+                os.remove(self._journal_path)
+            self._journal = None
+
+    def add(self, lead: dict):
+        self._journal.write(json_util.dumps(lead) + "\n")
+        self._journal.flush()
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+        self._pending.append(lead)
+        if len(self._pending) >= self.batch_size:
+            self._flush_requested.set()
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), timeout=self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            await self.flush()
+
+    async def flush(self):
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            try:
+                self._unflushed.append(self._rotate_journal())
+            except OSError:
+                logger.exception("Rotating the lead journal failed, will retry")
+                return
+            batch, self._pending = self._pending, []
+            segments = list(self._unflushed)
+            try:
+                await run_in_threadpool(self._insert, batch)
+            except PyMongoError:
+                logger.exception("Flushing %d buffered leads failed, will retry", len(batch))
+                # Segments stay on disk until a later flush stores their leads
+                self._pending = batch + self._pending
+                return
+            for path, handle in segments:
+                handle.close()
+                self._unflushed.remove((path, handle))
+                try:
+                    os.remove(path)
+                except OSError:
+                    # Replayed on the next start, which skips stored leads
+                    logger.exception("Removing flushed lead journal %s failed", path)
+
+    def _insert(self, leads: list):
+        try:
+            self.db.shipper_leads.insert_many(leads, ordered=False)
+        except BulkWriteError as exc:
+            # Leads already stored by an earlier attempt or replay are fine
+            errors = [error for error in exc.details.get("writeErrors", []) if error.get("code") != DUPLICATE_KEY]
+            if errors or exc.details.get("writeConcernErrors"):
+                raise
+
+    def _upsert(self, leads: list):
+        # Replay runs at startup, possibly before indexes.py has created the
+        # unique id index, so stored leads are matched by id, not rejected
+        self.db.shipper_leads.bulk_write(
+            [UpdateOne({"id": lead["id"]}, {"$setOnInsert": lead}, upsert=True) for lead in leads],
+            ordered=False
+        )
+
+    def _replay_spilled(self):
+        for path in sorted(glob.glob(os.path.join(self.spill_dir, "leads-*.jsonl"))):
+            with open(path, "r+", encoding="utf-8") as segment:
+                try:
+                    fcntl.flock(segment.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    # Active segment of another running worker
+                    continue
+                leads = []
+                for line in segment:
+                    try:
+                        leads.append(json_util.loads(line))
+                    except ValueError:
+                        # Partial line from a crash mid-write; never acknowledged
+                        logger.warning("Skipping unreadable line in %s", path)
+                if leads:
+                    self._upsert(leads)
+                    logger.info("Replayed %d spilled leads from %s", len(leads), path)
+                os.remove(path)
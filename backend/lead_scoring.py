@@ -0,0 +1,131 @@
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from regions import region_centroid
+
+EARTH_RADIUS_MILES = 3958.8
+# Distance at which a site's contribution to a region's score falls to 1/e
+DISTANCE_SCALE_MILES = 250.0
+
+def haversine_miles(lat1, lng1, lat2, lng2):
+    # All arguments in radians; broadcasts like any numpy expression
+    dlat = lat2 - lat1
+    dlng = lng2 - lng1
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+class WarehouseIndex:
+    """Warehouse coordinates in contiguous arrays for vectorized distance queries."""
+
+    def __init__(self, capacity: int = 1024):
+        self._lock = threading.Lock()
+        self._reset(capacity)
+
+    def _reset(self, capacity: int):
+        self._lat = np.empty(capacity, dtype=np.float64)
+        self._lng = np.empty(capacity, dtype=np.float64)
+        self._owner = np.empty(capacity, dtype=np.int32)
+        self.size = 0
+        self.warehouse_ids: List[str] = []
+        self.threepl_ids: List[str] = []
+        self._threepl_positions: Dict[str, int] = {}
+        self._positions: Dict[str, int] = {}
+        self._aliases: Dict[str, str] = {}
+
+    def _grow(self):
+        capacity = len(self._lat) * 2
+        for name in ("_lat", "_lng", "_owner"):
+            current = getattr(self, name)
+            grown = np.empty(capacity, dtype=current.dtype)
+            grown[:self.size] = current[:self.size]
+            setattr(self, name, grown)
+
+    def _append(self, warehouse: dict):
+        lat, lng = warehouse.get("lat"), warehouse.get("lng")
+        if lat is None or lng is None or not warehouse.get("threepl_id"):
+            return
+        warehouse_id = warehouse["id"]
+        position = self._positions.get(warehouse_id)
+        if position is None:
+            if self.size == len(self._lat):
+                self._grow()
+            position = self.size
+            self.size += 1
+            self.warehouse_ids.append(warehouse_id)
+            self._positions[warehouse_id] = position
+
+        # 3PLs created since the last load keep the id the warehouse stored
+        threepl_id = self._aliases.get(warehouse["threepl_id"], warehouse["threepl_id"])
+        if threepl_id not in self._threepl_positions:
+            self._threepl_positions[threepl_id] = len(self.threepl_ids)
+            self.threepl_ids.append(threepl_id)
+
+        self._lat[position] = np.radians(lat)
+        self._lng[position] = np.radians(lng)
+        self._owner[position] = self._threepl_positions[threepl_id]
+
+    def load(self, warehouses, aliases: Optional[Dict[str, str]] = None):
+        """Replace the index; aliases maps either form of a 3PL id to one key."""
+        warehouses = list(warehouses)
+        with self._lock:
+            self._reset(max(1024, len(warehouses)))
+            self._aliases = dict(aliases or {})
+            for warehouse in warehouses:
+                self._append(warehouse)
+
+    def add(self, warehouse: dict):
+        with self._lock:
+            self._append(warehouse)
+
+    def rank(self, regions: List[str], limit: Optional[int] = 10) -> List[dict]:
+        centroids = [(region, region_centroid(region)) for region in regions]
+        centroids = [(region, point) for region, point in centroids if point is not None]
+
+        with self._lock:
+            size = self.size
+            if not centroids or size == 0:
+                return []
+            lat = self._lat[:size].copy()
+            lng = self._lng[:size].copy()
+            owner = self._owner[:size].copy()
+            warehouse_ids = list(self.warehouse_ids)
+            threepl_ids = list(self.threepl_ids)
+
+        region_lat = np.radians([point[0] for _, point in centroids])[:, None]
+        region_lng = np.radians([point[1] for _, point in centroids])[:, None]
+        # One pass over every facility: regions x warehouses
+        distances = haversine_miles(region_lat, region_lng, lat[None, :], lng[None, :])
+
+        # Nearest site of each 3PL to each region: regions x 3PLs
+        nearest = np.full((len(centroids), len(threepl_ids)), np.inf)
+        np.minimum.at(nearest, (np.arange(len(centroids))[:, None], owner[None, :]), distances)
+        scores = np.exp(-nearest / DISTANCE_SCALE_MILES).mean(axis=0)
+
+        # Closest warehouse per 3PL over all regions
+        site_distance = distances.min(axis=0)
+        order = np.lexsort((site_distance, owner))
+        owners_sorted = owner[order]
+        first = np.ones(size, dtype=bool)
+        first[1:] = owners_sorted[1:] != owners_sorted[:-1]
+        closest_site = dict(zip(owners_sorted[first].tolist(), order[first].tolist()))
+
+        ranked = np.argsort(-scores, kind="stable")
+        if limit:
+            ranked = ranked[:limit]
+
+        results = []
+        for position in ranked.tolist():
+            site = closest_site[position]
+            results.append({
+                "threepl_id": threepl_ids[position],
+                "score": round(float(scores[position]), 4),
+                "nearest_warehouse_id": warehouse_ids[site],
+                "nearest_distance_miles": round(float(site_distance[site]), 1),
+                "region_distances_miles": {
+                    region: round(float(nearest[row, position]), 1)
+                    for row, (region, _) in enumerate(centroids)
+                },
+            })
+        return results
@@ -0,0 +1,108 @@
+"""Lease agreement files in GridFS, stored once per distinct content.
+
+Files are addressed by the sha256 of their bytes: identical uploads share one
+GridFS file, the hash doubles as a strong ETag, and responses can be cached
+as immutable.
+"""
+import hashlib
+import os
+import re
+from typing import BinaryIO, Iterator, Optional, Tuple
+
+from bson import ObjectId
+from gridfs import GridFSBucket
+from gridfs.errors import FileExists, NoFile
+
+BUCKET_NAME = "lease_documents"
+MAX_LEASE_DOCUMENT_BYTES = int(os.getenv("MAX_LEASE_DOCUMENT_BYTES", str(100 * 1024 * 1024)))
+CHUNK_SIZE_BYTES = 255 * 1024
+PDF_MAGIC = b"%PDF-"
+
+_RANGE = re.compile(r"bytes=(\d*)-(\d*)")
+
+class DocumentTooLarge(Exception):
+    pass
+
+def bucket(db) -> GridFSBucket:
+    return GridFSBucket(db, bucket_name=BUCKET_NAME, chunk_size_bytes=CHUNK_SIZE_BYTES)
+
+def hash_upload(source: BinaryIO) -> Tuple[str, int, bytes]:
+    """Return (sha256, length, leading bytes) of a spooled upload and rewind it."""
+    digest = hashlib.sha256()
+    length = 0
+    head = b""
+    source.seek(0)
+    while True:
+        block = source.read(CHUNK_SIZE_BYTES)
+        if not block:
+            break
+        if not head:
+            head = block[:len(PDF_MAGIC)]
+        length += len(block)
+        if length > MAX_LEASE_DOCUMENT_BYTES:
+            raise DocumentTooLarge()
+        digest.update(block)
+    source.seek(0)
+    return digest.hexdigest(), length, head
+
+def store(db, source: BinaryIO, sha256: str, filename: str, content_type: str) -> Tuple[dict, bool]:
+    """Store the upload unless identical content exists; returns (file, created)."""
+    existing = find_file(db, sha256)
+    if existing is not None:
+        return existing, False
+    file_id = ObjectId()
+    try:
+        bucket(db).upload_from_stream_with_id(
+            file_id, filename, source, metadata={"sha256": sha256, "content_type": content_type}
+        )
+    except FileExists:
+        # A concurrent upload of the same content stored its file first and
+        # the unique metadata.sha256 index rejected ours (GridFS reports the
+        # DuplicateKeyError as FileExists); drop our chunks and share theirs
+        db[BUCKET_NAME + ".chunks"].delete_many({"files_id": file_id})
+        return find_file(db, sha256), False
+    return db[BUCKET_NAME + ".files"].find_one({"_id": file_id}), True
+
+def find_file(db, sha256: str) -> Optional[dict]:
+    return db[BUCKET_NAME + ".files"].find_one({"metadata.sha256": sha256})
+
+def parse_range(header: Optional[str], length: int) -> Optional[Tuple[int, int]]:
+    """Inclusive (start, end) for a single byte range, None to send the whole file.
+
+    Raises ValueError when the range cannot be satisfied.
+    """
+    if not header:
+        return None
+    match = _RANGE.fullmatch(header.strip())
+    if not match or not any(match.groups()):
+        # Multiple or malformed ranges; a full response is always allowed
+        return None
+    start, end = match.groups()
+    if not start:
+        # Suffix range: the last N bytes
+        suffix = int(end)
+        if suffix == 0:
+            raise ValueError("empty suffix range")
+        return max(length - suffix, 0), length - 1
+    start = int(start)
+    end = min(int(end), length - 1) if end else length - 1
+    if start >= length or start > end:
+        raise ValueError("range not satisfiable")
+    return start, end
+
+def iter_file(db, file_id, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+    # GridOut reads one chunk document at a time, so memory stays at ~1 chunk
+    try:
+        grid_out = bucket(db).open_download_stream(file_id)
+    except NoFile:
+        return
+    with grid_out:
+        grid_out.seek(start)
+        remaining = (grid_out.length if end is None else end + 1) - start
+        while remaining > 0:
+            block = grid_out.readchunk()
+            if not block:
+                break
+            block = block[:remaining]
+            remaining -= len(block)
+            yield block
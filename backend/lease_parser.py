@@ -0,0 +1,285 @@
+"""Rule-based extraction of key terms from uploaded lease documents.
+
+Parses the latest document of every lease without a summary from this
+PARSER_VERSION and writes the summary onto the lease:
+
+    python lease_parser.py run [workers] [--force]
+
+Results are cached by document sha256 in lease_parse_cache, so identical
+files attached to many leases are parsed once.
+"""
+import io
+import logging
+import multiprocessing
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from action_items import merge_items_update, parsed_items
+
+logger = logging.getLogger("growe.lease_parser")
+
+CACHE_COLLECTION = "lease_parse_cache"
+# Bump when the rules change so cached results are recomputed
+PARSER_VERSION = 1
+
+MONTHS = {
+    name: number
+    for number, names in enumerate(
+        [("jan", "january"), ("feb", "february"), ("mar", "march"), ("apr", "april"), ("may",), ("jun", "june"),
+         ("jul", "july"), ("aug", "august"), ("sep", "sept", "september"), ("oct", "october"), ("nov", "november"),
+         ("dec", "december")],
+        start=1,
+    )
+    for name in names
+}
+NUMBER_WORDS = {"one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10}
+
+_MONEY = r"\$\s?([\d,]+(?:\.\d{2})?)"
+_NUMBER = r"(\d+|%s)" % "|".join(NUMBER_WORDS)
+_DATE = re.compile(
+    r"(?P<month_name>[A-Za-z]{3,9})\.?\s+(?P<day>\d{1,2}),?\s+(?P<year>\d{4})"
+    r"|(?P<m>\d{1,2})/(?P<d>\d{1,2})/(?P<y>\d{4})"
+    r"|(?P<iso_y>\d{4})-(?P<iso_m>\d{2})-(?P<iso_d>\d{2})"
+)
+_TERM = re.compile(r"(?:initial\s+)?term\b[^\n]*", re.IGNORECASE)
+_TERM_YEARS = re.compile(_NUMBER + r"[\s-]*(?:\(\d+\)\s*)?years?\b", re.IGNORECASE)
+_MONTHLY_RENT = re.compile(
+    r"monthly\s+(?:base\s+)?rent[^$\n]{0,40}" + _MONEY
+    + r"|rent[^$\n]{0,20}" + _MONEY + r"\s*(?:/\s*|per\s+)mo(?:nth)?\b",
+    re.IGNORECASE,
+)
+_ANNUAL_RENT = re.compile(r"annual\s+(?:base\s+)?rent[^$\n]{0,40}" + _MONEY, re.IGNORECASE)
+_ESCALATION = re.compile(
+    r"(\d+(?:\.\d+)?)\s*%\s*(?:annual|yearly|per\s+annum|each\s+year)?\s*(?:rent\s+)?(?:escalation|increase)"
+    r"|escalat\w*\s+(?:of\s+|by\s+)?(\d+(?:\.\d+)?)\s*%",
+    re.IGNORECASE,
+)
+_DEPOSIT = re.compile(r"security\s+deposit[^$\n]{0,40}" + _MONEY, re.IGNORECASE)
+_SQUARE_FEET = re.compile(r"([\d,]{3,})\s*(?:sq\.?\s*ft\.?|square\s+feet)", re.IGNORECASE)
+_RENEWAL = re.compile(r"renew\w*[^.\n]{0,80}?" + _NUMBER + r"[\s-]*(?:\(\d+\)\s*)?(?:additional\s+)?years?", re.IGNORECASE)
+_NOTICE = re.compile(r"(\d+)[\s-]*(?:\(\d+\)\s*)?days?'?\s*(?:prior\s+|advance\s+)?(?:written\s+)?notice", re.IGNORECASE)
+
+def _number(value: str) -> int:
+    return int(value) if value.isdigit() else NUMBER_WORDS[value.lower()]
+
+def _money(value: str) -> float:
+    return float(value.replace(",", ""))
+
+def parse_dates(text: str) -> List[datetime]:
+    dates = []
+    for match in _DATE.finditer(text):
+        try:
+            if match.group("month_name"):
+                month = MONTHS.get(match.group("month_name").lower())
+                if month is None:
+                    continue
+                dates.append(datetime(int(match.group("year")), month, int(match.group("day"))))
+            elif match.group("m"):
+                dates.append(datetime(int(match.group("y")), int(match.group("m")), int(match.group("d"))))
+            else:
+                dates.append(datetime(int(match.group("iso_y")), int(match.group("iso_m")), int(match.group("iso_d"))))
+        except ValueError:
+            continue
+    return dates
+
+def _term(text: str) -> Tuple[Optional[datetime], Optional[datetime], Optional[int]]:
+    for line in _TERM.findall(text):
+        dates = parse_dates(line)
+        years = _TERM_YEARS.search(line)
+        if len(dates) >= 2 or years:
+            start, end = (dates[0], dates[1]) if len(dates) >= 2 else (None, None)
+            return start, end, _number(years.group(1)) if years else None
+    return None, None, None
+
+def _notices(text: str) -> dict:
+    # Classify each "N-day notice" by the provision it appears in
+    notices = {}
+    for line in text.splitlines():
+        for match in _NOTICE.finditer(line):
+            context = line.lower()
+            if "terminat" in context:
+                kind = "termination"
+            elif "renew" in context:
+                kind = "renewal"
+            elif "expan" in context:
+                kind = "expansion"
+            else:
+                kind = "other"
+            notices.setdefault(kind, int(match.group(1)))
+    return notices
+
+def parse_lease_text(text: str) -> dict:
+    start, end, term_years = _term(text)
+    monthly = _MONTHLY_RENT.search(text)
+    annual = _ANNUAL_RENT.search(text)
+    escalation = _ESCALATION.search(text)
+    deposit = _DEPOSIT.search(text)
+    square_feet = _SQUARE_FEET.search(text)
+    renewal = _RENEWAL.search(text)
+    notices = _notices(text)
+
+    monthly_rent = _money(next(group for group in monthly.groups() if group)) if monthly else None
+    annual_rent = _money(annual.group(1)) if annual else (monthly_rent * 12 if monthly_rent else None)
+    escalation_rate = float(next(group for group in escalation.groups() if group)) if escalation else None
+
+    key_terms = []
+    if term_years:
+        key_terms.append("%d-year initial term" % term_years)
+    if start and end:
+        key_terms.append("Term %s to %s" % (start.date().isoformat(), end.date().isoformat()))
+    if renewal:
+        automatic = "automatic" in renewal.group(0).lower()
+        key_terms.append("%s%d-year renewal option" % ("Automatic " if automatic else "", _number(renewal.group(1))))
+    if escalation_rate is not None:
+        key_terms.append("Annual rent escalation of %g%%" % escalation_rate)
+    for kind, days in notices.items():
+        if kind != "other":
+            key_terms.append("%d-day notice required for %s" % (days, kind))
+
+    action_items = []
+    if end:
+        for kind in ("renewal", "termination"):
+            if kind in notices:
+                action_items.append({
+                    "type": kind + "_notice",
+                    "description": "Give %s notice to landlord (%d days before expiry)" % (kind, notices[kind]),
+                    "due_date": end - timedelta(days=notices[kind]),
+                    "priority": "high",
+                    "status": "pending",
+                })
+
+    return {
+        "start_date": start,
+        "end_date": end,
+        "term_years": term_years,
+        "monthly_rent": monthly_rent,
+        "square_footage": int(square_feet.group(1).replace(",", "")) if square_feet else None,
+        "renewal_term_years": _number(renewal.group(1)) if renewal else None,
+        "notice_periods_days": notices,
+        "key_terms": key_terms,
+        "action_items": action_items,
+        "financial_summary": {
+            "total_annual_cost": annual_rent,
+            "escalation_rate": "%g%% annually" % escalation_rate if escalation_rate is not None else None,
+            "deposit_amount": _money(deposit.group(1)) if deposit else None,
+        },
+    }
+
+def extract_text(data: bytes) -> str:
+    from pypdf import PdfReader
+
+    reader = PdfReader(io.BytesIO(data))
+    return "\n".join(page.extract_text() or "" for page in reader.pages)
+
+# Worker processes: one MongoDB client each, opened after the process starts
+_worker_db = None
+
+def _init_worker(mongo_url: str):
+    global _worker_db
+    from pymongo import MongoClient
+
+    _worker_db = MongoClient(mongo_url).growe_platform
+
+def parse_document(sha256: str) -> dict:
+    from lease_documents import bucket, find_file
+
+    result = {"_id": sha256, "parser_version": PARSER_VERSION, "parsed_at": datetime.now()}
+    try:
+        stored = find_file(_worker_db, sha256)
+        if stored is None:
+            raise LookupError("document is not stored")
+        text = extract_text(bucket(_worker_db).open_download_stream(stored["_id"]).read())
+        if not text.strip():
+            # Scanned pages without a text layer need OCR first
+            raise ValueError("document has no extractable text")
+        result.update({"summary": parse_lease_text(text), "text_chars": len(text), "error": None})
+    except Exception as exc:
+        result.update({"summary": None, "error": "%s: %s" % (type(exc).__name__, exc)})
+    return result
+
+def pending_leases(db, force: bool = False) -> Dict[str, list]:
+    """Latest document hash -> [(lease _id, filename)] for leases without a current summary."""
+    pending = {}
+    projection = {"documents": {"$slice": -1}, "lease_agreement.document_sha256": 1, "lease_agreement.parser_version": 1}
+    for lease in db.leases.find({"documents.0": {"$exists": True}}, projection):
+        latest = lease["documents"][-1]
+        agreement = lease.get("lease_agreement") or {}
+        current = agreement.get("document_sha256") == latest["sha256"] and agreement.get("parser_version") == PARSER_VERSION
+        if force or not current:
+            pending.setdefault(latest["sha256"], []).append((lease["_id"], latest.get("filename")))
+    return pending
+
+def apply_summary(db, leases: list, result: dict) -> int:
+    if result["summary"] is None:
+        return 0
+    # Parsed deadlines join the lease's action items once; their status is
+    # then tracked through /api/leases/{id}/action-items, so the stored
+    # summary keeps no copy of them
+    items = parsed_items(result["summary"], result["_id"])
+    summary = {key: value for key, value in result["summary"].items() if key != "action_items"}
+    db.leases.bulk_write([
+        UpdateOne({"_id": lease_id}, [{"$set": {"lease_agreement": {"$literal": {
+            "document_name": filename,
+            "document_sha256": result["_id"],
+            "summary": summary,
+            "parser_version": PARSER_VERSION,
+            "parsed_at": result["parsed_at"],
+        }}}}] + merge_items_update(items))
+        for lease_id, filename in leases
+    ], ordered=False)
+    return len(leases)
+
+def run(db, mongo_url: str, workers: Optional[int] = None, force: bool = False) -> dict:
+    pending = pending_leases(db, force)
+    cached = {} if force else {
+        result["_id"]: result
+        # Failures are kept for inspection but retried, as most are transient
+        for result in db[CACHE_COLLECTION].find({"_id": {"$in": list(pending)}, "parser_version": PARSER_VERSION, "error": None})
+    }
+    to_parse = [sha256 for sha256 in pending if sha256 not in cached]
+    stats = {"documents": len(to_parse), "cached": len(cached), "parsed": 0, "failed": 0, "leases_updated": 0}
+
+    # Identical files attached to other leases were parsed on an earlier run
+    for sha256, result in cached.items():
+        stats["leases_updated"] += apply_summary(db, pending[sha256], result)
+    if not to_parse:
+        return stats
+
+    # spawn, not fork: MongoClient instances must not cross a fork
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker, initargs=(mongo_url,)) as executor:
+        for result in executor.map(parse_document, to_parse, chunksize=8):
+            db[CACHE_COLLECTION].replace_one({"_id": result["_id"]}, result, upsert=True)
+            if result["error"]:
+                stats["failed"] += 1
+                logger.warning("Parsing lease document %s failed: %s", result["_id"][:12], result["error"])
+                continue
+            stats["parsed"] += 1
+            stats["leases_updated"] += apply_summary(db, pending[result["_id"]], result)
+    return stats
+
+def main():
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+
+    args = [arg for arg in sys.argv[1:] if arg != "--force"]
+    if not args or args[0] != "run":
+        print(__doc__)
+        sys.exit(1)
+    workers = int(args[1]) if len(args) > 1 else None
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+    mongo_url = os.getenv("MONGO_URL")
+    db = MongoClient(mongo_url).growe_platform
+    stats = run(db, mongo_url, workers, force="--force" in sys.argv)
+    print("✅ Parsed %(parsed)d of %(documents)d lease documents (%(failed)d failed, %(cached)d cached), updated %(leases_updated)d leases" % stats)
+
+if __name__ == "__main__":
+    main()
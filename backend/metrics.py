@@ -0,0 +1,194 @@
+import os
+import threading
+import time
+
+from fastapi import Request
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+from pymongo import monitoring
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import Response
+
+# HTTP metrics
+HTTP_REQUESTS = Counter(
+    "growe_http_requests_total",
+    "HTTP requests handled",
+    ["method", "route", "status"],
+)
+HTTP_LATENCY = Histogram(
+    "growe_http_request_duration_seconds",
+    "HTTP request latency",
+    ["method", "route"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+HTTP_IN_FLIGHT = Gauge(
+    "growe_http_requests_in_flight",
+    "HTTP requests currently being handled",
+    ["method"],
+    multiprocess_mode="livesum",
+)
+
+STARTUP_SECONDS = Gauge(
+    "growe_worker_startup_seconds",
+    "Time from module import until the worker finished startup",
+    multiprocess_mode="max",
+)
+
+# Response cache; hit ratio is (hit + stale) / all results per cache
+RESPONSE_CACHE_REQUESTS = Counter(
+    "growe_response_cache_requests_total",
+    "Cached GET lookups by outcome: hit, stale, coalesced or miss",
+    ["route", "result"],
+)
+RESPONSE_CACHE_ENTRIES = Gauge(
+    "growe_response_cache_entries",
+    "Responses currently held by the response cache",
+    multiprocess_mode="livesum",
+)
+
+# MongoDB metrics
+MONGO_COMMAND_LATENCY = Histogram(
+    "growe_mongo_command_duration_seconds",
+    "MongoDB command latency",
+    ["collection", "command"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+MONGO_COMMAND_FAILURES = Counter(
+    "growe_mongo_command_failures_total",
+    "MongoDB commands that returned an error",
+    ["collection", "command"],
+)
+MONGO_POOL_CHECKOUT_WAIT = Histogram(
+    "growe_mongo_pool_checkout_wait_seconds",
+    "Time spent waiting for a pooled MongoDB connection",
+    ["address"],
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5),
+)
+MONGO_POOL_CHECKOUT_FAILURES = Counter(
+    "growe_mongo_pool_checkout_failures_total",
+    "Failed MongoDB connection checkouts",
+    ["address", "reason"],
+)
+MONGO_POOL_CHECKED_OUT = Gauge(
+    "growe_mongo_pool_connections_checked_out",
+    "MongoDB connections currently checked out of the pool",
+    ["address"],
+    multiprocess_mode="livesum",
+)
+
+# Commands whose first value is not a collection name
+NON_COLLECTION_COMMANDS = {"ping", "hello", "ismaster", "isMaster", "buildInfo", "endSessions", "listCollections"}
+
+def _address_label(address) -> str:
+    return "%s:%s" % address if isinstance(address, tuple) else str(address)
+
+def command_collection(command_name: str, command) -> str:
+    if command_name in NON_COLLECTION_COMMANDS:
+        return "admin"
+    # getMore names its cursor; the collection is a separate field, so
+    # streamed list batches count against the collection they read
+    target = command.get("collection") if command_name == "getMore" else command.get(command_name)
+    return target if isinstance(target, str) else "unknown"
+
+def route_label(request: Request) -> str:
+    # Use the route template so /api/deals/{deal_id} stays one series
+    route = request.scope.get("route")
+    return getattr(route, "path", "unmatched")
+
+class CommandMetricsListener(monitoring.CommandListener):
+    def __init__(self):
+        self._pending = {}
+
+    def _key(self, event):
+        return (event.connection_id, event.request_id)
+
+    def started(self, event):
+        self._pending[self._key(event)] = command_collection(event.command_name, event.command)
+
+    def succeeded(self, event):
+        collection = self._pending.pop(self._key(event), "unknown")
+        MONGO_COMMAND_LATENCY.labels(collection, event.command_name).observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        collection = self._pending.pop(self._key(event), "unknown")
+        MONGO_COMMAND_LATENCY.labels(collection, event.command_name).observe(event.duration_micros / 1e6)
+        MONGO_COMMAND_FAILURES.labels(collection, event.command_name).inc()
+
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    def __init__(self):
+        self._checkout_started = {}
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        # Checkout events for one request happen on the same thread
+        self._checkout_started[(event.address, threading.get_ident())] = time.perf_counter()
+
+    def _observe_wait(self, event):
+        started = self._checkout_started.pop((event.address, threading.get_ident()), None)
+        if started is not None:
+            MONGO_POOL_CHECKOUT_WAIT.labels(_address_label(event.address)).observe(time.perf_counter() - started)
+
+    def connection_check_out_failed(self, event):
+        self._observe_wait(event)
+        MONGO_POOL_CHECKOUT_FAILURES.labels(_address_label(event.address), str(event.reason)).inc()
+
+    def connection_checked_out(self, event):
+        self._observe_wait(event)
+        MONGO_POOL_CHECKED_OUT.labels(_address_label(event.address)).inc()
+
+    def connection_checked_in(self, event):
+        MONGO_POOL_CHECKED_OUT.labels(_address_label(event.address)).dec()
+
+class MetricsMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        if request.url.path == "/metrics":
+            return await call_next(request)
+
+        method = request.method
+        HTTP_IN_FLIGHT.labels(method).inc()
+        start = time.perf_counter()
+        status_code = 500
+        try:
+            response = await call_next(request)
+            status_code = response.status_code
+            return response
+        finally:
+            elapsed = time.perf_counter() - start
+            route = route_label(request)
+            HTTP_IN_FLIGHT.labels(method).dec()
+            HTTP_LATENCY.labels(method, route).observe(elapsed)
+            HTTP_REQUESTS.labels(method, route, str(status_code)).inc()
+
+# With several workers each process writes its samples to this directory
+# and /metrics aggregates them, whichever worker serves the scrape
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+def metrics_response() -> Response:
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+def shutdown_metrics():
+    if PROMETHEUS_MULTIPROC_DIR:
+        multiprocess.mark_process_dead(os.getpid())
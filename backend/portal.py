@@ -0,0 +1,98 @@
+"""Everything the client portal shows on load, in one response.
+
+Queries run concurrently on the asyncio driver and return only the fields
+the portal renders; summary counts are computed here instead of in the
+browser.
+"""
+import asyncio
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from bson import ObjectId
+
+from facets import region_codes
+from industry_news import NEWS_COLLECTION, present
+from queries import shaped_pipeline
+from regions import STATE_NAMES
+
+EXPIRING_DAYS = 180
+PORTAL_LEAD_LIMIT = 50
+PORTAL_NEWS_LIMIT = 10
+
+WAREHOUSE_FIELDS = ("id", "name", "address", "city", "state", "zip_code", "lat", "lng", "growe_represented")
+LEASE_FIELDS = ("id", "warehouse_id", "start_date", "end_date", "renewal_date", "square_footage", "monthly_rent", "status", "landlord", "action_items")
+LEAD_FIELDS = ("id", "company_name", "contact_name", "email", "phone", "product_type", "regions_needed", "monthly_shipments", "urgency", "created_at")
+THREEPL_PROJECTION = {"id": 1, "company_name": 1, "status": 1, "rep_owner": 1, "regions_covered": 1, "region_codes": 1}
+NEWS_PROJECTION = {"_id": 0, "id": 1, "title": 1, "summary": 1, "source": 1, "category": 1, "published_date": 1, "read_time": 1, "trend_key": 1}
+
+async def find_partner(db, user_id: str) -> Optional[dict]:
+    """The 3PL a partner user belongs to, by threepl_id or company name."""
+    user = await db.users.find_one(
+        {"_id": ObjectId(user_id)} if ObjectId.is_valid(user_id) else {"id": user_id},
+        {"threepl_id": 1, "company_name": 1}
+    )
+    if not user:
+        return None
+    if user.get("threepl_id"):
+        return await find_threepl(db, user["threepl_id"])
+    if user.get("company_name"):
+        return await db.three_pls.find_one({"company_name": user["company_name"]}, THREEPL_PROJECTION)
+    return None
+
+async def find_threepl(db, threepl_id: str) -> Optional[dict]:
+    query = {"$or": [{"id": threepl_id}, {"_id": ObjectId(threepl_id)}]} if ObjectId.is_valid(threepl_id) else {"id": threepl_id}
+    return await db.three_pls.find_one(query, THREEPL_PROJECTION)
+
+def _compact(collection: str, match: dict, fields, sort: Optional[dict] = None, limit: Optional[int] = None) -> list:
+    return shaped_pipeline(collection, match=match, sort=sort, limit=limit) + [{"$project": {field: 1 for field in fields}}]
+
+async def _aggregate(collection, pipeline: list) -> List[dict]:
+    return await collection.aggregate(pipeline).to_list(None)
+
+async def bootstrap(db, threepl: dict, now: Optional[datetime] = None) -> dict:
+    now = now or datetime.now()
+    # Warehouses and leases may reference either form of the 3PL's id
+    owner = {"threepl_id": {"$in": [value for value in (threepl.get("id"), str(threepl["_id"])) if value]}}
+    # Leads matched to this 3PL, or needing a region it covers
+    codes = threepl.get("region_codes") or region_codes(threepl.get("regions_covered"))
+    regions = sorted(set(threepl.get("regions_covered") or []) | set(codes) | {STATE_NAMES[code] for code in codes})
+    lead_match = {
+        "status": {"$in": ["New", "Matched"]},
+        "$or": [{"matched_3pls": {"$in": owner["threepl_id"]["$in"]}}, {"regions_needed": {"$in": regions}}],
+    }
+    expiring_match = {**owner, "status": "Active", "end_date": {"$lte": now + timedelta(days=EXPIRING_DAYS)}}
+    warehouses, leases, expiring, leads, open_leads, news = await asyncio.gather(
+        _aggregate(db.warehouses, _compact("warehouses", owner, WAREHOUSE_FIELDS)),
+        _aggregate(db.leases, _compact("leases", owner, LEASE_FIELDS, sort={"end_date": 1})),
+        db.leases.count_documents(expiring_match),
+        _aggregate(db.shipper_leads, _compact("shipper_leads", lead_match, LEAD_FIELDS, sort={"created_at": -1}, limit=PORTAL_LEAD_LIMIT)),
+        db.shipper_leads.count_documents(lead_match),
+        db[NEWS_COLLECTION].find({}, NEWS_PROJECTION).sort([("published_date", -1), ("id", -1)]).to_list(PORTAL_NEWS_LIMIT),
+    )
+
+    active = [lease for lease in leases if lease.get("status") == "Active"]
+    news = [present(article, now) for article in news]
+    return {
+        "threepl": {
+            "id": str(threepl["_id"]),
+            "company_name": threepl.get("company_name"),
+            "status": threepl.get("status"),
+            "rep_owner": threepl.get("rep_owner"),
+        },
+        "summary": {
+            "warehouses": len(warehouses),
+            "active_leases": len(active),
+            "expiring_leases": expiring,
+            "leased_sqft": sum(lease.get("square_footage") or 0 for lease in active),
+            "monthly_rent": sum(lease.get("monthly_rent") or 0 for lease in active),
+            "pending_action_items": sum(
+                1 for lease in leases for item in lease.get("action_items") or [] if item.get("status") == "pending"
+            ),
+            "open_leads": open_leads,
+            "trending_news": sum(1 for article in news if article["trending"]),
+        },
+        "warehouses": warehouses,
+        "leases": leases,
+        "leads": leads,
+        "news": news,
+    }
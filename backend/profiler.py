@@ -0,0 +1,158 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from pymongo import monitoring
+from pymongo.errors import PyMongoError
+
+from request_context import current_route
+
+SLOW_QUERY_PROFILER = os.getenv("SLOW_QUERY_PROFILER", "false").lower() == "true"
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "100"))
+SLOW_QUERY_BUFFER_SIZE = int(os.getenv("SLOW_QUERY_BUFFER_SIZE", "200"))
+# Explain each query shape at most once per interval
+SLOW_QUERY_EXPLAIN_INTERVAL = float(os.getenv("SLOW_QUERY_EXPLAIN_INTERVAL", "300"))
+
+EXPLAINABLE_COMMANDS = {"find", "aggregate", "count", "distinct", "update", "delete", "findAndModify"}
+
+# Fields the driver adds to a command that explain does not accept
+DRIVER_FIELDS = {
+    "lsid", "$db", "$clusterTime", "$readPreference", "txnNumber",
+    "autocommit", "startTransaction", "readConcern", "writeConcern",
+}
+
+def query_shape(value):
+    # Keep field names and operators, drop the literal values
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        if value and all(isinstance(item, dict) for item in value):
+            return [query_shape(item) for item in value]
+        return "?"
+    return "?"
+
+def command_filter(command_name: str, command: dict):
+    if command_name in ("find", "count", "distinct", "findAndModify"):
+        return command.get("filter") or command.get("query") or {}
+    if command_name == "aggregate":
+        pipeline = command.get("pipeline") or []
+        if pipeline and "$match" in pipeline[0]:
+            return pipeline[0]["$match"]
+        return {}
+    if command_name in ("update", "delete"):
+        statements = command.get("updates") or command.get("deletes") or []
+        return statements[0].get("q", {}) if statements else {}
+    return {}
+
+def _find_stage(plan, stage: str) -> bool:
+    if isinstance(plan, dict):
+        if plan.get("stage") == stage:
+            return True
+        return any(_find_stage(item, stage) for item in plan.values())
+    if isinstance(plan, list):
+        return any(_find_stage(item, stage) for item in plan)
+    return False
+
+def _find_execution_stats(explain: dict):
+    if "executionStats" in explain:
+        return explain["executionStats"]
+    # Aggregations nest the find-layer explain under the first stage
+    for stage in explain.get("stages", []):
+        cursor = stage.get("$cursor")
+        if cursor and "executionStats" in cursor:
+            return cursor["executionStats"]
+    return {}
+
+def summarize_explain(explain: dict) -> dict:
+    stats = _find_execution_stats(explain)
+    docs_examined = stats.get("totalDocsExamined", 0)
+    returned = stats.get("nReturned", 0)
+    return {
+        "docs_examined": docs_examined,
+        "keys_examined": stats.get("totalKeysExamined", 0),
+        "returned": returned,
+        "execution_time_ms": stats.get("executionTimeMillis"),
+        "examined_per_returned": round(docs_examined / returned, 2) if returned else None,
+        "collscan": _find_stage(explain, "COLLSCAN"),
+    }
+
+class SlowQueryProfiler(monitoring.CommandListener):
+    def __init__(self, threshold_ms: float = SLOW_QUERY_THRESHOLD_MS, buffer_size: int = SLOW_QUERY_BUFFER_SIZE):
+        self.threshold_ms = threshold_ms
+        self.entries = deque(maxlen=buffer_size)
+        self.client = None
+        self._pending = {}
+        self._explained = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slow-query-explain")
+
+    def attach(self, client):
+        # Explains go through the application's client once it exists
+        self.client = client
+
+    def started(self, event):
+        if event.command_name not in EXPLAINABLE_COMMANDS:
+            return
+        self._pending[(event.connection_id, event.request_id)] = (event.command, current_route())
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        self._finish(event)
+
+    def _finish(self, event):
+        pending = self._pending.pop((event.connection_id, event.request_id), None)
+        if pending is None:
+            return
+        duration_ms = event.duration_micros / 1000
+        if duration_ms < self.threshold_ms:
+            return
+
+        command, route = pending
+        collection = command.get(event.command_name)
+        shape = query_shape(command_filter(event.command_name, command))
+        entry = {
+            "timestamp": datetime.now(),
+            "database": event.database_name,
+            "collection": collection,
+            "command": event.command_name,
+            "duration_ms": round(duration_ms, 3),
+            "filter_shape": shape,
+            "route": route,
+            "explain": None,
+        }
+        with self._lock:
+            self.entries.append(entry)
+
+        key = (event.database_name, collection, event.command_name, repr(shape))
+        now = time.monotonic()
+        if self.client is not None and now - self._explained.get(key, float("-inf")) >= SLOW_QUERY_EXPLAIN_INTERVAL:
+            self._explained[key] = now
+            self._executor.submit(self._explain, entry, event.database_name, command)
+
+    def _explain(self, entry: dict, database_name: str, command: dict):
+        client = self.client
+        if client is None:
+            return
+        explained = {key: value for key, value in command.items() if key not in DRIVER_FIELDS}
+        try:
+            result = client[database_name].command(
+                {"explain": explained, "verbosity": "executionStats"}
+            )
+            entry["explain"] = summarize_explain(result)
+        except PyMongoError as exc:
+            entry["explain"] = {"error": str(exc)}
+
+    def snapshot(self, limit: int = 50) -> list:
+        with self._lock:
+            entries = list(self.entries)
+        return list(reversed(entries))[:limit]
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+        self._explained.clear()
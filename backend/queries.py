@@ -0,0 +1,109 @@
+import json
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, Optional
+
+from bson import ObjectId
+from fastapi.responses import StreamingResponse
+
+from request_context import timed
+
+# ISO 8601, matching what the API returned for naive datetimes before
+DATE_FORMAT = "%Y-%m-%dT%H:%M:%S.%L"
+
+# Date fields formatted inside MongoDB, per collection
+DATE_FIELDS = {
+    "three_pls": ("created_at",),
+    "warehouses": ("created_at",),
+    "warehouse_view": ("created_at", "view_refreshed_at"),
+    "leases": ("start_date", "end_date", "renewal_date", "created_at"),
+    "deals": ("expected_close_date", "created_at"),
+    "shipper_leads": ("created_at",),
+}
+
+# Flush the response body in chunks of roughly this size
+STREAM_CHUNK_BYTES = 64 * 1024
+
+def by_id(value: str) -> dict:
+    # List routes expose str(_id) as id while writes store a uuid id;
+    # accept either form from callers
+    if ObjectId.is_valid(value):
+        return {"$or": [{"id": value}, {"_id": ObjectId(value)}]}
+    return {"id": value}
+
+def by_ids(values: Iterable[str]) -> dict:
+    values = list(values)
+    object_ids = [ObjectId(value) for value in values if ObjectId.is_valid(value)]
+    if object_ids:
+        return {"$or": [{"id": {"$in": values}}, {"_id": {"$in": object_ids}}]}
+    return {"id": {"$in": values}}
+
+def id_aliases(documents: Iterable[dict]) -> Dict[str, str]:
+    # Either stored form of each document's id, mapped to the str(_id) list
+    # routes expose, so references group under one key
+    aliases = {}
+    for document in documents:
+        aliases[str(document["_id"])] = str(document["_id"])
+        if document.get("id"):
+            aliases[document["id"]] = str(document["_id"])
+    return aliases
+
+def shape_stages(collection: str, exclude: Iterable[str] = ()) -> list:
+    # id comes from _id as it always has; documents leave MongoDB ready to encode
+    computed = {"id": {"$toString": "$_id"}}
+    for field in DATE_FIELDS.get(collection, ()):
+        computed[field] = {"$dateToString": {"date": "$" + field, "format": DATE_FORMAT}}
+    return [
+        {"$set": computed},
+        {"$project": {"_id": 0, **{field: 0 for field in exclude}}},
+    ]
+
+def shaped_pipeline(
+    collection: str,
+    match: Optional[dict] = None,
+    sort: Optional[dict] = None,
+    limit: Optional[int] = None,
+    exclude: Iterable[str] = (),
+) -> list:
+    pipeline = []
+    if match:
+        pipeline.append({"$match": match})
+    if sort:
+        pipeline.append({"$sort": sort})
+    if limit:
+        pipeline.append({"$limit": limit})
+    return pipeline + shape_stages(collection, exclude)
+
+def find_shaped(db, collection: str, **options) -> Iterator[dict]:
+    return db[collection].aggregate(shaped_pipeline(collection, **options))
+
+def json_default(value):
+    # Dates nested in arrays and subdocuments are not formatted by MongoDB;
+    # encode them as ISO 8601 like FastAPI does
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+def encode_json_array(documents: Iterable[dict]) -> Iterator[bytes]:
+    chunk = [b"["]
+    size = 1
+    first = True
+    for document in documents:
+        with timed("render"):
+            encoded = json.dumps(document, default=json_default).encode("utf-8")
+        if not first:
+            chunk.append(b",")
+        chunk.append(encoded)
+        size += len(encoded) + 1
+        first = False
+        if size >= STREAM_CHUNK_BYTES:
+            yield b"".join(chunk)
+            chunk = []
+            size = 0
+    chunk.append(b"]")
+    yield b"".join(chunk)
+
+def stream_shaped(db, collection: str, **options) -> StreamingResponse:
+    # Runs after the headers are sent: its db and render time reach the
+    # request log but not Server-Timing
+    documents = find_shaped(db, collection, **options)
+    return StreamingResponse(encode_json_array(documents), media_type="application/json")
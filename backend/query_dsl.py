@@ -0,0 +1,129 @@
+"""Declared filter/sort grammar for list endpoints, checked against INDEXES.
+
+    ?status=Active                      equality
+    ?status__in=Active,Expiring         any of a comma-separated list
+    ?end_date__lt=2027-01-01            ranges: __gt, __gte, __lt, __lte
+    ?sort=status,-end_date              multi-key sort, "-" for descending
+
+Only declared fields are accepted, and a query is only run when one of the
+collection's declared indexes both bounds the scan and yields the requested
+order, so no request can fall back to a collection scan or an in-memory sort.
+"""
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from indexes import INDEXES
+from kpi_history import local_time
+
+RANGE_OPERATORS = {"gt": "$gt", "gte": "$gte", "lt": "$lt", "lte": "$lte"}
+RANGE_TYPES = (datetime, float, int)
+
+class QueryError(ValueError):
+    pass
+
+def _parse_value(field: str, kind: type, raw: str):
+    try:
+        if kind is datetime:
+            # Stored dates are naive local time
+            return local_time(datetime.fromisoformat(raw))
+        return kind(raw)
+    except ValueError:
+        raise QueryError("Invalid value for %s: %r" % (field, raw))
+
+def parse_filters(params: List[Tuple[str, str]], fields: Dict[str, type]) -> dict:
+    """Mongo filter from (name, value) query parameters."""
+    match = {}
+    for name, raw in params:
+        field, _, operator = name.partition("__")
+        if field not in fields:
+            raise QueryError("Unknown filter field: %s" % field)
+        kind = fields[field]
+        if not operator:
+            condition = _parse_value(field, kind, raw)
+        elif operator == "in":
+            condition = {"$in": [_parse_value(field, kind, value) for value in raw.split(",") if value]}
+        elif operator in RANGE_OPERATORS:
+            if kind not in RANGE_TYPES:
+                raise QueryError("%s does not support range filters" % field)
+            condition = {RANGE_OPERATORS[operator]: _parse_value(field, kind, raw)}
+        else:
+            raise QueryError("Unknown operator: %s" % name)
+
+        existing = match.get(field)
+        if isinstance(existing, dict) and isinstance(condition, dict):
+            existing.update(condition)
+        elif existing is not None:
+            raise QueryError("Conflicting filters on %s" % field)
+        else:
+            match[field] = condition
+    return match
+
+def parse_sort(value: Optional[str], fields: Dict[str, type]) -> List[Tuple[str, int]]:
+    sort = []
+    for key in (value or "").split(","):
+        key = key.strip()
+        if not key:
+            continue
+        field = key.lstrip("-")
+        if field not in fields:
+            raise QueryError("Unknown sort field: %s" % field)
+        sort.append((field, -1 if key.startswith("-") else 1))
+    return sort
+
+def _is_equality(condition) -> bool:
+    # An $in list behaves like equality for index bounds; MongoDB merges the
+    # sorted runs per value instead of sorting in memory
+    return not isinstance(condition, dict) or set(condition) == {"$in"}
+
+def _plan(keys: List[Tuple[str, int]], match: dict, sort: List[Tuple[str, int]]) -> Optional[int]:
+    """Number of leading index keys with bounds, or None if the sort needs memory."""
+    equalities = {field for field, condition in match.items() if _is_equality(condition)}
+    position = 0
+    while position < len(keys) and keys[position][0] in equalities:
+        position += 1
+    bounded = position
+
+    # Sorting on a field pinned by equality is a no-op
+    remaining = [(field, direction) for field, direction in sort if field not in equalities]
+    if remaining:
+        # Same order or exactly reversed, starting right after the equalities
+        window = keys[position:position + len(remaining)]
+        if len(window) < len(remaining) or any(field != key for (field, _), (key, _) in zip(remaining, window)):
+            return None
+        flips = {direction * key_direction for (_, direction), (_, key_direction) in zip(remaining, window)}
+        if len(flips) > 1:
+            return None
+        if remaining[0][0] in match:
+            bounded = position + 1
+    elif position < len(keys) and keys[position][0] in match:
+        # One range after the equality prefix
+        bounded = position + 1
+    return bounded
+
+def plan(collection: str, match: dict, sort: List[Tuple[str, int]]) -> Optional[str]:
+    """Name of the declared index that serves the query; QueryError if none does.
+
+    None means an unfiltered, unsorted listing that needs no index.
+    """
+    if not match and not sort:
+        return None
+    best = None
+    for index in INDEXES.get(collection, []):
+        keys = list(index.document["key"].items())
+        if any("." in field for field, _ in keys):
+            # Multikey paths into arrays never serve top-level fields
+            continue
+        bounded = _plan(keys, match, sort)
+        if bounded is None:
+            continue
+        # Filters must bound the scan; an unfiltered sort walks the index in order
+        if match and bounded == 0:
+            continue
+        if best is None or bounded > best[0]:
+            best = (bounded, index.document["name"])
+    if best is None:
+        raise QueryError("No index on %s supports this filter and sort; indexed keys: %s" % (
+            collection,
+            "; ".join(",".join(field for field, _ in index.document["key"].items()) for index in INDEXES.get(collection, [])),
+        ))
+    return best[1]
@@ -0,0 +1,170 @@
+"""Shipping-cost quotes from precomputed origin-warehouse x destination-zone tables.
+
+Rebuild the tables offline with:
+
+    python quotes.py build [output_path]
+"""
+import os
+import sys
+import threading
+from datetime import datetime
+from typing import List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+
+from lead_scoring import haversine_miles
+from queries import id_aliases
+from regions import US_STATES, region_code
+
+# Run as a script, so .env must be loaded before the settings below are read
+load_dotenv()
+
+RATE_TABLE_PATH = os.getenv(
+    "RATE_TABLE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "rate_tables.npz")
+)
+
+# Parcel zone by distance from origin to destination centroid (miles)
+ZONE_BOUNDS = np.array([150, 300, 600, 1000, 1400, 1800])
+FIRST_ZONE = 2
+# Base cost per shipment for zones 2..8
+ZONE_RATES = np.array([2.50, 2.75, 3.10, 3.55, 4.05, 4.50, 5.05])
+
+URGENCY_MULTIPLIERS = {"Low": 1.0, "Medium": 1.1, "High": 1.3}
+
+DESTINATION_CODES = [abbr for abbr, _, _ in US_STATES.values()]
+
+def volume_multiplier(monthly_shipments: int) -> float:
+    if monthly_shipments > 1000:
+        return 0.8
+    if monthly_shipments > 500:
+        return 0.9
+    return 1.0
+
+def build_tables(warehouses, threepls) -> dict:
+    threepls = list(threepls)
+    names = {str(threepl["_id"]): threepl.get("company_name", "") for threepl in threepls}
+    # Warehouses reference their 3PL by its uuid id or by str(_id); quote
+    # each 3PL once, under str(_id)
+    aliases = id_aliases(threepls)
+    located = [
+        (aliases.get(warehouse["threepl_id"], warehouse["threepl_id"]), warehouse) for warehouse in warehouses
+        if warehouse.get("lat") is not None and warehouse.get("lng") is not None and warehouse.get("threepl_id")
+    ]
+    # Group origins by 3PL so per-3PL minimums are a single reduceat
+    located.sort(key=lambda origin: origin[0])
+
+    threepl_ids = []
+    offsets = []
+    for position, (threepl_id, _) in enumerate(located):
+        if not threepl_ids or threepl_ids[-1] != threepl_id:
+            threepl_ids.append(threepl_id)
+            offsets.append(position)
+    located = [warehouse for _, warehouse in located]
+
+    origin_lat = np.radians([warehouse["lat"] for warehouse in located])[:, None]
+    origin_lng = np.radians([warehouse["lng"] for warehouse in located])[:, None]
+    destination_lat = np.radians([lat for _, lat, _ in US_STATES.values()])[None, :]
+    destination_lng = np.radians([lng for _, _, lng in US_STATES.values()])[None, :]
+    distances = haversine_miles(origin_lat, origin_lng, destination_lat, destination_lng)
+    zones = (np.searchsorted(ZONE_BOUNDS, distances) + FIRST_ZONE).astype(np.uint8)
+
+    return {
+        "warehouse_ids": np.array([warehouse["id"] for warehouse in located], dtype=str),
+        "threepl_ids": np.array(threepl_ids, dtype=str),
+        "threepl_names": np.array([names.get(threepl_id, "") for threepl_id in threepl_ids], dtype=str),
+        "offsets": np.array(offsets, dtype=np.int64),
+        "destination_codes": np.array(DESTINATION_CODES, dtype=str),
+        "zones": zones.reshape(len(located), len(DESTINATION_CODES)),
+        "rates": ZONE_RATES[zones - FIRST_ZONE].reshape(len(located), len(DESTINATION_CODES)),
+        "built_at": np.array(datetime.now().isoformat()),
+    }
+
+def save_tables(tables: dict, path: str = RATE_TABLE_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp.npz"
+    np.savez_compressed(tmp_path, **tables)
+    os.replace(tmp_path, path)
+
+class QuoteEngine:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tables = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._tables is not None
+
+    @property
+    def built_at(self) -> Optional[str]:
+        return str(self._tables["built_at"]) if self._tables else None
+
+    def load(self, path: str = RATE_TABLE_PATH) -> bool:
+        if not os.path.exists(path):
+            return False
+        with np.load(path) as archive:
+            self.set_tables({name: archive[name] for name in archive.files})
+        return True
+
+    def set_tables(self, tables: dict):
+        tables = dict(tables)
+        tables["destination_index"] = {
+            str(code): position for position, code in enumerate(tables["destination_codes"])
+        }
+        with self._lock:
+            self._tables = tables
+
+    def quote(self, monthly_shipments: int, regions: List[str], urgency: str = "Medium", limit: Optional[int] = None) -> dict:
+        tables = self._tables
+        if tables is None:
+            raise RuntimeError("Rate tables are not loaded")
+
+        codes = [region_code(region) for region in regions]
+        unknown = [region for region, code in zip(regions, codes) if code is None]
+        columns = [tables["destination_index"][code] for code in codes if code is not None]
+        if not columns or len(tables["threepl_ids"]) == 0:
+            return {"quotes": [], "unknown_regions": unknown}
+
+        # Cheapest origin of each 3PL per destination, shipments split evenly
+        rates = np.minimum.reduceat(tables["rates"][:, columns], tables["offsets"], axis=0)
+        zones = np.minimum.reduceat(tables["zones"][:, columns], tables["offsets"], axis=0)
+        multiplier = volume_multiplier(monthly_shipments) * URGENCY_MULTIPLIERS.get(urgency, 1.0)
+        per_shipment = rates.mean(axis=1) * multiplier
+
+        order = np.argsort(per_shipment, kind="stable")
+        if limit:
+            order = order[:limit]
+
+        quotes = []
+        known_regions = [region for region, code in zip(regions, codes) if code is not None]
+        for position in order.tolist():
+            cost = float(per_shipment[position])
+            monthly = cost * monthly_shipments
+            quotes.append({
+                "threepl_id": str(tables["threepl_ids"][position]),
+                "company_name": str(tables["threepl_names"][position]),
+                "per_shipment": round(cost, 2),
+                "monthly": round(monthly, 2),
+                "annual": round(monthly * 12, 2),
+                "zones": {region: int(zones[position, column]) for column, region in enumerate(known_regions)},
+            })
+        return {"quotes": quotes, "unknown_regions": unknown}
+
+def main():
+    from pymongo import MongoClient
+
+    if len(sys.argv) < 2 or sys.argv[1] != "build":
+        print(__doc__)
+        sys.exit(1)
+    path = sys.argv[2] if len(sys.argv) > 2 else RATE_TABLE_PATH
+
+    db = MongoClient(os.getenv("MONGO_URL")).growe_platform
+    tables = build_tables(
+        db.warehouses.find({}, {"_id": 0, "id": 1, "threepl_id": 1, "lat": 1, "lng": 1}),
+        db.three_pls.find({}, {"id": 1, "company_name": 1}),
+    )
+    save_tables(tables, path)
+    print("✅ Rate tables written to %s (%d origins, %d 3PLs)" % (path, len(tables["warehouse_ids"]), len(tables["threepl_ids"])))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
+
+READ_PREFERENCE_MODES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+# Smallest maxStalenessSeconds the server accepts
+MIN_MAX_STALENESS_SECONDS = 90
+
+def reporting_read_preference(mode: str, max_staleness_seconds: int = -1):
+    if mode not in READ_PREFERENCE_MODES:
+        raise ValueError("Unknown read preference %r, expected one of %s" % (mode, ", ".join(READ_PREFERENCE_MODES)))
+    if mode == "primary":
+        return Primary()
+    if max_staleness_seconds != -1 and max_staleness_seconds < MIN_MAX_STALENESS_SECONDS:
+        raise ValueError("maxStalenessSeconds must be -1 or at least %d" % MIN_MAX_STALENESS_SECONDS)
+    return READ_PREFERENCE_MODES[mode](max_staleness=max_staleness_seconds)
@@ -0,0 +1,53 @@
+import asyncio
+import time
+
+import pymongo
+from pymongo.errors import PyMongoError
+from starlette.concurrency import run_in_threadpool
+
+from indexes import missing_indexes
+
+class ReadinessProbe:
+    def __init__(self, cache_seconds: float, timeout_seconds: float):
+        self.cache_seconds = cache_seconds
+        self.timeout_seconds = timeout_seconds
+        self.startup_seconds = None
+        self._result = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def mark_started(self, startup_seconds: float):
+        self.startup_seconds = startup_seconds
+
+    def reset(self):
+        self._result = None
+        self._checked_at = 0.0
+
+    async def check(self, db) -> dict:
+        # Probes arriving together share one check; results are reused
+        # for cache_seconds so orchestrators cannot hammer the database
+        async with self._lock:
+            if self._result is None or time.monotonic() - self._checked_at >= self.cache_seconds:
+                self._result = await run_in_threadpool(self._run_checks, db)
+                self._checked_at = time.monotonic()
+            return self._result
+
+    def _run_checks(self, db) -> dict:
+        checks = {}
+        if self.startup_seconds is None or db is None:
+            checks["startup"] = {"ok": False, "error": "Worker is still starting"}
+            return {"ready": False, "checks": checks}
+        checks["startup"] = {"ok": True, "seconds": round(self.startup_seconds, 3)}
+
+        start = time.perf_counter()
+        try:
+            with pymongo.timeout(self.timeout_seconds):
+                db.command("ping")
+                checks["mongo"] = {"ok": True, "latency_ms": round((time.perf_counter() - start) * 1000, 2)}
+                missing = missing_indexes(db)
+                checks["indexes"] = {"ok": not missing, "missing": missing}
+        except PyMongoError as exc:
+            checks.setdefault("mongo", {"ok": False, "error": str(exc)})
+            checks.setdefault("indexes", {"ok": False, "error": "Not checked"})
+
+        return {"ready": all(check["ok"] for check in checks.values()), "checks": checks}
@@ -0,0 +1,133 @@
+import json
+import logging
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from fastapi.responses import JSONResponse
+from pymongo import monitoring
+
+logger = logging.getLogger("growe.requests")
+
+# Phases reported in Server-Timing, in header order
+TIMING_PHASES = ("auth", "db", "render")
+
+class RequestContext:
+    def __init__(self, scope: dict, request_id: str):
+        self.scope = scope
+        self.request_id = request_id
+        self.started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.db_commands = 0
+
+    def add(self, phase: str, seconds: float):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def route(self) -> Optional[str]:
+        route = self.scope.get("route")
+        return getattr(route, "path", None)
+
+    def server_timing(self, total: float) -> str:
+        # Sent with the response headers, so it cannot include work done
+        # while a streamed body is produced (later cursor batches and their
+        # encoding); the request log line, written at the end, does
+        metrics = []
+        for phase in TIMING_PHASES:
+            if phase in self.phases:
+                entry = "%s;dur=%.2f" % (phase, self.phases[phase] * 1000)
+                if phase == "db":
+                    entry += ';desc="%d commands"' % self.db_commands
+                metrics.append(entry)
+        metrics.append("total;dur=%.2f" % (total * 1000))
+        return ", ".join(metrics)
+
+# Request being handled, visible to dependencies and driver listeners
+# running on the same call stack (including threadpool dependencies)
+current_request: ContextVar[Optional[RequestContext]] = ContextVar("current_request", default=None)
+
+def current_route() -> Optional[str]:
+    context = current_request.get()
+    if context is None:
+        return None
+    return context.route() or context.scope.get("path")
+
+@contextmanager
+def timed(phase: str):
+    context = current_request.get()
+    if context is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        context.add(phase, time.perf_counter() - start)
+
+class DatabaseTimingListener(monitoring.CommandListener):
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._record(event)
+
+    def failed(self, event):
+        self._record(event)
+
+    def _record(self, event):
+        context = current_request.get()
+        if context is not None:
+            context.add("db", event.duration_micros / 1e6)
+            context.db_commands += 1
+
+class TimedJSONResponse(JSONResponse):
+    # Only the JSON rendering: FastAPI runs jsonable_encoder on the handler's
+    # return value before the response class sees it
+    def render(self, content) -> bytes:
+        with timed("render"):
+            return super().render(content)
+
+class RequestContextMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        request_id = headers.get(b"x-request-id", b"").decode("latin-1") or uuid.uuid4().hex
+        context = RequestContext(scope, request_id)
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                total = time.perf_counter() - context.started
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", context.server_timing(total).encode("latin-1")),
+                    (b"timing-allow-origin", b"*"),
+                    (b"x-request-id", request_id.encode("latin-1")),
+                ]
+            await send(message)
+
+        token = current_request.set(context)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_request.reset(token)
+            total = time.perf_counter() - context.started
+            logger.info(json.dumps({
+                "request_id": request_id,
+                "method": scope.get("method"),
+                "path": scope.get("path"),
+                "route": context.route(),
+                "status": status_code,
+                "duration_ms": round(total * 1000, 2),
+                "phases_ms": {phase: round(seconds * 1000, 2) for phase, seconds in context.phases.items()},
+                "db_commands": context.db_commands,
+            }))
@@ -0,0 +1,121 @@
+"""Per-worker cache of whole JSON response bodies for public list endpoints.
+
+Each key has at most one fetch in flight; concurrent requests await it.
+Fresh bodies are served for ttl_seconds, then served stale for up to
+stale_seconds more while a background fetch replaces them. Writes in this
+worker invalidate by tag (collection name); other workers' copies expire
+with the TTL.
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Iterable, Tuple
+
+from fastapi.responses import Response
+from starlette.concurrency import run_in_threadpool
+
+from metrics import RESPONSE_CACHE_ENTRIES, RESPONSE_CACHE_REQUESTS
+
+logger = logging.getLogger("growe.response_cache")
+
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "30"))
+RESPONSE_CACHE_STALE_SECONDS = float(os.getenv("RESPONSE_CACHE_STALE_SECONDS", "300"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "256"))
+
+class _Entry:
+    __slots__ = ("body", "fetched_at", "tags")
+
+    def __init__(self, body: bytes, fetched_at: float, tags: Tuple[str, ...]):
+        self.body = body
+        self.fetched_at = fetched_at
+        self.tags = tags
+
+class ResponseCache:
+    # Only touched from the event loop, so no locking; loaders run in the threadpool
+
+    def __init__(
+        self,
+        ttl_seconds: float = RESPONSE_CACHE_TTL_SECONDS,
+        stale_seconds: float = RESPONSE_CACHE_STALE_SECONDS,
+        max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._inflight: Dict[Hashable, Tuple[asyncio.Task, Tuple[str, ...]]] = {}
+        # Fetches that started before a tag was invalidated must not be stored
+        self._epoch = 0
+        self._invalidated: Dict[str, int] = {}
+
+    async def get(self, route: str, params: Hashable, tags: Iterable[str], load: Callable[[], bytes]) -> Tuple[bytes, str]:
+        """Body for (route, params) and how it was served."""
+        key = (route, params)
+        tags = tuple(tags)
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = self.clock() - entry.fetched_at
+            if age < self.ttl_seconds:
+                self._entries.move_to_end(key)
+                return self._served(route, "hit", entry.body)
+            if age < self.ttl_seconds + self.stale_seconds:
+                if key not in self._inflight:
+                    self._fetch(key, tags, load)
+                return self._served(route, "stale", entry.body)
+
+        if key in self._inflight:
+            task, _ = self._inflight[key]
+            result = "coalesced"
+        else:
+            task = self._fetch(key, tags, load)
+            result = "miss"
+        # A disconnecting client must not cancel the fetch other requests share
+        return self._served(route, result, await asyncio.shield(task))
+
+    async def response(self, route: str, params: Hashable, tags: Iterable[str], load: Callable[[], bytes]) -> Response:
+        body, result = await self.get(route, params, tags, load)
+        return Response(body, media_type="application/json", headers={"X-Cache": result.upper()})
+
+    def invalidate(self, *tags: str):
+        self._epoch += 1
+        for tag in tags:
+            self._invalidated[tag] = self._epoch
+        tags = set(tags)
+        for key in [key for key, entry in self._entries.items() if tags & set(entry.tags)]:
+            del self._entries[key]
+        # Later requests start a fresh fetch instead of joining one that may
+        # have read from before the write
+        for key in [key for key, (_, fetch_tags) in self._inflight.items() if tags & set(fetch_tags)]:
+            del self._inflight[key]
+        RESPONSE_CACHE_ENTRIES.set(len(self._entries))
+
+    def _served(self, route: str, result: str, body: bytes) -> Tuple[bytes, str]:
+        RESPONSE_CACHE_REQUESTS.labels(route, result).inc()
+        return body, result
+
+    def _fetch(self, key: Hashable, tags: Tuple[str, ...], load: Callable[[], bytes]) -> asyncio.Task:
+        task = asyncio.create_task(self._load(key, tags, load, self._epoch))
+        self._inflight[key] = (task, tags)
+        task.add_done_callback(lambda done: self._finished(key, done))
+        return task
+
+    async def _load(self, key: Hashable, tags: Tuple[str, ...], load: Callable[[], bytes], epoch: int) -> bytes:
+        body = await run_in_threadpool(load)
+        if all(self._invalidated.get(tag, 0) <= epoch for tag in tags):
+            self._entries[key] = _Entry(body, self.clock(), tags)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            RESPONSE_CACHE_ENTRIES.set(len(self._entries))
+        return body
+
+    def _finished(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key, (None,))[0] is task:
+            del self._inflight[key]
+        if not task.cancelled() and task.exception() is not None:
+            # Waiters get the error; a failed background refresh keeps the stale body
+            logger.warning("Loading %s for the response cache failed: %r", key[0], task.exception())
@@ -1,19 +1,290 @@
-from fastapi import FastAPI, HTTPException, Depends, status
+import time
+
+STARTED_AT = time.perf_counter()
+
+from fastapi import BackgroundTasks, FastAPI, File, HTTPException, Depends, Header, Query, Request, Response, UploadFile, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
-from pymongo import MongoClient
+from fastapi.responses import JSONResponse, StreamingResponse
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import MongoClient, ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from starlette.concurrency import run_in_threadpool
+import asyncio
+import json
+import httpx
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
+import logging
 import os
 from dotenv import load_dotenv
 import uuid
+from urllib.parse import quote
 from typing import List, Optional
 from pydantic import BaseModel
 import bcrypt
 import jwt
 
+# Before the local imports below: they read their settings from the
+# environment when imported
 load_dotenv()
 
-app = FastAPI(title="Growe Logistics Platform", version="1.0.0")
+from action_items import OPEN_STATUSES, due_pipeline, item_update, new_item
+from deal_events import build_event, changed_fields, deal_history, record_event, rep_history
+from enrichment import PROPOSALS_COLLECTION
+from facets import FACET_FIELDS, FacetCounts, backfill_region_codes, count_facets, normalize_threepl, region_codes, threepl_filter
+from geocoder import Geocoder
+from idempotency import IdempotencyError, IdempotencyStore, request_fingerprint
+from industry_news import NEWS_POLL_SECONDS, TRENDING_THRESHOLD, build_article, list_news, load_feeds, poll_feeds, present, record_hit
+from indexes import ensure_indexes
+from kpi_history import compute_kpis, ensure_history_collection, history, local_time, take_snapshot
+from lead_buffer import LeadWriteBuffer
+from lease_documents import PDF_MAGIC, DocumentTooLarge, find_file, hash_upload, iter_file, parse_range, store
+from lead_scoring import WarehouseIndex
+from metrics import STARTUP_SECONDS, CommandMetricsListener, MetricsMiddleware, PoolMetricsListener, metrics_response, shutdown_metrics
+from portal import bootstrap, find_partner, find_threepl
+from profiler import SLOW_QUERY_PROFILER, SlowQueryProfiler
+from queries import by_id, by_ids, encode_json_array, find_shaped, id_aliases, json_default, stream_shaped
+from query_dsl import QueryError, parse_filters, parse_sort, plan
+from quotes import QuoteEngine, build_tables
+from read_preferences import reporting_read_preference
+from readiness import ReadinessProbe
+from response_cache import ResponseCache
+from warehouse_view import VIEW_COLLECTION, rebuild_view, refresh_threepl_view, refresh_view, threepl_match
+from request_context import DatabaseTimingListener, RequestContextMiddleware, TimedJSONResponse, timed
+
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format="%(asctime)s %(levelname)s %(name)s %(message)s")
+logger = logging.getLogger("growe")
+
+# Database connection
+MONGO_URL = os.getenv("MONGO_URL")
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+event_listeners = [CommandMetricsListener(), PoolMetricsListener(), DatabaseTimingListener()]
+slow_query_profiler = SlowQueryProfiler() if SLOW_QUERY_PROFILER else None
+if slow_query_profiler:
+    event_listeners.append(slow_query_profiler)
+
+# Heavy read-only paths (directory lists, analytics, background loaders)
+# may read from secondaries; auth, writes and read-your-writes paths use db
+REPORTING_READ_PREFERENCE = reporting_read_preference(
+    os.getenv("REPORTING_READ_PREFERENCE", "primary"),
+    int(os.getenv("REPORTING_MAX_STALENESS_SECONDS", "-1"))
+)
+
+# Opened per worker process in lifespan, never shared across fork()
+client = None
+db = None
+reporting_db = None
+# asyncio driver for routes that fan out several queries at once
+async_client = None
+async_reporting_db = None
+
+# Readiness probe
+readiness_probe = ReadinessProbe(
+    cache_seconds=float(os.getenv("READY_CACHE_SECONDS", "5")),
+    timeout_seconds=float(os.getenv("READY_TIMEOUT_SECONDS", "2"))
+)
+
+async def initialise_indexes():
+    try:
+        await run_in_threadpool(ensure_indexes, db)
+    except PyMongoError:
+        logger.exception("Index initialisation failed")
+    readiness_probe.reset()
+
+# Warehouse coordinates for lead scoring; new warehouses are added as they
+# are created and a periodic reload picks up writes from other workers
+warehouse_index = WarehouseIndex()
+WAREHOUSE_INDEX_REFRESH_SECONDS = float(os.getenv("WAREHOUSE_INDEX_REFRESH_SECONDS", "300"))
+
+def load_warehouse_index():
+    warehouse_index.load(
+        reporting_db.warehouses.find({}, {"_id": 0, "id": 1, "threepl_id": 1, "lat": 1, "lng": 1}),
+        id_aliases(reporting_db.three_pls.find({}, {"id": 1})),
+    )
+
+async def refresh_warehouse_index():
+    while True:
+        try:
+            await run_in_threadpool(load_warehouse_index)
+        except PyMongoError:
+            logger.exception("Warehouse index refresh failed")
+        await asyncio.sleep(WAREHOUSE_INDEX_REFRESH_SECONDS)
+
+# 3PL directory facet counts; kept current for this worker's writes and
+# reloaded periodically for everyone else's
+facet_counts = FacetCounts()
+FACET_REFRESH_SECONDS = float(os.getenv("FACET_REFRESH_SECONDS", "300"))
+
+async def refresh_facet_counts():
+    try:
+        await run_in_threadpool(backfill_region_codes, db)
+    except PyMongoError:
+        logger.exception("Backfilling 3PL region codes failed")
+    while True:
+        try:
+            await run_in_threadpool(facet_counts.load, reporting_db)
+        except PyMongoError:
+            logger.exception("Facet count refresh failed")
+        await asyncio.sleep(FACET_REFRESH_SECONDS)
+
+# Public list and dashboard responses, shared by concurrent visitors and
+# invalidated by this worker's writes to the collections they read
+response_cache = ResponseCache()
+DASHBOARD_COLLECTIONS = ("three_pls", "warehouses", "deals", "leases", "shipper_leads")
+
+def json_array(collection: str, **options) -> bytes:
+    return b"".join(encode_json_array(find_shaped(reporting_db, collection, **options)))
+
+# Warehouses with their 3PL embedded for the map; refreshed on write here
+# and rebuilt periodically for other workers' writes
+WAREHOUSE_VIEW_REFRESH_SECONDS = float(os.getenv("WAREHOUSE_VIEW_REFRESH_SECONDS", "300"))
+
+def sync_warehouse_view(refresh, *args):
+    try:
+        refresh(db, *args)
+    except PyMongoError:
+        logger.exception("Warehouse view refresh failed; the next rebuild will catch up")
+    response_cache.invalidate(VIEW_COLLECTION)
+
+async def refresh_warehouse_view():
+    while True:
+        try:
+            removed = await run_in_threadpool(rebuild_view, db)
+            if removed:
+                logger.info("Removed %d deleted warehouses from %s", removed, VIEW_COLLECTION)
+            response_cache.invalidate(VIEW_COLLECTION)
+        except PyMongoError:
+            logger.exception("Warehouse view rebuild failed")
+        await asyncio.sleep(WAREHOUSE_VIEW_REFRESH_SECONDS)
+
+# Offline ZIP/city centroids for warehouses created without coordinates
+geocoder = Geocoder()
+MAX_WAREHOUSE_IMPORT = int(os.getenv("MAX_WAREHOUSE_IMPORT", "5000"))
+
+# Shipping rate tables, built offline with `python quotes.py build`
+quote_engine = QuoteEngine()
+
+def load_rate_tables():
+    if quote_engine.load():
+        return
+    # No prebuilt tables on disk: build them in memory from current data
+    logger.warning("Rate tables not found, building from the database")
+    quote_engine.set_tables(build_tables(
+        reporting_db.warehouses.find({}, {"_id": 0, "id": 1, "threepl_id": 1, "lat": 1, "lng": 1}),
+        reporting_db.three_pls.find({}, {"id": 1, "company_name": 1})
+    ))
+
+async def initialise_rate_tables():
+    try:
+        await run_in_threadpool(load_rate_tables)
+    except (OSError, PyMongoError):
+        logger.exception("Rate table initialisation failed")
+
+# Dashboard KPI history
+KPI_SNAPSHOT_SECONDS = float(os.getenv("KPI_SNAPSHOT_SECONDS", "300"))
+
+async def snapshot_kpis():
+    try:
+        await run_in_threadpool(ensure_history_collection, db)
+    except PyMongoError:
+        logger.exception("KPI history collection setup failed")
+    while True:
+        try:
+            await run_in_threadpool(take_snapshot, db, KPI_SNAPSHOT_SECONDS, reporting_db)
+        except PyMongoError:
+            logger.exception("KPI snapshot failed")
+        await asyncio.sleep(KPI_SNAPSHOT_SECONDS)
+
+# Industry news feeds from data/news_feeds.json; each feed is claimed by
+# one worker per poll interval
+NEWS_FEEDS = load_feeds()
+
+async def poll_news():
+    if not NEWS_FEEDS:
+        return
+    async with httpx.AsyncClient(follow_redirects=True, timeout=httpx.Timeout(15.0)) as news_client:
+        while True:
+            try:
+                await poll_feeds(db, news_client, NEWS_FEEDS)
+            except PyMongoError:
+                logger.exception("Polling news feeds failed")
+            await asyncio.sleep(NEWS_POLL_SECONDS)
+
+# Lead intake: "direct" inserts per request, "buffered" acknowledges after a
+# local journal append and writes leads in batches
+LEAD_INTAKE_MODE = os.getenv("LEAD_INTAKE_MODE", "direct")
+lead_buffer = LeadWriteBuffer(
+    spill_dir=os.getenv("LEAD_BUFFER_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "lead_buffer")),
+    batch_size=int(os.getenv("LEAD_BUFFER_BATCH_SIZE", "500")),
+    flush_seconds=float(os.getenv("LEAD_BUFFER_FLUSH_SECONDS", "1")),
+    fsync=os.getenv("LEAD_BUFFER_FSYNC", "false").lower() == "true"
+) if LEAD_INTAKE_MODE == "buffered" else None
+
+def reporting_database(mongo_client):
+    # Same database as db, read with REPORTING_READ_PREFERENCE
+    return mongo_client.get_database("growe_platform", read_preference=REPORTING_READ_PREFERENCE)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global client, db, reporting_db, async_client, async_reporting_db
+    # MongoClient connects in the background, so startup does not wait on
+    # the database; /api/ready reports when it is actually usable
+    client = MongoClient(
+        MONGO_URL,
+        maxPoolSize=MONGO_MAX_POOL_SIZE,
+        minPoolSize=MONGO_MIN_POOL_SIZE,
+        event_listeners=event_listeners
+    )
+    db = client.growe_platform
+    reporting_db = reporting_database(client)
+    async_client = AsyncIOMotorClient(
+        MONGO_URL,
+        maxPoolSize=MONGO_MAX_POOL_SIZE,
+        minPoolSize=MONGO_MIN_POOL_SIZE,
+        event_listeners=event_listeners
+    )
+    async_reporting_db = reporting_database(async_client)
+    if slow_query_profiler:
+        slow_query_profiler.attach(client)
+    if lead_buffer:
+        await lead_buffer.start(db)
+    background_tasks = [
+        asyncio.create_task(initialise_indexes()),
+        asyncio.create_task(refresh_warehouse_index()),
+        asyncio.create_task(refresh_facet_counts()),
+        asyncio.create_task(refresh_warehouse_view()),
+        asyncio.create_task(initialise_rate_tables()),
+        # Warm the centroid table so the first import does not pay for it
+        asyncio.create_task(run_in_threadpool(geocoder.load)),
+        asyncio.create_task(snapshot_kpis()),
+        asyncio.create_task(poll_news()),
+    ]
+    
+    startup_seconds = time.perf_counter() - STARTED_AT
+    readiness_probe.mark_started(startup_seconds)
+    STARTUP_SECONDS.set(startup_seconds)
+    logger.info("Worker %d started in %.3fs", os.getpid(), startup_seconds)
+    
+    yield
+    
+    for task in background_tasks:
+        task.cancel()
+    if lead_buffer:
+        await lead_buffer.stop()
+    if slow_query_profiler:
+        slow_query_profiler.attach(None)
+    client.close()
+    async_client.close()
+    shutdown_metrics()
+
+app = FastAPI(
+    title="Growe Logistics Platform",
+    version="1.0.0",
+    default_response_class=TimedJSONResponse,
+    lifespan=lifespan
+)
 
 # CORS middleware
 app.add_middleware(
@@ -22,12 +293,17 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Request-ID", "X-Next-Cursor"],
 )
 
-# Database connection
-MONGO_URL = os.getenv("MONGO_URL")
-client = MongoClient(MONGO_URL)
-db = client.growe_platform
+# Request metrics
+app.add_middleware(MetricsMiddleware)
+
+# Request context, Server-Timing and request logs (outermost)
+app.add_middleware(RequestContextMiddleware)
+
+# Idempotency-Key support for public intake
+idempotency_store = IdempotencyStore()
 
 # Security
 security = HTTPBearer()
@@ -58,6 +334,9 @@ class ThreePL(BaseModel):
     phone: str
     services: List[str] = []
     regions_covered: List[str] = []
+    website: str = ""
+    # State abbreviations for regions_covered, maintained by the API
+    region_codes: List[str] = []
     status: str = "New"  # New, Engaged, Matched, Dormant, Expired
     notes: str = ""
     created_at: Optional[datetime] = None
@@ -77,8 +356,10 @@ class Warehouse(BaseModel):
     city: str
     state: str
     zip_code: str
-    lat: float
-    lng: float
+    # Geocoded from the address when omitted
+    lat: Optional[float] = None
+    lng: Optional[float] = None
+    geocode_precision: Optional[str] = None
     growe_represented: bool = True
     created_at: Optional[datetime] = None
     
@@ -87,6 +368,14 @@ class Warehouse(BaseModel):
             datetime: lambda v: v.isoformat() if v else None
         }
 
+class ActionItem(BaseModel):
+    id: Optional[str] = None
+    type: str = "general"  # renewal_notice, termination_notice, insurance_renewal, ...
+    description: str
+    due_date: datetime
+    priority: str = "medium"  # critical, high, medium, low
+    status: str = "pending"  # pending, completed
+
 class Lease(BaseModel):
     id: Optional[str] = None
     warehouse_id: str
@@ -100,12 +389,22 @@ class Lease(BaseModel):
     status: str = "Active"  # Active, Expiring, Expired, Renewed
     notes: str = ""
     created_at: Optional[datetime] = None
+    # Parsed from the latest uploaded document by lease_parser.py
+    lease_agreement: Optional[dict] = None
+    action_items: List[ActionItem] = []
     
     class Config:
         json_encoders = {
             datetime: lambda v: v.isoformat() if v else None
         }
 
+class ActionItemUpdate(BaseModel):
+    action_item_id: str
+    description: Optional[str] = None
+    due_date: Optional[datetime] = None
+    priority: Optional[str] = None
+    status: Optional[str] = None
+
 class Deal(BaseModel):
     id: Optional[str] = None
     threepl_id: str
@@ -116,12 +415,25 @@ class Deal(BaseModel):
     notes: str = ""
     created_at: Optional[datetime] = None
     rep_owner: str = ""
+    version: int = 0
     
     class Config:
         json_encoders = {
             datetime: lambda v: v.isoformat() if v else None
         }
 
+# Deal fields a PATCH may clear with an explicit null
+NULLABLE_DEAL_FIELDS = {"value", "expected_close_date"}
+
+class DealPatch(BaseModel):
+    threepl_id: Optional[str] = None
+    deal_name: Optional[str] = None
+    stage: Optional[str] = None
+    value: Optional[float] = None
+    expected_close_date: Optional[datetime] = None
+    notes: Optional[str] = None
+    rep_owner: Optional[str] = None
+
 class ShipperLead(BaseModel):
     id: Optional[str] = None
     company_name: str
@@ -141,6 +453,30 @@ class ShipperLead(BaseModel):
             datetime: lambda v: v.isoformat() if v else None
         }
 
+class NewsArticle(BaseModel):
+    id: Optional[str] = None
+    title: str
+    summary: str
+    source: str
+    category: str
+    full_content: Optional[str] = None
+    url: Optional[str] = None
+    author: Optional[str] = None
+    tags: List[str] = []
+    published_date: Optional[datetime] = None
+    read_time: Optional[str] = None
+    trending: bool = False
+
+class QuoteRequest(BaseModel):
+    lead_id: Optional[str] = None
+    monthly_shipments: Optional[int] = None
+    regions_needed: List[str] = []
+    urgency: str = "Medium"
+    limit: Optional[int] = 10
+
+class QuoteBatchRequest(BaseModel):
+    requests: List[QuoteRequest]
+
 # Auth functions
 def hash_password(password: str) -> str:
     return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
@@ -158,19 +494,32 @@ def create_jwt_token(user_data: dict) -> str:
     return jwt.encode(payload, JWT_SECRET_KEY, algorithm="HS256")
 
 def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    try:
-        payload = jwt.decode(credentials.credentials, JWT_SECRET_KEY, algorithms=["HS256"])
-        return payload
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token expired")
-    except jwt.JWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
+    with timed("auth"):
+        try:
+            payload = jwt.decode(credentials.credentials, JWT_SECRET_KEY, algorithms=["HS256"])
+            return payload
+        except jwt.ExpiredSignatureError:
+            raise HTTPException(status_code=401, detail="Token expired")
+        except jwt.JWTError:
+            raise HTTPException(status_code=401, detail="Invalid token")
 
 # Routes
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return metrics_response()
+
 @app.get("/api/health")
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.now()}
 
+@app.get("/api/ready")
+async def readiness_check():
+    result = await readiness_probe.check(db)
+    return JSONResponse(
+        status_code=200 if result["ready"] else 503,
+        content={"status": "ready" if result["ready"] else "not_ready", "checks": result["checks"]}
+    )
+
 @app.post("/api/auth/login")
 async def login(login_data: UserLogin):
     user = db.users.find_one({"email": login_data.email})
@@ -193,35 +542,88 @@ async def login(login_data: UserLogin):
         }
     }
 
+def directory_filter(services, regions, status, rep_owner) -> dict:
+    try:
+        return threepl_filter(services, regions, status, rep_owner)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
 @app.get("/api/3pls")
-async def get_3pls():
-    three_pls = list(db.three_pls.find())
-    for threepl in three_pls:
-        threepl["id"] = str(threepl["_id"])
-        del threepl["_id"]
-    return three_pls
+async def get_3pls(
+    services: Optional[List[str]] = Query(None),
+    regions: Optional[List[str]] = Query(None),
+    status: Optional[List[str]] = Query(None),
+    rep_owner: Optional[List[str]] = Query(None)
+):
+    match = directory_filter(services, regions, status, rep_owner)
+    params = tuple(tuple(sorted(values or ())) for values in (services, regions, status, rep_owner))
+    return await response_cache.response(
+        "/api/3pls", params, ("three_pls",), lambda: json_array("three_pls", match=match)
+    )
+
+@app.get("/api/3pls/facets")
+async def get_3pl_facets(
+    services: Optional[List[str]] = Query(None),
+    regions: Optional[List[str]] = Query(None),
+    status: Optional[List[str]] = Query(None),
+    rep_owner: Optional[List[str]] = Query(None)
+):
+    match = directory_filter(services, regions, status, rep_owner)
+    if not match and facet_counts.loaded:
+        return facet_counts.snapshot()
+    # Drill-down counts within the current filter; multikey index scans
+    return count_facets(reporting_db, match)
 
 @app.post("/api/3pls")
 async def create_3pl(threepl: ThreePL, current_user: dict = Depends(verify_token)):
     if current_user["role"] not in ["admin"]:
         raise HTTPException(status_code=403, detail="Insufficient permissions")
     
-    threepl_dict = threepl.dict()
+    threepl_dict = normalize_threepl(threepl.dict())
     threepl_dict["created_at"] = datetime.now()
     threepl_dict["id"] = str(uuid.uuid4())
     
     result = db.three_pls.insert_one(threepl_dict)
+    facet_counts.apply(None, threepl_dict)
+    response_cache.invalidate("three_pls")
+    # Warehouses may have been imported before their 3PL
+    sync_warehouse_view(refresh_threepl_view, threepl_dict)
     
     # Return a new ThreePL instance with the data
     return ThreePL(**threepl_dict)
 
+@app.put("/api/3pls/{threepl_id}")
+async def update_3pl(threepl_id: str, threepl: ThreePL, current_user: dict = Depends(verify_token)):
+    if current_user["role"] not in ["admin"]:
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    
+    threepl_dict = normalize_threepl(threepl.dict(exclude={"id", "created_at"}))
+    # Previous facet values come back with the write for the count update
+    before = db.three_pls.find_one_and_update(
+        by_id(threepl_id),
+        {"$set": threepl_dict},
+        projection={field: 1 for field in ["id", *FACET_FIELDS]},
+        return_document=ReturnDocument.BEFORE
+    )
+    if before is None:
+        raise HTTPException(status_code=404, detail="3PL not found")
+    
+    facet_counts.apply(before, threepl_dict)
+    response_cache.invalidate("three_pls")
+    sync_warehouse_view(refresh_threepl_view, before)
+    return {"message": "3PL updated successfully"}
+
 @app.get("/api/warehouses")
 async def get_warehouses():
-    warehouses = list(db.warehouses.find())
-    for warehouse in warehouses:
-        warehouse["id"] = str(warehouse["_id"])
-        del warehouse["_id"]
-    return warehouses
+    return await response_cache.response("/api/warehouses", (), ("warehouses",), lambda: json_array("warehouses"))
+
+@app.get("/api/warehouse-view")
+async def get_warehouse_view(threepl_id: Optional[str] = None):
+    # One read of pre-joined rows; no client-side join against /api/3pls
+    return await response_cache.response(
+        "/api/warehouse-view", (threepl_id,), (VIEW_COLLECTION, "three_pls"),
+        lambda: json_array(VIEW_COLLECTION, match=threepl_match(db, threepl_id) if threepl_id else None),
+    )
 
 @app.post("/api/warehouses")
 async def create_warehouse(warehouse: Warehouse, current_user: dict = Depends(verify_token)):
@@ -229,33 +631,81 @@ async def create_warehouse(warehouse: Warehouse, current_user: dict = Depends(ve
         raise HTTPException(status_code=403, detail="Insufficient permissions")
     
     warehouse_dict = warehouse.dict()
+    if not geocoder.fill_coordinates(warehouse_dict):
+        raise HTTPException(status_code=422, detail="Could not geocode warehouse address; provide lat and lng")
     warehouse_dict["created_at"] = datetime.now()
     warehouse_dict["id"] = str(uuid.uuid4())
     
     result = db.warehouses.insert_one(warehouse_dict)
+    warehouse_index.add(warehouse_dict)
+    response_cache.invalidate("warehouses")
+    sync_warehouse_view(refresh_view, {"_id": result.inserted_id})
     return Warehouse(**warehouse_dict)
 
+@app.post("/api/warehouses/bulk")
+async def import_warehouses(warehouses: List[Warehouse], current_user: dict = Depends(verify_token)):
+    if current_user["role"] not in ["admin"]:
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    if len(warehouses) > MAX_WAREHOUSE_IMPORT:
+        raise HTTPException(status_code=413, detail="At most %d warehouses per import" % MAX_WAREHOUSE_IMPORT)
+
+    now = datetime.now()
+    documents = []
+    failed = []
+    with timed("geocode"):
+        for position, warehouse in enumerate(warehouses):
+            warehouse_dict = warehouse.dict()
+            if not geocoder.fill_coordinates(warehouse_dict):
+                failed.append({"index": position, "name": warehouse.name, "detail": "Could not geocode address"})
+                continue
+            warehouse_dict["created_at"] = now
+            warehouse_dict["id"] = str(uuid.uuid4())
+            documents.append(warehouse_dict)
+
+    if documents:
+        db.warehouses.insert_many(documents)
+        for warehouse_dict in documents:
+            warehouse_index.add(warehouse_dict)
+        response_cache.invalidate("warehouses")
+        sync_warehouse_view(refresh_view, {"_id": {"$in": [document["_id"] for document in documents]}})
+    return {"created": len(documents), "ids": [document["id"] for document in documents], "failed": failed}
+
+# Filterable and sortable lease fields for GET /api/leases
+LEASE_QUERY_FIELDS = {
+    "status": str,
+    "warehouse_id": str,
+    "threepl_id": str,
+    "landlord": str,
+    "start_date": datetime,
+    "end_date": datetime,
+    "renewal_date": datetime,
+    "monthly_rent": float,
+    "square_footage": int,
+}
+
+# Left out of lease lists: uploads are listed by /api/leases/{id}/documents,
+# and an agreement's full text can run to hundreds of kilobytes
+LEASE_LIST_EXCLUDE = ("documents", "lease_agreement.document_content")
+
 @app.get("/api/leases")
-async def get_leases():
-    leases = list(db.leases.find())
-    for lease in leases:
-        lease["id"] = str(lease["_id"])
-        del lease["_id"]
-    return leases
+async def get_leases(request: Request, sort: Optional[str] = None, limit: Optional[int] = Query(None, gt=0)):
+    params = [(name, value) for name, value in request.query_params.multi_items() if name not in ("sort", "limit")]
+    try:
+        match = parse_filters(params, LEASE_QUERY_FIELDS)
+        order = parse_sort(sort, LEASE_QUERY_FIELDS)
+        # Rejects anything that would scan or sort the whole collection
+        plan("leases", match, order)
+    except QueryError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return stream_shaped(db, "leases", match=match, sort=dict(order), limit=limit, exclude=LEASE_LIST_EXCLUDE)
 
 @app.get("/api/leases/expiring")
 async def get_expiring_leases():
     six_months_from_now = datetime.now() + timedelta(days=180)
-    expiring_leases = list(db.leases.find({
-        "end_date": {"$lte": six_months_from_now},
-        "status": "Active"
-    }))
-    
-    for lease in expiring_leases:
-        lease["id"] = str(lease["_id"])
-        del lease["_id"]
-    
-    return expiring_leases
+    return stream_shaped(db, "leases", match={
+        "status": "Active",
+        "end_date": {"$lte": six_months_from_now}
+    }, exclude=LEASE_LIST_EXCLUDE)
 
 @app.post("/api/leases")
 async def create_lease(lease: Lease, current_user: dict = Depends(verify_token)):
@@ -265,75 +715,526 @@ async def create_lease(lease: Lease, current_user: dict = Depends(verify_token))
     lease_dict = lease.dict()
     lease_dict["created_at"] = datetime.now()
     lease_dict["id"] = str(uuid.uuid4())
+    lease_dict["action_items"] = [new_item(item) for item in lease_dict["action_items"]]
     
     result = db.leases.insert_one(lease_dict)
+    response_cache.invalidate("leases")
     return Lease(**lease_dict)
 
+@app.get("/api/leases/{lease_id}/action-items")
+async def get_lease_action_items(lease_id: str, status: Optional[str] = None, current_user: dict = Depends(verify_token)):
+    lease = db.leases.find_one(by_id(lease_id), {"_id": 0, "action_items": 1})
+    if lease is None:
+        raise HTTPException(status_code=404, detail="Lease not found")
+    items = lease.get("action_items", [])
+    if status:
+        items = [item for item in items if item.get("status") == status]
+    # Items written before due dates were validated sort last
+    return sorted(items, key=lambda item: (item.get("due_date") is None, item.get("due_date") or datetime.min))
+
+@app.post("/api/leases/{lease_id}/action-items", status_code=201)
+async def create_lease_action_item(lease_id: str, item: ActionItem, current_user: dict = Depends(verify_token)):
+    if current_user["role"] not in ["admin"]:
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    
+    item_dict = new_item({**item.dict(), "id": None})
+    result = db.leases.update_one(by_id(lease_id), {"$push": {"action_items": item_dict}})
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Lease not found")
+    return item_dict
+
+@app.put("/api/leases/{lease_id}/action-items")
+async def update_lease_action_item(lease_id: str, update: ActionItemUpdate, current_user: dict = Depends(verify_token)):
+    if current_user["role"] not in ["admin"]:
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    
+    changes = update.dict(exclude_unset=True, exclude={"action_item_id"})
+    if not changes:
+        raise HTTPException(status_code=422, detail="Nothing to update")
+    # Every item field is required, so none may be cleared
+    nulls = sorted(field for field, value in changes.items() if value is None)
+    if nulls:
+        raise HTTPException(status_code=422, detail="%s cannot be null" % ", ".join(nulls))
+    # Sets only the matched item's fields; the rest of the lease is untouched
+    lease = db.leases.find_one_and_update(
+        {**by_id(lease_id), "action_items.id": update.action_item_id},
+        item_update(changes, current_user),
+        array_filters=[{"item.id": update.action_item_id}],
+        projection={"_id": 0, "action_items": {"$elemMatch": {"id": update.action_item_id}}},
+        return_document=ReturnDocument.AFTER
+    )
+    if lease is None:
+        if db.leases.find_one(by_id(lease_id), {"_id": 1}) is None:
+            raise HTTPException(status_code=404, detail="Lease not found")
+        raise HTTPException(status_code=404, detail="Action item not found")
+    return lease["action_items"][0]
+
+@app.get("/api/action-items/due")
+async def get_due_action_items(
+    before: Optional[datetime] = None,
+    status: List[str] = Query(list(OPEN_STATUSES)),
+    limit: int = Query(500, le=5000),
+    current_user: dict = Depends(verify_token)
+):
+    # Overdue items are included; the default horizon is the next 30 days
+    before = before or datetime.now() + timedelta(days=30)
+    return list(reporting_db.leases.aggregate(due_pipeline(before, status, limit)))
+
+@app.get("/api/leases/{lease_id}/documents")
+async def get_lease_documents(lease_id: str, current_user: dict = Depends(verify_token)):
+    lease = db.leases.find_one(by_id(lease_id), {"_id": 0, "documents": 1})
+    if lease is None:
+        raise HTTPException(status_code=404, detail="Lease not found")
+    return lease.get("documents", [])
+
+@app.post("/api/leases/{lease_id}/documents", status_code=201)
+async def upload_lease_document(lease_id: str, file: UploadFile = File(...), current_user: dict = Depends(verify_token)):
+    if current_user["role"] not in ["admin"]:
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    lease = db.leases.find_one(by_id(lease_id), {"_id": 1})
+    if lease is None:
+        raise HTTPException(status_code=404, detail="Lease not found")
+    
+    # The upload is already spooled to a temporary file; hash it before
+    # storing so identical files are kept once
+    try:
+        sha256, length, head = await run_in_threadpool(hash_upload, file.file)
+    except DocumentTooLarge:
+        raise HTTPException(status_code=413, detail="Lease document is too large")
+    if head != PDF_MAGIC:
+        raise HTTPException(status_code=415, detail="Lease documents must be PDF files")
+    stored, created = await run_in_threadpool(store, db, file.file, sha256, file.filename, "application/pdf")
+    
+    document = {
+        "sha256": sha256,
+        "filename": file.filename,
+        "length": length,
+        "content_type": "application/pdf",
+        "uploaded_at": datetime.now(),
+        "uploaded_by": current_user.get("email"),
+    }
+    db.leases.update_one(
+        {"_id": lease["_id"], "documents.sha256": {"$ne": sha256}},
+        {"$push": {"documents": document}}
+    )
+    return {**document, "deduplicated": not created}
+
+@app.get("/api/leases/{lease_id}/documents/{sha256}")
+async def download_lease_document(
+    lease_id: str,
+    sha256: str,
+    range: Optional[str] = Header(None),
+    if_range: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+    current_user: dict = Depends(verify_token)
+):
+    lease = db.leases.find_one(
+        {**by_id(lease_id), "documents.sha256": sha256},
+        {"documents": {"$elemMatch": {"sha256": sha256}}}
+    )
+    stored = find_file(db, sha256) if lease else None
+    if stored is None:
+        raise HTTPException(status_code=404, detail="Lease document not found")
+    
+    # Content-addressed, so the hash is a strong validator and never changes
+    etag = '"%s"' % sha256
+    length = stored["length"]
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "private, max-age=31536000, immutable",
+        "Content-Disposition": "inline; filename*=UTF-8''%s" % quote(lease["documents"][0]["filename"] or sha256),
+    }
+    if if_none_match and (if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
+    if if_range and if_range.strip() != etag:
+        range = None
+    
+    try:
+        byte_range = parse_range(range, length)
+    except ValueError:
+        return Response(status_code=416, headers={**headers, "Content-Range": "bytes */%d" % length})
+    
+    media_type = stored.get("metadata", {}).get("content_type", "application/pdf")
+    if byte_range is None:
+        headers["Content-Length"] = str(length)
+        return StreamingResponse(iter_file(db, stored["_id"]), media_type=media_type, headers=headers)
+    start, end = byte_range
+    headers["Content-Range"] = "bytes %d-%d/%d" % (start, end, length)
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(iter_file(db, stored["_id"], start, end), status_code=206, media_type=media_type, headers=headers)
+
 @app.get("/api/deals")
 async def get_deals():
-    deals = list(db.deals.find())
-    for deal in deals:
-        deal["id"] = str(deal["_id"])
-        del deal["_id"]
-    return deals
+    return stream_shaped(db, "deals")
 
 @app.post("/api/deals")
-async def create_deal(deal: Deal, current_user: dict = Depends(verify_token)):
+async def create_deal(deal: Deal, background_tasks: BackgroundTasks, current_user: dict = Depends(verify_token)):
     deal_dict = deal.dict()
     deal_dict["created_at"] = datetime.now()
     deal_dict["id"] = str(uuid.uuid4())
+    deal_dict["version"] = 1
     
     result = db.deals.insert_one(deal_dict)
+    response_cache.invalidate("deals")
+    
+    # Event log write happens after the response is sent
+    event = build_event(deal_dict["id"], "created", changed_fields({}, deal_dict), {}, current_user, deal_dict["rep_owner"])
+    background_tasks.add_task(record_event, db, event)
     return Deal(**deal_dict)
 
 @app.put("/api/deals/{deal_id}")
-async def update_deal(deal_id: str, deal: Deal, current_user: dict = Depends(verify_token)):
+async def update_deal(deal_id: str, deal: Deal, background_tasks: BackgroundTasks, current_user: dict = Depends(verify_token)):
     deal_dict = deal.dict()
     del deal_dict["id"]
+    del deal_dict["version"]
     
-    result = db.deals.update_one({"id": deal_id}, {"$set": deal_dict})
-    if result.matched_count == 0:
+    # Same single round trip as update_one, but returns the previous values
+    # so the change event can be built without another read
+    before = db.deals.find_one_and_update(
+        {"id": deal_id},
+        {"$set": deal_dict, "$inc": {"version": 1}},
+        projection={field: 1 for field in deal_dict},
+        return_document=ReturnDocument.BEFORE
+    )
+    if before is None:
         raise HTTPException(status_code=404, detail="Deal not found")
+    response_cache.invalidate("deals")
     
+    event = build_event(deal_id, "updated", changed_fields(before, deal_dict), before, current_user, deal_dict["rep_owner"])
+    background_tasks.add_task(record_event, db, event)
     return {"message": "Deal updated successfully"}
 
+def parse_if_match(if_match: Optional[str]) -> int:
+    if if_match is None:
+        raise HTTPException(status_code=428, detail="If-Match header with the deal version is required")
+    try:
+        return int(if_match.strip().removeprefix("W/").strip('"'))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="If-Match must be a deal version")
+
+@app.patch("/api/deals/{deal_id}")
+async def patch_deal(
+    deal_id: str,
+    patch: DealPatch,
+    response: Response,
+    background_tasks: BackgroundTasks,
+    if_match: Optional[str] = Header(None),
+    current_user: dict = Depends(verify_token)
+):
+    version = parse_if_match(if_match)
+    changes = patch.dict(exclude_unset=True)
+    nulls = sorted(field for field, value in changes.items() if value is None and field not in NULLABLE_DEAL_FIELDS)
+    if nulls:
+        raise HTTPException(status_code=422, detail="%s cannot be null" % ", ".join(nulls))
+    
+    if not changes:
+        # Nothing to write, so the version stays as it is
+        current = next(find_shaped(db, "deals", match=by_id(deal_id), limit=1), None)
+        if current is None:
+            raise HTTPException(status_code=404, detail="Deal not found")
+        if current.get("version", 0) != version:
+            raise HTTPException(
+                status_code=409,
+                detail={"message": "Deal was modified by someone else", "version": current.get("version", 0)}
+            )
+        response.headers["ETag"] = '"%d"' % version
+        return current
+    
+    # Deals written before versioning have no version field
+    version_filter = {"version": version} if version else {"version": {"$in": [0, None]}}
+    before = db.deals.find_one_and_update(
+        {**by_id(deal_id), **version_filter},
+        {"$set": changes, "$inc": {"version": 1}},
+        projection={field: 1 for field in [*changes, "id", "rep_owner"]},
+        return_document=ReturnDocument.BEFORE
+    )
+    if before is None:
+        current = db.deals.find_one(by_id(deal_id), {"version": 1})
+        if current is None:
+            raise HTTPException(status_code=404, detail="Deal not found")
+        raise HTTPException(
+            status_code=409,
+            detail={"message": "Deal was modified by someone else", "version": current.get("version", 0)}
+        )
+    
+    response_cache.invalidate("deals")
+    new_version = version + 1
+    rep_owner = changes.get("rep_owner", before.get("rep_owner", ""))
+    # Events are keyed by the deal's stored id, whichever form the client sent
+    event = build_event(before.get("id") or str(before["_id"]), "updated", changed_fields(before, changes), before, current_user, rep_owner)
+    background_tasks.add_task(record_event, db, event)
+    
+    response.headers["ETag"] = '"%d"' % new_version
+    return {"message": "Deal updated successfully", "version": new_version}
+
+@app.get("/api/deals/{deal_id}/history")
+async def get_deal_history(deal_id: str, current_user: dict = Depends(verify_token)):
+    deal = db.deals.find_one(by_id(deal_id), {"id": 1})
+    if deal is None:
+        raise HTTPException(status_code=404, detail="Deal not found")
+    # Events are keyed by the deal's stored id, see patch_deal
+    return deal_history(db, deal.get("id") or str(deal["_id"]))
+
+@app.get("/api/deal-events")
+async def get_deal_events(
+    rep_owner: Optional[str] = None,
+    actor: Optional[str] = None,
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = None,
+    limit: int = Query(200, le=1000),
+    current_user: dict = Depends(verify_token)
+):
+    if not rep_owner and not actor:
+        raise HTTPException(status_code=422, detail="rep_owner or actor is required")
+    return rep_history(reporting_db, rep_owner=rep_owner, actor=actor, start=local_time(from_), end=local_time(to), limit=limit)
+
 @app.post("/api/shipper-leads")
-async def create_shipper_lead(lead: ShipperLead):
-    lead_dict = lead.dict()
-    lead_dict["created_at"] = datetime.now()
-    lead_dict["id"] = str(uuid.uuid4())
+async def create_shipper_lead(lead: ShipperLead, response: Response, idempotency_key: Optional[str] = Header(None)):
+    fingerprint = None
+    if idempotency_key is not None:
+        fingerprint = request_fingerprint(lead.dict())
+        try:
+            stored = idempotency_store.begin(db, "shipper-leads", idempotency_key, fingerprint)
+        except IdempotencyError as exc:
+            raise HTTPException(status_code=exc.status_code, detail=exc.detail)
+        if stored is not None:
+            response.headers["Idempotent-Replayed"] = "true"
+            return stored
+    
+    try:
+        lead_dict = lead.dict()
+        lead_dict["created_at"] = datetime.now()
+        lead_dict["id"] = str(uuid.uuid4())
+        
+        if lead_buffer:
+            lead_buffer.add(lead_dict)
+        else:
+            result = db.shipper_leads.insert_one(lead_dict)
+        response_cache.invalidate("shipper_leads")
+        created = ShipperLead(**lead_dict)
+    except (OSError, PyMongoError):
+        if idempotency_key is not None:
+            idempotency_store.release(db, "shipper-leads", idempotency_key)
+        raise
     
-    result = db.shipper_leads.insert_one(lead_dict)
-    return ShipperLead(**lead_dict)
+    if idempotency_key is not None:
+        idempotency_store.complete(db, "shipper-leads", idempotency_key, fingerprint, created.dict())
+    return created
 
 @app.get("/api/shipper-leads")
 async def get_shipper_leads():
-    leads = list(db.shipper_leads.find())
-    for lead in leads:
-        lead["id"] = str(lead["_id"])
-        del lead["_id"]
-    return leads
+    return stream_shaped(db, "shipper_leads")
+
+@app.get("/api/shipper-leads/{lead_id}/matches")
+async def get_shipper_lead_matches(lead_id: str, limit: int = 10, current_user: dict = Depends(verify_token)):
+    lead = db.shipper_leads.find_one(by_id(lead_id), {"regions_needed": 1})
+    if not lead:
+        raise HTTPException(status_code=404, detail="Lead not found")
+    
+    matches = warehouse_index.rank(lead.get("regions_needed", []), limit=limit)
+    # Warehouses reference their 3PL by either id form
+    names = {}
+    for threepl in reporting_db.three_pls.find(
+        by_ids({match["threepl_id"] for match in matches}),
+        {"id": 1, "company_name": 1}
+    ):
+        names[str(threepl["_id"])] = threepl["company_name"]
+        if threepl.get("id"):
+            names[threepl["id"]] = threepl["company_name"]
+    for match in matches:
+        match["company_name"] = names.get(match["threepl_id"], "")
+    
+    return {"lead_id": lead_id, "regions": lead.get("regions_needed", []), "matches": matches}
+
+def quote_for(request: QuoteRequest) -> dict:
+    monthly_shipments = request.monthly_shipments
+    regions = request.regions_needed
+    urgency = request.urgency
+    if request.lead_id:
+        lead = db.shipper_leads.find_one(by_id(request.lead_id), {"monthly_shipments": 1, "regions_needed": 1, "urgency": 1})
+        if not lead:
+            raise HTTPException(status_code=404, detail="Lead not found")
+        monthly_shipments = lead.get("monthly_shipments", 0)
+        regions = lead.get("regions_needed", [])
+        urgency = lead.get("urgency", "Medium")
+    if monthly_shipments is None:
+        raise HTTPException(status_code=422, detail="monthly_shipments or lead_id is required")
+    
+    result = quote_engine.quote(monthly_shipments, regions, urgency, limit=request.limit)
+    result.update({"lead_id": request.lead_id, "monthly_shipments": monthly_shipments, "regions_needed": regions})
+    return result
+
+@app.post("/api/quotes")
+async def create_quote(request: QuoteRequest):
+    if not quote_engine.loaded:
+        raise HTTPException(status_code=503, detail="Rate tables are not loaded yet")
+    return quote_for(request)
+
+@app.post("/api/quotes/batch")
+async def create_quotes_batch(batch: QuoteBatchRequest, current_user: dict = Depends(verify_token)):
+    if not quote_engine.loaded:
+        raise HTTPException(status_code=503, detail="Rate tables are not loaded yet")
+    return {"built_at": quote_engine.built_at, "results": [quote_for(request) for request in batch.requests]}
+
+@app.get("/api/industry-news")
+async def get_industry_news(
+    response: Response,
+    category: Optional[str] = None,
+    trending: Optional[bool] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100)
+):
+    try:
+        articles, next_cursor = list_news(reporting_db, category, trending, cursor, limit)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return articles
+
+@app.get("/api/industry-news/{article_id}")
+async def get_industry_news_article(article_id: str):
+    # Reading an article counts towards its trending score
+    article = record_hit(db, {"id": article_id})
+    if article is None:
+        raise HTTPException(status_code=404, detail="Article not found")
+    return present(article)
+
+@app.post("/api/industry-news")
+async def create_industry_news(article: NewsArticle, current_user: dict = Depends(verify_token)):
+    if current_user["role"] not in ["admin"]:
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    
+    # Editors flag trending stories; the flag decays like any other mentions
+    initial_score = TRENDING_THRESHOLD * 2 if article.trending else 1.0
+    article_dict = build_article(article.dict(), article.source, article.category, datetime.now(), initial_score)
+    try:
+        db.industry_news.insert_one(article_dict)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="An article with the same title and summary already exists")
+    
+    article_dict.pop("_id", None)
+    article_dict.pop("content_hash")
+    article_dict.pop("sources")
+    return present(article_dict)
+
+@app.get("/api/portal/bootstrap")
+async def get_portal_bootstrap(threepl_id: Optional[str] = None, current_user: dict = Depends(verify_token)):
+    # Partners see their own 3PL; admins can open any partner's portal
+    if current_user["role"] == "3pl_partner":
+        threepl = await find_partner(async_reporting_db, current_user["user_id"])
+    elif current_user["role"] in ["admin"]:
+        if not threepl_id:
+            raise HTTPException(status_code=422, detail="threepl_id is required")
+        threepl = await find_threepl(async_reporting_db, threepl_id)
+    else:
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    if threepl is None:
+        raise HTTPException(status_code=404, detail="3PL not found")
+    return await bootstrap(async_reporting_db, threepl)
 
 @app.get("/api/dashboard/stats")
 async def get_dashboard_stats():
     # Temporarily remove authentication requirement for demo
-    total_3pls = db.three_pls.count_documents({})
-    total_warehouses = db.warehouses.count_documents({})
-    active_deals = db.deals.count_documents({"stage": {"$nin": ["Won", "Lost"]}})
-    expiring_leases = db.leases.count_documents({
-        "end_date": {"$lte": datetime.now() + timedelta(days=180)},
-        "status": "Active"
-    })
-    new_leads = db.shipper_leads.count_documents({"status": "New"})
+    return await response_cache.response(
+        "/api/dashboard/stats", (), DASHBOARD_COLLECTIONS,
+        lambda: json.dumps(compute_kpis(reporting_db), default=json_default).encode("utf-8")
+    )
+
+@app.get("/api/dashboard/history")
+async def get_dashboard_history(
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = None,
+    bucket: Optional[str] = None
+):
+    end = local_time(to) or datetime.now()
+    start = local_time(from_) or end - timedelta(days=30)
+    if start >= end:
+        raise HTTPException(status_code=422, detail="from must be before to")
+    
+    try:
+        return history(reporting_db, start, end, bucket)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+
+@app.get("/api/admin/slow-queries")
+async def get_slow_queries(limit: int = 50, current_user: dict = Depends(verify_token)):
+    if current_user["role"] not in ["admin"]:
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    if not slow_query_profiler:
+        raise HTTPException(status_code=404, detail="Slow query profiler is disabled")
     
     return {
-        "total_3pls": total_3pls,
-        "total_warehouses": total_warehouses,
-        "active_deals": active_deals,
-        "expiring_leases": expiring_leases,
-        "new_leads": new_leads
+        "threshold_ms": slow_query_profiler.threshold_ms,
+        "queries": slow_query_profiler.snapshot(limit)
     }
 
+@app.delete("/api/admin/slow-queries")
+async def clear_slow_queries(current_user: dict = Depends(verify_token)):
+    if current_user["role"] not in ["admin"]:
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    if not slow_query_profiler:
+        raise HTTPException(status_code=404, detail="Slow query profiler is disabled")
+    
+    slow_query_profiler.clear()
+    return {"message": "Slow query log cleared"}
+
+@app.get("/api/admin/enrichment-proposals")
+async def get_enrichment_proposals(status: str = "pending", limit: int = 200, current_user: dict = Depends(verify_token)):
+    if current_user["role"] not in ["admin"]:
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    
+    return list(db[PROPOSALS_COLLECTION].find({"status": status}, {"_id": 0}).sort("created_at", -1).limit(limit))
+
+@app.post("/api/admin/enrichment-proposals/{threepl_id}/apply")
+async def apply_enrichment_proposal(threepl_id: str, current_user: dict = Depends(verify_token)):
+    if current_user["role"] not in ["admin"]:
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    proposal = db[PROPOSALS_COLLECTION].find_one({"threepl_id": threepl_id, "status": "pending"})
+    if proposal is None:
+        raise HTTPException(status_code=404, detail="No pending proposal for this 3PL")
+    
+    # Services and regions are additive; contact details found on the site
+    # are shown for review but need a person to pick the right one
+    changes = proposal["changes"]
+    additions = {}
+    if "services" in changes:
+        additions["services"] = changes["services"]["add"]
+    if "regions_covered" in changes:
+        additions["regions_covered"] = changes["regions_covered"]["add"]
+        additions["region_codes"] = region_codes(changes["regions_covered"]["add"])
+    if additions:
+        before = db.three_pls.find_one_and_update(
+            {"id": threepl_id},
+            {"$addToSet": {field: {"$each": values} for field, values in additions.items()}},
+            projection={field: 1 for field in FACET_FIELDS},
+            return_document=ReturnDocument.BEFORE
+        )
+        if before is None:
+            raise HTTPException(status_code=404, detail="3PL not found")
+        after = dict(before)
+        for field, values in additions.items():
+            current = before.get(field) or []
+            after[field] = current + [value for value in values if value not in current]
+        facet_counts.apply(before, after)
+        response_cache.invalidate("three_pls")
+    
+    db[PROPOSALS_COLLECTION].update_one(
+        {"_id": proposal["_id"]},
+        {"$set": {"status": "applied", "applied_by": current_user.get("email"), "applied_at": datetime.now()}}
+    )
+    return {"message": "Proposal applied", "applied": sorted(additions)}
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
+    
+    # Each worker is a separate process that imports this module and opens
+    # its own MongoClient in lifespan
+    workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+    uvicorn.run(
+        "server:app" if workers > 1 else app,
+        host=os.getenv("HOST", "0.0.0.0"),
+        port=int(os.getenv("PORT", "8001")),
+        workers=workers
+    )
\ No newline at end of file
@@ -0,0 +1,68 @@
+"""Warehouses with their 3PL's directory details embedded, for the map.
+
+warehouse_view is maintained with $merge: writes refresh the affected
+warehouses, and a periodic full refresh picks up other workers' writes
+and drops warehouses that no longer exist.
+"""
+from datetime import datetime
+from typing import Optional
+
+from queries import by_id
+
+VIEW_COLLECTION = "warehouse_view"
+# 3PL fields copied onto each warehouse
+THREEPL_FIELDS = ("company_name", "status", "rep_owner", "primary_contact", "email", "phone")
+
+def view_pipeline(refreshed_at: datetime, match: Optional[dict] = None) -> list:
+    # threepl_id holds the 3PL's uuid id, or str(_id) when it was copied from
+    # a list response; look up both forms through their indexes, like by_id
+    threepl = {"$ifNull": [{"$arrayElemAt": ["$_by_id", 0]}, {"$arrayElemAt": ["$_by_oid", 0]}]}
+    return [
+        {"$match": match or {}},
+        {"$set": {"_threepl_oid": {"$convert": {"input": "$threepl_id", "to": "objectId", "onError": None, "onNull": None}}}},
+        {"$lookup": {"from": "three_pls", "localField": "threepl_id", "foreignField": "id", "as": "_by_id"}},
+        {"$lookup": {"from": "three_pls", "localField": "_threepl_oid", "foreignField": "_id", "as": "_by_oid"}},
+        {"$set": {"_threepl": threepl}},
+        {"$set": {
+            # Same public id as /api/3pls, which lists str(_id)
+            "threepl": {"$cond": [
+                {"$ifNull": ["$_threepl", False]},
+                {"id": {"$toString": "$_threepl._id"}, **{field: "$_threepl." + field for field in THREEPL_FIELDS}},
+                None,
+            ]},
+            "view_refreshed_at": refreshed_at,
+        }},
+        {"$project": {"_threepl_oid": 0, "_by_id": 0, "_by_oid": 0, "_threepl": 0}},
+        {"$merge": {"into": VIEW_COLLECTION, "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ]
+
+def refresh_view(db, match: Optional[dict] = None):
+    # $merge writes, so this always runs against the primary
+    list(db.warehouses.aggregate(view_pipeline(datetime.now(), match)))
+
+def refresh_threepl_view(db, threepl: dict):
+    """Re-embed a 3PL into every warehouse that references it."""
+    refresh_view(db, {"threepl_id": {"$in": [value for value in (threepl.get("id"), str(threepl["_id"])) if value]}})
+
+def threepl_match(db, threepl_id: str) -> dict:
+    """View rows for a 3PL given either form of its id."""
+    threepl = db.three_pls.find_one(by_id(threepl_id), {"_id": 1})
+    # Rows embed the 3PL as str(_id) whichever form the warehouse stored;
+    # unknown ids still match rows that reference them directly
+    return {"threepl.id": str(threepl["_id"])} if threepl else {"threepl_id": threepl_id}
+
+def rebuild_view(db) -> int:
+    """Refresh every warehouse and drop view rows whose warehouse is gone."""
+    started = datetime.now()
+    list(db.warehouses.aggregate(view_pipeline(started)))
+    # Rows this pass did not touch are candidates; a concurrent write may
+    # have refreshed one with an earlier timestamp, so check it is gone
+    orphans = [row["_id"] for row in db[VIEW_COLLECTION].aggregate([
+        {"$match": {"view_refreshed_at": {"$lt": started}}},
+        {"$lookup": {"from": "warehouses", "localField": "_id", "foreignField": "_id", "as": "warehouse"}},
+        {"$match": {"warehouse": {"$size": 0}}},
+        {"$project": {"_id": 1}},
+    ])]
+    if orphans:
+        db[VIEW_COLLECTION].delete_many({"_id": {"$in": orphans}})
+    return len(orphans)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Unit tests import backend modules the way server.py does
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Unit tests for deal updates and their history (backend/server.py, backend/deal_events.py)
+Run with: python -m pytest deals_test.py
+"""
+
+import time
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+import queries
+import server
+
+@pytest.fixture
+def client(monkeypatch):
+    mongomock = pytest.importorskip("mongomock")
+    # mongomock's $dateToString has no %L
+    monkeypatch.setattr(queries, "DATE_FORMAT", "%Y-%m-%dT%H:%M:%S")
+    monkeypatch.setattr(server, "JWT_SECRET_KEY", "deals-test-secret-key-of-32-bytes!!")
+    db = mongomock.MongoClient().growe_platform
+    monkeypatch.setattr(server, "db", db)
+    monkeypatch.setattr(server, "reporting_db", db)
+    token = server.create_jwt_token({"id": "rep-1", "email": "rep@example.com", "role": "admin"})
+    # Not entered as a context manager, so lifespan never connects to MongoDB
+    client = TestClient(server.app)
+    client.headers["Authorization"] = "Bearer " + token
+    return client
+
+def create_deal(client):
+    response = client.post("/api/deals", json={
+        "threepl_id": "tpl1", "deal_name": "Summit expansion", "stage": "New", "expected_close_date": "2027-03-01T00:00:00",
+    })
+    assert response.status_code == 200
+    # The id GET /api/deals lists
+    return str(server.db.deals.find_one({"id": response.json()["id"]})["_id"])
+
+def test_history_through_listed_id(client):
+    deal_id = create_deal(client)
+
+    response = client.patch("/api/deals/%s" % deal_id, json={"stage": "Discovery"}, headers={"If-Match": '"1"'})
+    assert response.status_code == 200
+    assert response.json()["version"] == 2
+
+    history = client.get("/api/deals/%s/history" % deal_id).json()
+    assert [event["type"] for event in history["events"]] == ["created", "updated"]
+    assert [stage["stage"] for stage in history["stages"]] == ["New", "Discovery"]
+    assert set(history["time_in_stage_hours"]) == {"New", "Discovery"}
+
+def test_history_of_missing_deal(client):
+    assert client.get("/api/deals/6530f0c2a1b2c3d4e5f60718/history").status_code == 404
+
+def test_patch_rejects_nulls_and_keeps_version_when_empty(client):
+    deal_id = create_deal(client)
+
+    response = client.patch("/api/deals/%s" % deal_id, json={"stage": None}, headers={"If-Match": '"1"'})
+    assert response.status_code == 422
+
+    response = client.patch("/api/deals/%s" % deal_id, json={}, headers={"If-Match": '"1"'})
+    assert response.status_code == 200
+    assert response.json()["version"] == 1
+    assert response.headers["ETag"] == '"1"'
+
+@pytest.fixture
+def new_york(monkeypatch):
+    monkeypatch.setenv("TZ", "America/New_York")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+def test_rep_events_compare_aware_bounds_in_local_time(client, new_york):
+    # Stored as naive local time: 10:00 in New York is 14:00 UTC
+    server.db.deal_events.insert_one({"deal_id": "deal-1", "type": "updated", "rep_owner": "rep@example.com", "ts": datetime(2026, 10, 16, 10, 0)})
+
+    def events(start):
+        response = client.get("/api/deal-events", params={"rep_owner": "rep@example.com", "from": start})
+        assert response.status_code == 200
+        return [event["deal_id"] for event in response.json()]
+
+    assert events("2026-10-16T13:30:00+00:00") == ["deal-1"]
+    assert events("2026-10-16T14:30:00+00:00") == []
+    assert events("2026-10-16T09:30:00") == ["deal-1"]
@@ -96,6 +96,22 @@ class EnhancedGroweBackendTester:
             "status": "Active",
             "notes": "Enhanced lease with agreement details",
             # Enhanced fields from frontend
+            "action_items": [
+                {
+                    "type": "renewal_notice",
+                    "description": "Provide renewal decision notice to landlord",
+                    "due_date": (datetime.now() + timedelta(days=60)).isoformat(),
+                    "priority": "high",
+                    "status": "pending"
+                },
+                {
+                    "type": "insurance_renewal", 
+                    "description": "Update liability insurance certificate",
+                    "due_date": (datetime.now() + timedelta(days=45)).isoformat(),
+                    "priority": "medium",
+                    "status": "pending"
+                }
+            ],
             "lease_agreement": {
                 "document_name": "Enhanced_Warehouse_Lease_2024.pdf",
                 "summary": {
@@ -104,22 +120,6 @@ class EnhancedGroweBackendTester:
                         "Annual rent escalation of 3% starting Year 2",
                         "Tenant responsible for utilities and maintenance"
                     ],
-                    "action_items": [
-                        {
-                            "type": "renewal_notice",
-                            "description": "Provide renewal decision notice to landlord",
-                            "due_date": (datetime.now() + timedelta(days=60)).isoformat(),
-                            "priority": "high",
-                            "status": "pending"
-                        },
-                        {
-                            "type": "insurance_renewal", 
-                            "description": "Update liability insurance certificate",
-                            "due_date": (datetime.now() + timedelta(days=45)).isoformat(),
-                            "priority": "medium",
-                            "status": "pending"
-                        }
-                    ],
                     "financial_summary": {
                         "total_annual_cost": 360000,
                         "escalation_rate": "3% annually",
@@ -142,8 +142,8 @@ class EnhancedGroweBackendTester:
                     self.log_test("Enhanced Data Preservation", True, "lease_agreement data preserved in response")
                     
                     # Check if action items are preserved
-                    if 'action_items' in data.get('lease_agreement', {}).get('summary', {}):
-                        action_items = data['lease_agreement']['summary']['action_items']
+                    if data.get('action_items'):
+                        action_items = data['action_items']
                         self.log_test("Action Items Support", True, f"Action items preserved: {len(action_items)} items")
                     else:
                         self.log_test("Action Items Support", False, "Action items not preserved in response")
@@ -43,6 +43,32 @@ const LeaseAdmin = () => {
         monthly_rent: 25000,
         status: "Active",
         notes: "Standard warehouse lease",
+        action_items: [
+          {
+            id: "1-renewal_notice",
+            type: "renewal_notice",
+            description: "Provide renewal decision notice to landlord",
+            due_date: new Date(Date.now() + 60 * 24 * 60 * 60 * 1000),
+            priority: "high",
+            status: "pending"
+          },
+          {
+            id: "1-insurance_renewal",
+            type: "insurance_renewal",
+            description: "Update liability insurance certificate",
+            due_date: new Date(Date.now() + 45 * 24 * 60 * 60 * 1000),
+            priority: "medium",
+            status: "pending"
+          },
+          {
+            id: "1-maintenance_inspection",
+            type: "maintenance_inspection",
+            description: "Annual facility maintenance inspection",
+            due_date: new Date(Date.now() + 30 * 24 * 60 * 60 * 1000),
+            priority: "low",
+            status: "pending"
+          }
+        ],
         lease_agreement: {
           document_name: "Summit_LA_Warehouse_Lease_2022.pdf",
           document_content: `
@@ -84,29 +110,6 @@ Property Manager: Jane Wilson, (555) 123-0002, jane.wilson@propgroup1.com
               "90-day notice required for lease termination",
               "Option to expand to adjacent 25,000 sq ft space"
             ],
-            action_items: [
-              {
-                type: "renewal_notice",
-                description: "Provide renewal decision notice to landlord",
-                due_date: new Date(Date.now() + 60 * 24 * 60 * 60 * 1000),
-                priority: "high",
-                status: "pending"
-              },
-              {
-                type: "insurance_renewal",
-                description: "Update liability insurance certificate",
-                due_date: new Date(Date.now() + 45 * 24 * 60 * 60 * 1000),
-                priority: "medium",
-                status: "pending"
-              },
-              {
-                type: "maintenance_inspection",
-                description: "Annual facility maintenance inspection",
-                due_date: new Date(Date.now() + 30 * 24 * 60 * 60 * 1000),
-                priority: "low",
-                status: "pending"
-              }
-            ],
             financial_summary: {
               total_annual_cost: 300000,
               escalation_rate: "3% annually",
@@ -128,6 +131,24 @@ Property Manager: Jane Wilson, (555) 123-0002, jane.wilson@propgroup1.com
         monthly_rent: 35000,
         status: "Active",
         notes: "Prime location with good access",
+        action_items: [
+          {
+            id: "2-rent_review",
+            type: "rent_review",
+            description: "Annual rent adjustment calculation review",
+            due_date: new Date(Date.now() + 120 * 24 * 60 * 60 * 1000),
+            priority: "medium",
+            status: "pending"
+          },
+          {
+            id: "2-hvac_maintenance",
+            type: "hvac_maintenance",
+            description: "Quarterly HVAC system maintenance",
+            due_date: new Date(Date.now() + 15 * 24 * 60 * 60 * 1000),
+            priority: "high",
+            status: "pending"
+          }
+        ],
         lease_agreement: {
           document_name: "Atlantic_Newark_Industrial_Lease_2021.pdf",
           document_content: `
@@ -182,22 +203,6 @@ Property Manager: Robert Chen, (555) 234-0002, r.chen@indprop.com
               "Tenant has right of first refusal on adjacent properties",
               "Includes 50 dedicated parking spaces and truck dock access"
             ],
-            action_items: [
-              {
-                type: "rent_review",
-                description: "Annual rent adjustment calculation review",
-                due_date: new Date(Date.now() + 120 * 24 * 60 * 60 * 1000),
-                priority: "medium",
-                status: "pending"
-              },
-              {
-                type: "hvac_maintenance",
-                description: "Quarterly HVAC system maintenance",
-                due_date: new Date(Date.now() + 15 * 24 * 60 * 60 * 1000),
-                priority: "high",
-                status: "pending"
-              }
-            ],
             financial_summary: {
               total_annual_cost: 420000,
               escalation_rate: "2.5% after Year 2",
@@ -219,6 +224,24 @@ Property Manager: Robert Chen, (555) 234-0002, r.chen@indprop.com
         monthly_rent: 18000,
         status: "Active",
         notes: "Short-term lease with expansion potential",
+        action_items: [
+          {
+            id: "3-renewal_decision",
+            type: "renewal_decision",
+            description: "URGENT: Make renewal decision for expiring lease",
+            due_date: new Date(Date.now() + 15 * 24 * 60 * 60 * 1000),
+            priority: "critical",
+            status: "pending"
+          },
+          {
+            id: "3-revenue_report",
+            type: "revenue_report",
+            description: "Submit annual revenue report for rent calculation",
+            due_date: new Date(Date.now() + 10 * 24 * 60 * 60 * 1000),
+            priority: "high",
+            status: "pending"
+          }
+        ],
         lease_agreement: {
           document_name: "Chicago_Logistics_Hub_Lease_2023.pdf",
           document_content: `
@@ -275,22 +298,6 @@ Leasing Manager: Sarah Martinez, (555) 345-0002, s.martinez@chiplogistics.com
               "60-day notice required for termination",
               "Option to lease additional 20,000 sq ft in same complex"
             ],
-            action_items: [
-              {
-                type: "renewal_decision",
-                description: "URGENT: Make renewal decision for expiring lease",
-                due_date: new Date(Date.now() + 15 * 24 * 60 * 60 * 1000),
-                priority: "critical",
-                status: "pending"
-              },
-              {
-                type: "revenue_report",
-                description: "Submit annual revenue report for rent calculation",
-                due_date: new Date(Date.now() + 10 * 24 * 60 * 60 * 1000),
-                priority: "high",
-                status: "pending"
-              }
-            ],
             financial_summary: {
               total_annual_cost: 216000,
               escalation_rate: "Revenue-based adjustment",
@@ -408,30 +415,24 @@ Leasing Manager: Sarah Martinez, (555) 345-0002, s.martinez@chiplogistics.com
     }
   };
 
-  const markActionItemComplete = (leaseId, actionIndex) => {
-    setLeases(prevLeases => 
-      prevLeases.map(lease => {
-        if (lease.id === leaseId) {
-          const updatedActionItems = [...lease.lease_agreement.summary.action_items];
-          updatedActionItems[actionIndex] = {
-            ...updatedActionItems[actionIndex],
-            status: 'completed'
-          };
-          return {
-            ...lease,
-            lease_agreement: {
-              ...lease.lease_agreement,
-              summary: {
-                ...lease.lease_agreement.summary,
-                action_items: updatedActionItems
-              }
-            }
-          };
-        }
-        return lease;
-      })
-    );
-    toast.success('Action item marked as complete');
+  const markActionItemComplete = async (leaseId, item) => {
+    try {
+      // Stored on the lease, so the status survives a reload
+      const response = await axios.put(`/api/leases/${leaseId}/action-items`, {
+        action_item_id: item.id,
+        status: 'completed'
+      });
+      const updateItems = (lease) => ({
+        ...lease,
+        action_items: lease.action_items.map(existing => existing.id === item.id ? response.data : existing)
+      });
+      setLeases(prevLeases => prevLeases.map(lease => lease.id === leaseId ? updateItems(lease) : lease));
+      setSelectedLease(prevLease => prevLease && prevLease.id === leaseId ? updateItems(prevLease) : prevLease);
+      toast.success('Action item marked as complete');
+    } catch (error) {
+      console.error('Error completing action item:', error);
+      toast.error('Unable to update the action item. Please try again.');
+    }
   };
 
   const downloadLeaseAgreement = (lease) => {
@@ -455,7 +456,7 @@ FINANCIAL SUMMARY:
 - Additional Fees: ${lease.lease_agreement.summary.financial_summary.additional_fees.join(', ')}
 
 ACTION ITEMS:
-${lease.lease_agreement.summary.action_items.map((item, index) => 
+${lease.action_items.map((item, index) => 
   `${index + 1}. [${item.priority.toUpperCase()} PRIORITY] ${item.description} (Due: ${new Date(item.due_date).toLocaleDateString()}) - Status: ${item.status.toUpperCase()}`
 ).join('\n')}
 
@@ -518,7 +519,7 @@ Date: ${new Date().toLocaleDateString()}
                 <li>Additional Fees: ${lease.lease_agreement.summary.financial_summary.additional_fees.join(', ')}</li>
               </ul>
               <h3>Action Items:</h3>
-              ${lease.lease_agreement.summary.action_items.map(item => `
+              ${lease.action_items.map(item => `
                 <div class="action-item priority-${item.priority}">
                   <strong>[${item.priority.toUpperCase()} PRIORITY]</strong> ${item.description}<br>
                   <small>Due: ${new Date(item.due_date).toLocaleDateString()} | Status: ${item.status.toUpperCase()}</small>
@@ -745,7 +746,7 @@ Date: ${new Date().toLocaleDateString()}
                     </td>
                     <td className="px-6 py-4 whitespace-nowrap">
                       <div className="space-y-1">
-                        {lease.lease_agreement?.summary?.action_items?.slice(0, 2).map((item, index) => (
+                        {lease.action_items?.slice(0, 2).map((item, index) => (
                           <div key={index} className={`text-xs px-2 py-1 rounded-full border ${getPriorityColor(item.priority)}`}>
                             {item.type === 'renewal_notice' && '🔄'}
                             {item.type === 'renewal_decision' && '⚠️'}
@@ -759,9 +760,9 @@ Date: ${new Date().toLocaleDateString()}
                             </span>
                           </div>
                         ))}
-                        {lease.lease_agreement?.summary?.action_items?.length > 2 && (
+                        {lease.action_items?.length > 2 && (
                           <div className="text-xs text-gray-500">
-                            +{lease.lease_agreement.summary.action_items.length - 2} more
+                            +{lease.action_items.length - 2} more
                           </div>
                         )}
                       </div>
@@ -906,7 +907,7 @@ Date: ${new Date().toLocaleDateString()}
               <div className="mt-6">
                 <h3 className="text-lg font-semibold text-gray-900 mb-4">Action Items</h3>
                 <div className="space-y-3">
-                  {selectedLease.lease_agreement?.summary?.action_items?.map((item, index) => (
+                  {selectedLease.action_items?.map((item, index) => (
                     <div key={index} className={`border rounded-lg p-4 ${
                       item.priority === 'critical' ? 'border-red-300 bg-red-50' :
                       item.priority === 'high' ? 'border-orange-300 bg-orange-50' :
@@ -930,7 +931,7 @@ Date: ${new Date().toLocaleDateString()}
                         </div>
                         {item.status !== 'completed' && (
                           <button
-                            onClick={() => markActionItemComplete(selectedLease.id, index)}
+                            onClick={() => markActionItemComplete(selectedLease.id, item)}
                             className="ml-4 px-3 py-1 text-xs font-medium text-green-700 bg-green-100 rounded-md hover:bg-green-200"
                           >
                             Mark Complete
@@ -15,6 +15,10 @@ const ShipperIntake = () => {
   const [submitted, setSubmitted] = useState(false);
   const [calculating, setCalculating] = useState(false);
   const [shippingCost, setShippingCost] = useState(null);
+  // One key per form so retries and double-clicks create a single lead
+  const [idempotencyKey] = useState(() => (
+    window.crypto?.randomUUID ? window.crypto.randomUUID() : `${Date.now()}-${Math.random().toString(36).slice(2)}`
+  ));
   const { register, handleSubmit, watch, formState: { errors } } = useForm();
 
   const urgencyOptions = ['Low', 'Medium', 'High'];
@@ -34,28 +38,36 @@ const ShipperIntake = () => {
 
   const watchedValues = watch();
 
-  const calculateShippingCost = () => {
+  const calculateShippingCost = async () => {
     setCalculating(true);
     
-    // Simple cost calculation algorithm
-    setTimeout(() => {
-      const baseRate = 2.50; // base rate per shipment
-      const volumeMultiplier = watchedValues.monthly_shipments > 1000 ? 0.8 : 
-                              watchedValues.monthly_shipments > 500 ? 0.9 : 1.0;
-      const urgencyMultiplier = watchedValues.urgency === 'High' ? 1.3 : 
-                               watchedValues.urgency === 'Medium' ? 1.1 : 1.0;
-      const regionMultiplier = watchedValues.regions_needed?.length > 3 ? 1.2 : 1.0;
-      
-      const estimatedCost = baseRate * volumeMultiplier * urgencyMultiplier * regionMultiplier;
-      const monthlyCost = estimatedCost * (watchedValues.monthly_shipments || 0);
-      
-      setShippingCost({
-        perShipment: estimatedCost.toFixed(2),
-        monthly: monthlyCost.toFixed(2),
-        annual: (monthlyCost * 12).toFixed(2)
+    try {
+      const regions = watchedValues.regions_needed;
+      const response = await axios.post('/api/quotes', {
+        monthly_shipments: parseInt(watchedValues.monthly_shipments) || 0,
+        regions_needed: Array.isArray(regions) ? regions : regions ? [regions] : [],
+        urgency: watchedValues.urgency || 'Medium',
+        limit: 1
       });
+      
+      // Show the best quote from the network
+      const best = response.data.quotes[0];
+      if (best) {
+        setShippingCost({
+          perShipment: best.per_shipment.toFixed(2),
+          monthly: best.monthly.toFixed(2),
+          annual: best.annual.toFixed(2)
+        });
+      } else {
+        setShippingCost(null);
+        toast.error('No quote is available for the selected region yet.');
+      }
+    } catch (error) {
+      console.error('Error calculating shipping cost:', error);
+      toast.error('Unable to calculate shipping cost. Please try again.');
+    } finally {
       setCalculating(false);
-    }, 2000);
+    }
   };
 
   const onSubmit = async (data) => {
@@ -66,7 +78,9 @@ const ShipperIntake = () => {
         regions_needed: Array.isArray(data.regions_needed) ? data.regions_needed : [data.regions_needed]
       };
 
-      await axios.post('/api/shipper-leads', formData);
+      await axios.post('/api/shipper-leads', formData, {
+        headers: { 'Idempotency-Key': idempotencyKey }
+      });
       toast.success('Thank you! Your request has been submitted successfully.');
       setSubmitted(true);
     } catch (error) {
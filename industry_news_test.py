@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Unit tests for feed ingestion and trending (backend/industry_news.py)
+Run with: python -m pytest industry_news_test.py
+"""
+
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import industry_news
+from industry_news import NEWS_COLLECTION, TREND_HALF_LIFE_HOURS, build_article, parse_feed, present, store_articles, trend_score
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+NOW = datetime(2026, 10, 17, 12, 0)
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES, name), "rb") as fixture:
+        return parse_feed(fixture.read())
+
+@pytest.fixture(autouse=True)
+def default_threshold(monkeypatch):
+    monkeypatch.setattr(industry_news, "TRENDING_THRESHOLD", 1.5)
+
+@pytest.fixture
+def db():
+    mongomock = pytest.importorskip("mongomock")
+    return mongomock.MongoClient().growe_platform
+
+def test_parse_rss():
+    entries = load_fixture("freight_news_rss.xml")
+
+    assert [entry["title"] for entry in entries] == [
+        "Warehouse Vacancy Hits Five-Year High in Inland Empire",
+        "Parcel Carriers Announce 2027 General Rate Increases",
+    ]
+    first = entries[0]
+    assert first["summary"] == "Industrial vacancy in the Inland Empire rose to 7.1% as new big-box supply outpaced demand."
+    assert first["url"] == "https://freightwire.example.com/2026/10/inland-empire-vacancy"
+    assert first["author"] == "Dana Ortiz"
+    assert first["tags"] == ["Real Estate", "California"]
+    # Stored naive in local time
+    assert first["published_date"] == datetime(2026, 10, 16, 14, 30, tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+
+def test_parse_atom():
+    [entry] = load_fixture("supply_chain_atom.xml")
+
+    assert entry["url"] == "https://supplychaindaily.example.com/inland-empire-vacancy"
+    assert entry["author"] == "Staff"
+    assert entry["tags"] == ["Real Estate"]
+
+def test_syndicated_copies_share_content_hash():
+    [rss, _] = load_fixture("freight_news_rss.xml")
+    [atom] = load_fixture("supply_chain_atom.xml")
+
+    # Case, punctuation and markup differ between the two feeds
+    assert build_article(rss, "Freight Wire", "Industry", NOW)["content_hash"] == \
+        build_article(atom, "Supply Chain Daily", "Industry", NOW)["content_hash"]
+
+def test_repost_from_another_source_raises_trend_key(db):
+    assert store_articles(db, load_fixture("freight_news_rss.xml"), "Freight Wire", "Industry", NOW)[0] == 2
+    story = db[NEWS_COLLECTION].find_one({"title": {"$regex": "^Warehouse"}})
+
+    # Polling the same feed again is not a new mention
+    assert store_articles(db, load_fixture("freight_news_rss.xml"), "Freight Wire", "Industry", NOW)[0] == 0
+    assert db[NEWS_COLLECTION].find_one({"_id": story["_id"]})["trend_key"] == story["trend_key"]
+
+    assert store_articles(db, load_fixture("supply_chain_atom.xml"), "Supply Chain Daily", "Industry", NOW)[0] == 0
+    reposted = db[NEWS_COLLECTION].find_one({"_id": story["_id"]})
+    assert db[NEWS_COLLECTION].count_documents({}) == 2
+    assert reposted["sources"] == ["Freight Wire", "Supply Chain Daily"]
+    assert reposted["trend_key"] > story["trend_key"]
+    assert trend_score(reposted["trend_key"], NOW) == pytest.approx(2.0)
+
+def test_trending_score_decays(db):
+    store_articles(db, load_fixture("freight_news_rss.xml"), "Freight Wire", "Industry", NOW)
+    store_articles(db, load_fixture("supply_chain_atom.xml"), "Supply Chain Daily", "Industry", NOW)
+    articles = {article["title"]: article for article in db[NEWS_COLLECTION].find({}, {"_id": 0})}
+    reposted = articles["Warehouse Vacancy Hits Five-Year High in Inland Empire"]
+    single = articles["Parcel Carriers Announce 2027 General Rate Increases"]
+
+    assert trend_score(single["trend_key"], NOW) == pytest.approx(1.0)
+    assert present(dict(reposted), NOW)["trending"] is True
+    assert present(dict(single), NOW)["trending"] is False
+    # One half-life later two mentions are worth one
+    later = NOW + timedelta(hours=TREND_HALF_LIFE_HOURS)
+    assert trend_score(reposted["trend_key"], later) == pytest.approx(1.0)
+    assert present(dict(reposted), later)["trending"] is False
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the shipper lead write-behind buffer (backend/lead_buffer.py)
+Run with: python -m pytest lead_buffer_test.py
+"""
+
+import asyncio
+import os
+
+import pytest
+from bson import json_util
+
+from lead_buffer import LeadWriteBuffer
+
+LEADS = [
+    {"id": "lead-1", "company_name": "Acme Outdoor", "regions_needed": ["CA"], "status": "New"},
+    {"id": "lead-2", "company_name": "Birch Home", "regions_needed": ["TX"], "status": "New"},
+]
+
+@pytest.fixture
+def db():
+    mongomock = pytest.importorskip("mongomock")
+    # No indexes: replay can run before indexes.py creates them
+    return mongomock.MongoClient().growe_platform
+
+def spill(directory, name, leads):
+    with open(os.path.join(directory, name), "w", encoding="utf-8") as segment:
+        for lead in leads:
+            segment.write(json_util.dumps(lead) + "\n")
+        # Cut off mid-write by a crash
+        segment.write('{"id": "lead-3", "compa')
+
+def test_replay_skips_stored_leads(db, tmp_path):
+    # lead-1 was flushed before the crash, but its segment was not removed
+    db.shipper_leads.insert_one(dict(LEADS[0]))
+    spill(tmp_path, "leads-100-1-1.jsonl", LEADS)
+    # A second worker's copy of the same leads, e.g. after a crash during replay
+    spill(tmp_path, "leads-101-1-1.jsonl", LEADS)
+    buffer = LeadWriteBuffer(str(tmp_path))
+    buffer.db = db
+
+    buffer._replay_spilled()
+
+    assert sorted(lead["id"] for lead in db.shipper_leads.find()) == ["lead-1", "lead-2"]
+    assert os.listdir(tmp_path) == []
+
+def test_flush_stores_and_removes_segments(db, tmp_path):
+    async def scenario():
+        buffer = LeadWriteBuffer(str(tmp_path), flush_seconds=60)
+        await buffer.start(db)
+        for lead in LEADS:
+            buffer.add(dict(lead))
+        await buffer.flush()
+        segments = os.listdir(tmp_path)
+        await buffer.stop()
+        return buffer, segments
+
+    buffer, segments = asyncio.run(scenario())
+    assert buffer.pending == 0
+    # Only the fresh segment is left while running, and none after stopping
+    assert len(segments) == 1
+    assert os.listdir(tmp_path) == []
+    assert db.shipper_leads.count_documents({}) == 2
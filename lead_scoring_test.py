@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Unit tests for warehouse proximity ranking (backend/lead_scoring.py)
+Run with: python -m pytest lead_scoring_test.py
+"""
+
+from bson import ObjectId
+
+from lead_scoring import WarehouseIndex
+from queries import id_aliases
+
+SUMMIT = {"_id": ObjectId("6530f0c2a1b2c3d4e5f60718"), "id": "summit-uuid"}
+ATLANTIC = {"_id": ObjectId("6530f0c2a1b2c3d4e5f60719")}
+
+WAREHOUSES = [
+    # Summit's warehouses reference it by both id forms
+    {"id": "wh-la", "threepl_id": "summit-uuid", "lat": 34.05, "lng": -118.24},
+    {"id": "wh-oakland", "threepl_id": str(SUMMIT["_id"]), "lat": 37.80, "lng": -122.27},
+    {"id": "wh-newark", "threepl_id": str(ATLANTIC["_id"]), "lat": 40.74, "lng": -74.17},
+    {"id": "wh-nowhere", "threepl_id": "summit-uuid", "lat": None, "lng": None},
+]
+
+def test_3pl_ranked_once_whichever_id_its_warehouses_store():
+    index = WarehouseIndex()
+    index.load(WAREHOUSES, id_aliases([SUMMIT, ATLANTIC]))
+
+    matches = index.rank(["CA"])
+    assert [match["threepl_id"] for match in matches] == [str(SUMMIT["_id"]), str(ATLANTIC["_id"])]
+    assert matches[0]["nearest_warehouse_id"] in ("wh-la", "wh-oakland")
+
+def test_warehouse_added_after_load_joins_its_3pl():
+    index = WarehouseIndex()
+    index.load(WAREHOUSES[:1], id_aliases([SUMMIT]))
+    index.add({"id": "wh-oakland-2", "threepl_id": str(SUMMIT["_id"]), "lat": 37.80, "lng": -122.27})
+
+    assert [match["threepl_id"] for match in index.rank(["CA"])] == [str(SUMMIT["_id"])]
+
+def test_unknown_3pl_keeps_stored_id():
+    index = WarehouseIndex()
+    index.load(WAREHOUSES[2:3])
+
+    assert [match["threepl_id"] for match in index.rank(["NJ"])] == [str(ATLANTIC["_id"])]
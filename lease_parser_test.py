@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Unit tests for lease document parsing (backend/lease_parser.py)
+Run with: python -m pytest lease_parser_test.py
+"""
+
+from datetime import datetime
+
+import pytest
+
+import lease_parser
+from lease_parser import PARSER_VERSION, parse_dates, parse_lease_text
+
+LEASE_TEXT = """COMMERCIAL LEASE AGREEMENT
+Initial Term: five (5) years commencing January 1, 2024 and ending December 31, 2028.
+Monthly Base Rent: $42,500.00 payable in advance.
+Rent shall be subject to a 3% annual escalation.
+Security Deposit: $85,000.00
+Premises: approximately 120,000 square feet of warehouse space.
+Tenant may renew for one additional 5-year term upon 180 days' written notice of renewal.
+Either party may terminate upon 90 days prior written notice of termination.
+"""
+
+def test_parse_dates_formats():
+    assert parse_dates("Jan 5, 2024; 02/29/2024; 2024-03-01; 13/40/2024; Foo 1, 2024") == [
+        datetime(2024, 1, 5),
+        datetime(2024, 2, 29),
+        datetime(2024, 3, 1),
+    ]
+
+def test_parse_lease_text_terms():
+    summary = parse_lease_text(LEASE_TEXT)
+
+    assert summary["start_date"] == datetime(2024, 1, 1)
+    assert summary["end_date"] == datetime(2028, 12, 31)
+    assert summary["term_years"] == 5
+    assert summary["monthly_rent"] == 42500.0
+    assert summary["square_footage"] == 120000
+    assert summary["renewal_term_years"] == 5
+    assert summary["notice_periods_days"] == {"renewal": 180, "termination": 90}
+    assert summary["financial_summary"] == {
+        "total_annual_cost": 510000.0,
+        "escalation_rate": "3% annually",
+        "deposit_amount": 85000.0,
+    }
+    assert "Term 2024-01-01 to 2028-12-31" in summary["key_terms"]
+
+def test_parse_lease_text_notice_deadlines():
+    items = {item["type"]: item for item in parse_lease_text(LEASE_TEXT)["action_items"]}
+
+    assert sorted(items) == ["renewal_notice", "termination_notice"]
+    assert items["renewal_notice"]["due_date"] == datetime(2028, 7, 4)
+    assert items["termination_notice"]["due_date"] == datetime(2028, 10, 2)
+
+def test_parse_lease_text_without_terms():
+    summary = parse_lease_text("This page intentionally left blank.")
+
+    assert summary["start_date"] is None
+    assert summary["monthly_rent"] is None
+    assert summary["financial_summary"]["total_annual_cost"] is None
+    assert summary["action_items"] == []
+
+def test_annual_rent_preferred_over_monthly():
+    summary = parse_lease_text("Monthly rent: $1,000.00\nAnnual Base Rent: $11,500.00")
+
+    assert summary["monthly_rent"] == 1000.0
+    assert summary["financial_summary"]["total_annual_cost"] == 11500.0
+
+def test_run_retries_cached_failures(monkeypatch):
+    mongomock = pytest.importorskip("mongomock")
+    db = mongomock.MongoClient().growe_platform
+    for sha256 in ("parsed", "failed"):
+        db.leases.insert_one({"documents": [{"sha256": sha256, "filename": sha256 + ".pdf"}]})
+    db[lease_parser.CACHE_COLLECTION].insert_many([
+        {"_id": "parsed", "parser_version": PARSER_VERSION, "parsed_at": datetime.now(), "summary": {}, "error": None},
+        {"_id": "failed", "parser_version": PARSER_VERSION, "parsed_at": datetime.now(), "summary": None,
+         "error": "NoFile: transient"},
+    ])
+
+    parsed = []
+
+    class InlineExecutor:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def map(self, function, items, chunksize=1):
+            for sha256 in items:
+                parsed.append(sha256)
+                yield {"_id": sha256, "parser_version": PARSER_VERSION, "parsed_at": datetime.now(), "summary": {}, "error": None}
+
+    applied = []
+    monkeypatch.setattr(lease_parser, "ProcessPoolExecutor", InlineExecutor)
+    monkeypatch.setattr(lease_parser, "apply_summary", lambda db, leases, result: applied.append(result["_id"]) or len(leases))
+
+    stats = lease_parser.run(db, "mongodb://unused")
+
+    assert parsed == ["failed"]
+    assert sorted(applied) == ["failed", "parsed"]
+    assert stats["cached"] == 1
+    assert stats["parsed"] == 1
+    assert db[lease_parser.CACHE_COLLECTION].find_one({"_id": "failed"})["error"] is None
+
+def test_apply_summary_keeps_action_items_on_the_lease_only(monkeypatch):
+    mongomock = pytest.importorskip("mongomock")
+    db = mongomock.MongoClient().growe_platform
+    merged = []
+    merge_items_update = lease_parser.merge_items_update
+    monkeypatch.setattr(lease_parser, "merge_items_update", lambda items: merged.extend(items) or merge_items_update(items))
+    lease_id = db.leases.insert_one({"action_items": []}).inserted_id
+    summary = parse_lease_text(LEASE_TEXT)
+
+    lease_parser.apply_summary(db, [(lease_id, "lease.pdf")], {"_id": "a" * 64, "summary": summary, "parsed_at": datetime.now()})
+
+    lease = db.leases.find_one({"_id": lease_id})
+    assert "action_items" not in lease["lease_agreement"]["summary"]
+    assert lease["lease_agreement"]["summary"]["monthly_rent"] == 42500.0
+    # mongomock cannot evaluate the merge pipeline, so check what it was given
+    assert sorted(item["type"] for item in merged) == ["renewal_notice", "termination_notice"]
@@ -0,0 +1,17 @@
+#!/usr/bin/env python3
+"""
+Unit tests for MongoDB command metrics labels (backend/metrics.py)
+Run with: python -m pytest metrics_test.py
+"""
+
+from bson.int64 import Int64
+
+from metrics import command_collection
+
+def test_command_collection():
+    assert command_collection("find", {"find": "leases", "filter": {}}) == "leases"
+    assert command_collection("aggregate", {"aggregate": "deals", "pipeline": []}) == "deals"
+    assert command_collection("getMore", {"getMore": Int64(8417), "collection": "leases"}) == "leases"
+    assert command_collection("ping", {"ping": 1}) == "admin"
+    # Database-level aggregations have no collection
+    assert command_collection("aggregate", {"aggregate": 1, "pipeline": []}) == "unknown"
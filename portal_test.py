@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the client portal bootstrap (backend/portal.py and GET /api/portal/bootstrap)
+Run with: python -m pytest portal_test.py
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+import portal
+import queries
+import server
+
+THREEPL = {"_id": "6530f0c2a1b2c3d4e5f60718", "company_name": "Summit Logistics"}
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = []
+
+    async def find_partner(db, user_id):
+        calls.append(("find_partner", user_id))
+        return None if user_id == "unlinked" else THREEPL
+
+    async def find_threepl(db, threepl_id):
+        calls.append(("find_threepl", threepl_id))
+        return THREEPL if threepl_id == THREEPL["_id"] else None
+
+    async def bootstrap(db, threepl):
+        calls.append(("bootstrap", threepl["_id"]))
+        return {"threepl": {"id": threepl["_id"]}}
+
+    monkeypatch.setattr(server, "JWT_SECRET_KEY", "portal-test-secret-key-of-32-bytes!")
+    monkeypatch.setattr(server, "find_partner", find_partner)
+    monkeypatch.setattr(server, "find_threepl", find_threepl)
+    monkeypatch.setattr(server, "bootstrap", bootstrap)
+    return calls
+
+@pytest.fixture
+def client():
+    # Not entered as a context manager, so lifespan never connects to MongoDB
+    return TestClient(server.app)
+
+def get(client, user_id, role, **params):
+    token = server.create_jwt_token({"id": user_id, "email": "%s@example.com" % user_id, "role": role})
+    return client.get("/api/portal/bootstrap", params=params, headers={"Authorization": "Bearer " + token})
+
+def test_partner_gets_own_portal(client, calls):
+    response = get(client, "partner-1", "3pl_partner", threepl_id="ignored")
+
+    assert response.status_code == 200
+    assert response.json() == {"threepl": {"id": THREEPL["_id"]}}
+    assert calls == [("find_partner", "partner-1"), ("bootstrap", THREEPL["_id"])]
+
+def test_partner_without_3pl(client, calls):
+    assert get(client, "unlinked", "3pl_partner").status_code == 404
+
+def test_admin_opens_any_portal(client, calls):
+    assert get(client, "admin-1", "admin").status_code == 422
+
+    response = get(client, "admin-1", "admin", threepl_id=THREEPL["_id"])
+    assert response.status_code == 200
+    assert calls == [("find_threepl", THREEPL["_id"]), ("bootstrap", THREEPL["_id"])]
+
+    assert get(client, "admin-1", "admin", threepl_id="missing").status_code == 404
+
+def test_other_roles_forbidden(client, calls):
+    assert get(client, "viewer-1", "viewer", threepl_id=THREEPL["_id"]).status_code == 403
+    assert calls == []
+
+def test_bootstrap_scopes_to_the_3pl(monkeypatch):
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    # mongomock's $dateToString has no %L
+    monkeypatch.setattr(queries, "DATE_FORMAT", "%Y-%m-%dT%H:%M:%S")
+    db = mongomock_motor.AsyncMongoMockClient().growe_platform
+    now = datetime(2026, 10, 17)
+
+    async def scenario():
+        threepl_oid = (await db.three_pls.insert_one({"id": "uuid-1", "company_name": "Summit Logistics", "regions_covered": ["CA"]})).inserted_id
+        # Warehouses and leases may hold either form of the 3PL's id
+        await db.warehouses.insert_one({"name": "Summit LA", "threepl_id": "uuid-1"})
+        await db.leases.insert_many([
+            {"threepl_id": str(threepl_oid), "status": "Active", "end_date": now + timedelta(days=30), "square_footage": 50000,
+             "monthly_rent": 25000.0, "action_items": [{"status": "pending"}, {"status": "completed"}]},
+            {"threepl_id": "uuid-1", "status": "Expired", "end_date": now - timedelta(days=30)},
+            {"threepl_id": "other", "status": "Active", "end_date": now},
+        ])
+        await db.shipper_leads.insert_many([
+            {"status": "New", "regions_needed": ["California"], "created_at": now},
+            {"status": "New", "regions_needed": ["Texas"], "created_at": now},
+            {"status": "Matched", "matched_3pls": ["uuid-1"], "regions_needed": ["Texas"], "created_at": now},
+        ])
+        return await portal.bootstrap(db, await portal.find_threepl(db, "uuid-1"), now)
+
+    result = asyncio.run(scenario())
+    assert result["summary"] == {
+        "warehouses": 1,
+        "active_leases": 1,
+        "expiring_leases": 1,
+        "leased_sqft": 50000,
+        "monthly_rent": 25000.0,
+        "pending_action_items": 1,
+        "open_leads": 2,
+        "trending_news": 0,
+    }
+    assert [lease["status"] for lease in result["leases"]] == ["Expired", "Active"]
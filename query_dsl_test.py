@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the list endpoint filter/sort grammar (backend/query_dsl.py)
+Run with: python -m pytest query_dsl_test.py
+"""
+
+from datetime import datetime, timezone
+
+import pytest
+
+from query_dsl import QueryError, parse_filters, parse_sort, plan
+
+# Same shape as LEASE_QUERY_FIELDS in server.py
+FIELDS = {
+    "status": str,
+    "threepl_id": str,
+    "landlord": str,
+    "end_date": datetime,
+    "monthly_rent": float,
+    "square_footage": int,
+}
+
+def test_parse_filters_operators():
+    match = parse_filters([
+        ("status__in", "Active,Expiring,"),
+        ("end_date__gte", "2027-01-01"),
+        ("end_date__lt", "2028-01-01"),
+        ("square_footage", "50000"),
+    ], FIELDS)
+
+    assert match == {
+        "status": {"$in": ["Active", "Expiring"]},
+        "end_date": {"$gte": datetime(2027, 1, 1), "$lt": datetime(2028, 1, 1)},
+        "square_footage": 50000,
+    }
+
+@pytest.mark.parametrize("params, message", [
+    ([("rent", "1")], "Unknown filter field"),
+    ([("status__like", "Act")], "Unknown operator"),
+    ([("landlord__gt", "A")], "does not support range filters"),
+    ([("monthly_rent", "lots")], "Invalid value for monthly_rent"),
+    ([("end_date__lt", "soon")], "Invalid value for end_date"),
+    ([("status", "Active"), ("status", "Expired")], "Conflicting filters on status"),
+])
+def test_parse_filters_rejects(params, message):
+    with pytest.raises(QueryError, match=message):
+        parse_filters(params, FIELDS)
+
+def test_aware_dates_compared_as_local_time():
+    match = parse_filters([("end_date__lt", "2027-01-01T08:00:00+00:00")], FIELDS)
+
+    expected = datetime(2027, 1, 1, 8, tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+    assert match == {"end_date": {"$lt": expected}}
+    assert match["end_date"]["$lt"].tzinfo is None
+
+def test_parse_sort():
+    assert parse_sort("status, -end_date,", FIELDS) == [("status", 1), ("end_date", -1)]
+    assert parse_sort(None, FIELDS) == []
+    with pytest.raises(QueryError, match="Unknown sort field: rent"):
+        parse_sort("-rent", FIELDS)
+
+@pytest.mark.parametrize("match, sort, index", [
+    ({}, [], None),
+    ({"status": "Active", "end_date": {"$lte": datetime(2027, 1, 1)}}, [], "status_1_end_date_1"),
+    # $in on the prefix still yields end_date order
+    ({"status": {"$in": ["Active", "Expiring"]}}, [("end_date", 1)], "status_1_end_date_1"),
+    ({"threepl_id": "tpl1"}, [("end_date", -1)], "threepl_id_1_end_date_1"),
+    ({}, [("end_date", -1)], "end_date_1"),
+    ({"end_date": {"$gt": datetime(2027, 1, 1)}}, [("end_date", 1)], "end_date_1"),
+    ({"status": "Active"}, [("monthly_rent", -1)], "status_1_monthly_rent_1"),
+    ({"status": "Active", "monthly_rent": {"$gte": 20000.0}}, [], "status_1_monthly_rent_1"),
+])
+def test_plan_picks_index(match, sort, index):
+    assert plan("leases", match, sort) == index
+
+@pytest.mark.parametrize("match, sort", [
+    # Nothing bounds the scan
+    ({"landlord": "Acme"}, []),
+    ({"monthly_rent": {"$gt": 1000.0}}, []),
+    # Would sort in memory
+    ({"status": "Active"}, [("square_footage", 1)]),
+    ({}, [("monthly_rent", 1)]),
+    ({}, [("status", 1), ("end_date", -1)]),
+    # Range before the sort key
+    ({"status": {"$gte": "A"}}, [("end_date", 1)]),
+])
+def test_plan_rejects_unindexed_queries(match, sort):
+    with pytest.raises(QueryError, match="No index on leases"):
+        plan("leases", match, sort)
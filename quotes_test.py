@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Unit tests for rate tables and quotes (backend/quotes.py)
+Run with: python -m pytest quotes_test.py
+"""
+
+from bson import ObjectId
+
+from quotes import QuoteEngine, build_tables
+
+SUMMIT = {"_id": ObjectId("6530f0c2a1b2c3d4e5f60718"), "id": "summit-uuid", "company_name": "Summit Logistics"}
+ATLANTIC = {"_id": ObjectId("6530f0c2a1b2c3d4e5f60719"), "company_name": "Atlantic Fulfillment"}
+
+WAREHOUSES = [
+    # Summit's warehouses reference it by both id forms
+    {"id": "wh-la", "threepl_id": "summit-uuid", "lat": 34.05, "lng": -118.24},
+    {"id": "wh-newark-2", "threepl_id": str(SUMMIT["_id"]), "lat": 40.74, "lng": -74.17},
+    {"id": "wh-newark", "threepl_id": str(ATLANTIC["_id"]), "lat": 40.74, "lng": -74.17},
+    {"id": "wh-orphan", "threepl_id": "retired-3pl", "lat": 41.88, "lng": -87.63},
+]
+
+def quote(regions):
+    engine = QuoteEngine()
+    engine.set_tables(build_tables(WAREHOUSES, [SUMMIT, ATLANTIC]))
+    return engine.quote(100, regions, urgency="Low")
+
+def test_3pl_quoted_once_from_its_cheapest_origin():
+    quotes = {item["threepl_id"]: item for item in quote(["CA", "NJ"])["quotes"]}
+
+    assert sorted(quotes) == sorted([str(SUMMIT["_id"]), str(ATLANTIC["_id"]), "retired-3pl"])
+    summit = quotes[str(SUMMIT["_id"])]
+    assert summit["company_name"] == "Summit Logistics"
+    # Los Angeles serves CA and Newark serves NJ
+    assert summit["zones"]["NJ"] == quotes[str(ATLANTIC["_id"])]["zones"]["NJ"]
+    assert summit["zones"]["CA"] < quotes[str(ATLANTIC["_id"])]["zones"]["CA"]
+    assert summit["per_shipment"] == min(item["per_shipment"] for item in quotes.values())
+    assert quotes["retired-3pl"]["company_name"] == ""
+
+def test_unknown_regions_reported():
+    result = quote(["Atlantis", "NJ"])
+
+    assert result["unknown_regions"] == ["Atlantis"]
+    assert all(set(item["zones"]) == {"NJ"} for item in result["quotes"])
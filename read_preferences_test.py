@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Unit tests for reporting reads on secondaries (backend/read_preferences.py, backend/server.py)
+Run with: python -m pytest read_preferences_test.py
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import MongoClient
+from pymongo.read_preferences import Primary, SecondaryPreferred
+
+import queries
+import server
+from kpi_history import HISTORY_COLLECTION, take_snapshot
+from read_preferences import reporting_read_preference
+from response_cache import ResponseCache
+
+class Unused:
+    """Stands in for a database handle a route must not touch."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __getattr__(self, attribute):
+        raise AssertionError("%s used for %s" % (self.name, attribute))
+
+    __getitem__ = __getattr__
+
+def test_reporting_read_preference():
+    assert reporting_read_preference("primary") == Primary()
+    assert reporting_read_preference("secondaryPreferred", 120) == SecondaryPreferred(max_staleness=120)
+    with pytest.raises(ValueError, match="Unknown read preference"):
+        reporting_read_preference("secondaryOnly")
+    with pytest.raises(ValueError, match="maxStalenessSeconds"):
+        reporting_read_preference("secondary", 30)
+
+def test_reporting_handles_read_from_secondaries(monkeypatch):
+    monkeypatch.setattr(server, "REPORTING_READ_PREFERENCE", reporting_read_preference("secondaryPreferred", 120))
+    # connect=False: no server is contacted
+    client = MongoClient("mongodb://localhost:1", connect=False)
+    async_client = AsyncIOMotorClient("mongodb://localhost:1", connect=False)
+
+    assert server.reporting_database(client).read_preference == SecondaryPreferred(max_staleness=120)
+    assert server.reporting_database(async_client).read_preference == SecondaryPreferred(max_staleness=120)
+    # Writes go through db, which keeps the client's default
+    assert client.growe_platform.read_preference == Primary()
+
+@pytest.fixture
+def client(monkeypatch):
+    pytest.importorskip("mongomock")
+    # mongomock's $dateToString has no %L
+    monkeypatch.setattr(queries, "DATE_FORMAT", "%Y-%m-%dT%H:%M:%S")
+    monkeypatch.setattr(server, "JWT_SECRET_KEY", "reporting-test-secret-key-32-bytes!")
+    monkeypatch.setattr(server, "response_cache", ResponseCache())
+    token = server.create_jwt_token({"id": "admin-1", "email": "admin@example.com", "role": "admin"})
+    # Not entered as a context manager, so lifespan never connects to MongoDB
+    client = TestClient(server.app)
+    client.headers["Authorization"] = "Bearer " + token
+    return client
+
+def test_dashboard_reads_use_reporting_db(client, monkeypatch):
+    import mongomock
+
+    reporting_db = mongomock.MongoClient().growe_platform
+    reporting_db.deals.insert_one({"id": "deal-1", "stage": "Discovery", "value": 1000.0})
+    monkeypatch.setattr(server, "db", Unused("db"))
+    monkeypatch.setattr(server, "reporting_db", reporting_db)
+
+    response = client.get("/api/dashboard/stats")
+    assert response.status_code == 200
+    assert response.json()["active_deals"] == 1
+    assert response.json()["pipeline_value"] == 1000.0
+
+def test_kpi_snapshot_reads_reporting_db_and_writes_db():
+    mongomock = pytest.importorskip("mongomock")
+    db = mongomock.MongoClient().growe_platform
+    reporting_db = mongomock.MongoClient().growe_platform
+    reporting_db.deals.insert_one({"id": "deal-1", "stage": "Discovery", "value": 1000.0})
+
+    assert take_snapshot(db, 300, reporting_db)
+    assert db[HISTORY_COLLECTION].find_one()["active_deals"] == 1
+    assert reporting_db[HISTORY_COLLECTION].count_documents({}) == 0
+
+def test_writes_use_db(client, monkeypatch):
+    import mongomock
+
+    db = mongomock.MongoClient().growe_platform
+    monkeypatch.setattr(server, "db", db)
+    monkeypatch.setattr(server, "reporting_db", Unused("reporting_db"))
+
+    deal = client.post("/api/deals", json={
+        "threepl_id": "tpl1", "deal_name": "Summit expansion", "expected_close_date": "2027-03-01T00:00:00",
+    })
+    assert deal.status_code == 200
+    lease = client.post("/api/leases", json={
+        "warehouse_id": "wh1", "threepl_id": "tpl1", "start_date": "2026-01-01T00:00:00", "end_date": "2029-01-01T00:00:00",
+        "square_footage": 50000, "landlord": "Property Group 1", "monthly_rent": 25000.0,
+    })
+    assert lease.status_code == 200
+    item = client.post("/api/leases/%s/action-items" % lease.json()["id"], json={
+        "description": "Renewal notice", "due_date": "2028-07-04T00:00:00",
+    })
+    assert item.status_code == 201
+
+    assert db.deals.count_documents({}) == 1
+    assert db.deal_events.count_documents({}) == 1
+    assert len(db.leases.find_one()["action_items"]) == 1
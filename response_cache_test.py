@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the response body cache (backend/response_cache.py)
+Run with: python -m pytest response_cache_test.py
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+from response_cache import ResponseCache
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+class Loader:
+    """Counts calls; blocks in the threadpool until released when gated."""
+
+    def __init__(self, gated=False):
+        self.calls = 0
+        self.started = threading.Event()
+        self.gate = threading.Event()
+        if not gated:
+            self.gate.set()
+
+    def __call__(self):
+        self.calls += 1
+        self.started.set()
+        self.gate.wait(5)
+        return b'{"calls": %d}' % self.calls
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+async def wait_started(loader):
+    await asyncio.get_running_loop().run_in_executor(None, loader.started.wait, 5)
+
+def test_miss_then_hit(clock):
+    cache = ResponseCache(ttl_seconds=30, stale_seconds=300, clock=clock)
+    load = Loader()
+
+    async def scenario():
+        first = await cache.get("/api/leases", (), ["leases"], load)
+        clock.now += 29
+        second = await cache.get("/api/leases", (), ["leases"], load)
+        other = await cache.get("/api/leases", (("status", "Active"),), ["leases"], load)
+        return first, second, other
+
+    first, second, other = run(scenario())
+    assert first == (b'{"calls": 1}', "miss")
+    assert second == (b'{"calls": 1}', "hit")
+    assert other == (b'{"calls": 2}', "miss")
+
+def test_concurrent_requests_share_one_fetch(clock):
+    cache = ResponseCache(clock=clock)
+    load = Loader(gated=True)
+
+    async def scenario():
+        waiters = [asyncio.create_task(cache.get("/api/leases", (), ["leases"], load)) for _ in range(5)]
+        await wait_started(load)
+        load.gate.set()
+        return await asyncio.gather(*waiters)
+
+    results = run(scenario())
+    assert load.calls == 1
+    assert [result for _, result in results] == ["miss"] + ["coalesced"] * 4
+    assert {body for body, _ in results} == {b'{"calls": 1}'}
+
+def test_stale_body_served_while_refreshing(clock):
+    cache = ResponseCache(ttl_seconds=30, stale_seconds=300, clock=clock)
+    load = Loader()
+
+    async def scenario():
+        await cache.get("/api/leases", (), ["leases"], load)
+        clock.now += 60
+        stale = await cache.get("/api/leases", (), ["leases"], load)
+        # Let the background refresh finish
+        task, _ = cache._inflight[("/api/leases", ())]
+        await task
+        fresh = await cache.get("/api/leases", (), ["leases"], load)
+        clock.now += 400
+        expired = await cache.get("/api/leases", (), ["leases"], load)
+        return stale, fresh, expired
+
+    stale, fresh, expired = run(scenario())
+    assert stale == (b'{"calls": 1}', "stale")
+    assert fresh == (b'{"calls": 2}', "hit")
+    assert expired == (b'{"calls": 3}', "miss")
+
+def test_invalidate_drops_entries_by_tag(clock):
+    cache = ResponseCache(clock=clock)
+    leases, warehouses = Loader(), Loader()
+
+    async def scenario():
+        await cache.get("/api/leases", (), ["leases"], leases)
+        await cache.get("/api/warehouses", (), ["warehouses"], warehouses)
+        cache.invalidate("leases")
+        return (
+            await cache.get("/api/leases", (), ["leases"], leases),
+            await cache.get("/api/warehouses", (), ["warehouses"], warehouses),
+        )
+
+    assert run(scenario()) == ((b'{"calls": 2}', "miss"), (b'{"calls": 1}', "hit"))
+
+def test_fetch_started_before_invalidation_is_not_stored(clock):
+    cache = ResponseCache(clock=clock)
+    before, after = Loader(gated=True), Loader()
+
+    async def scenario():
+        waiter = asyncio.create_task(cache.get("/api/leases", (), ["leases"], before))
+        await wait_started(before)
+        cache.invalidate("leases")
+        # A request after the write does not join the older fetch
+        fresh = await cache.get("/api/leases", (), ["leases"], after)
+        before.gate.set()
+        old = await waiter
+        return old, fresh, await cache.get("/api/leases", (), ["leases"], after)
+
+    old, fresh, cached = run(scenario())
+    assert old == (b'{"calls": 1}', "miss")
+    assert fresh == (b'{"calls": 1}', "miss")
+    assert cached == (fresh[0], "hit")
+    assert after.calls == 1
+
+def test_least_recently_used_entry_evicted(clock):
+    cache = ResponseCache(max_entries=2, clock=clock)
+    load = Loader()
+
+    async def scenario():
+        for page in ("a", "b"):
+            await cache.get("/api/news", page, ["industry_news"], load)
+        # Touching "a" makes "b" the oldest
+        await cache.get("/api/news", "a", ["industry_news"], load)
+        await cache.get("/api/news", "c", ["industry_news"], load)
+        return [key[1] for key in cache._entries]
+
+    assert run(scenario()) == ["a", "c"]
+    assert load.calls == 3
+
+def test_failed_load_is_not_cached(clock):
+    cache = ResponseCache(clock=clock)
+    calls = []
+
+    def load():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("database unavailable")
+        return b"[]"
+
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            await cache.get("/api/leases", (), ["leases"], load)
+        return await cache.get("/api/leases", (), ["leases"], load)
+
+    assert run(scenario()) == (b"[]", "miss")